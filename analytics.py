@@ -0,0 +1,328 @@
+from collections import namedtuple
+
+import pandas as pd
+
+from backends import DuckDBBackend, PandasBackend
+from bitmap_index import matching_values
+from comparison import change, compare_windows, previous_window
+from cube import distinct_bookings, metric, slice_cube
+from data_loader import DATA_PATH, _fresh_snapshot, read_bookings, read_snapshot
+from histograms import histogram
+from kpi_engine import compute_kpis
+from parallel import breakdown
+from quantiles import range_quantiles, vehicle_quantiles
+from sketches import daily_distinct, distinct_count
+from timeseries import build_daily_series, covers, daily, range_totals, rolling_mean
+from top_customers import TOP_K, distinct_customers, top_customers
+
+
+# Above this many bookings the rating-vs-value scatter is returned as a
+# density grid instead of one point per booking.
+MAX_SCATTER_POINTS = 20_000
+
+# Everything the pages are computed from. ``backend`` answers the queries the
+# aggregates can't (see ``backends``); with the DuckDB backend there is no
+# df_clean, customer index or distinct-ID sketch.
+Dataset = namedtuple("Dataset", ["df_clean", "cube", "histograms", "customers", "daily", "sketches", "quantiles", "backend"])
+
+
+def dataset_from(backend):
+    """The cube, histograms, customer index, daily series and sketches, built by ``backend``."""
+    cube = backend.cube()
+    return Dataset(getattr(backend, "df_clean", None), cube, backend.histograms(), backend.customer_index(),
+                   build_daily_series(cube), backend.distinct_sketches(), backend.quantile_sketches(), backend)
+
+
+def build_dataset(df_clean):
+    """The cube, histograms, customer index, daily series and sketches for ``df_clean``."""
+    return dataset_from(PandasBackend(df_clean))
+
+
+def read_dataset(path=DATA_PATH):
+    """Load ``path`` without Streamlit: the snapshot when it is fresh, otherwise the CSV."""
+    snapshot = _fresh_snapshot(path)
+    df_clean = read_snapshot(snapshot) if snapshot else None
+    return build_dataset(read_bookings(path) if df_clean is None else df_clean)
+
+
+def read_parquet_dataset(directory):
+    """The dataset of a ``stream_ingest`` Parquet directory, aggregated by DuckDB without loading the rows."""
+    return dataset_from(DuckDBBackend(directory))
+
+
+def _stage(mark, stage, rows=None):
+    if mark is not None:
+        mark(stage, rows=rows)
+
+
+def histogram_frame(edges, counts):
+    """Bins as a frame of "left", "right" and "count"."""
+    return pd.DataFrame({"left": edges[:-1], "right": edges[1:], "count": counts})
+
+
+def _closed_range(data, start_date, end_date):
+    """The date range with open bounds replaced by the first and last day of the data."""
+    days = data.daily.values.index
+    start_date = days[0].date() if start_date is None else start_date
+    end_date = days[-1].date() if end_date is None else end_date
+    return start_date, end_date
+
+
+def _compare(data, kpi_fn, start_date, end_date, kpis, filters=None, mark=None):
+    """``compare_windows`` deltas for ``kpis``, recomputing ``kpi_fn`` on each baseline window's cube slice.
+
+    ``kpi_fn(cube, start_date, end_date)`` is the page's KPI computation.
+    A baseline window that reaches past either end of the data would be
+    compared as if it were complete, so its deltas are None instead.
+    """
+    if len(data.daily.values) == 0:
+        return {name: {} for name in kpis}
+    start_date, end_date = _closed_range(data, start_date, end_date)
+
+    def window_kpis(start, end):
+        if not covers(data.daily, start, end):
+            return None
+        window = slice_cube(data.cube, start, end, filters)
+        return kpi_fn(window, start, end) if len(window.cells) else None
+
+    deltas = compare_windows(window_kpis, start_date, end_date, kpis)
+    _stage(mark, "comparisons")
+    return deltas
+
+
+def unique_customers(data, start_date=None, end_date=None, filters=None, approximate=False):
+    """Distinct Customer IDs with a booking in the range that match ``filters``.
+
+    With ``approximate`` set this is the HyperLogLog estimate from
+    ``data.sketches``, whose cost follows the number of days rather than
+    bookings; filters the sketches can't answer fall back to the exact count.
+    Without sketches or a customer index the backend counts.
+    """
+    if approximate and data.sketches is not None:
+        estimate = distinct_count(data.sketches, "Customer ID", start_date, end_date, filters)
+        if estimate is not None:
+            return estimate
+    if not filters and data.customers is not None:
+        return distinct_customers(data.customers, start_date, end_date)
+    return data.backend.distinct_count("Customer ID", start_date, end_date, filters)
+
+
+OVERALL_KPIS = ["total_bookings", "total_revenue", "avg_ride_distance", "avg_booking_value", "weekend_percentage"]
+
+
+def overall(data, start_date=None, end_date=None, filters=None, approximate=False, mark=None):
+    """KPIs, their deltas and chart data for the OVERALL page.
+
+    ``filters`` maps Vehicle Type, Booking Status or Payment Method to a value.
+    Every page function returns ``{"kpis": {...}, "deltas": {...}, "charts":
+    {title: data}}``, where ``deltas`` maps each KPI to its change against the
+    previous window and the same window last year (see ``comparison``), and
+    calls ``mark(stage, rows=...)``, when given, after each step.
+    ``approximate`` estimates "unique_customers" and the filtered daily
+    bookings from the distinct-ID sketches instead of counting them.
+    """
+    def kpi_fn(cube, start, end):
+        kpis = compute_kpis(cube, OVERALL_KPIS)
+        kpis["unique_customers"] = unique_customers(data, start, end, filters, approximate)
+        return kpis
+
+    filtered_cube = slice_cube(data.cube, start_date, end_date, filters)
+    _stage(mark, "slice", len(data.cube.cells))
+    kpis = kpi_fn(filtered_cube, start_date, end_date)
+    _stage(mark, "kpis", len(filtered_cube.cells))
+    deltas = _compare(data, kpi_fn, start_date, end_date, kpis, filters, mark)
+    if filters:
+        days = daily(data.daily, start_date, end_date).index
+        approximate = approximate and data.sketches is not None
+        bookings = daily_distinct(data.sketches, "Booking ID", start_date, end_date, filters) if approximate else None
+        if bookings is None:
+            bookings = distinct_bookings(filtered_cube, "DateOnly")
+        daily_trend = bookings.reindex(days, fill_value=0).rolling(window=7).mean()
+    else:
+        daily_trend = rolling_mean(data.daily, "bookings", 7, start_date, end_date)
+    charts = {
+        "Bookings by Hour": distinct_bookings(filtered_cube, "Hour"),
+        "Bookings by Weekday": distinct_bookings(filtered_cube, "Weekday", observed=False),
+        "Daily Trend (7-day Moving Average)": daily_trend,
+    }
+    _stage(mark, "charts", len(filtered_cube.cells))
+    return {"kpis": kpis, "deltas": deltas, "charts": charts}
+
+
+# Percentiles shown as KPI cards; the charts show every ``quantiles.PERCENTILES``.
+KPI_PERCENTILES = ["median", "p90", "p95", "p99"]
+
+
+def _percentile_kpis(data, measure, start_date, end_date):
+    """``KPI_PERCENTILES`` of ``measure`` from the quantile sketches, named like "p95_booking_value"."""
+    estimates = range_quantiles(data.quantiles, measure, start_date, end_date)
+    name = measure.lower().replace(" ", "_")
+    return {f"{p}_{name}": estimates[p] for p in KPI_PERCENTILES}
+
+
+def _by_vehicle(data, start_date, end_date):
+    by_vehicle = breakdown(data.cube, "Vehicle Type", start_date, end_date)
+    return pd.DataFrame({
+        "total_booking_value": metric(by_vehicle, "Booking Value"),
+        "total_distance_travelled": metric(by_vehicle, "Ride Distance"),
+        "avg_booking_value": metric(by_vehicle, "Booking Value", "mean"),
+        "avg_distance_travelled": metric(by_vehicle, "Ride Distance", "mean")
+    }).reset_index()
+
+
+def _vehicle_kpis(grouped):
+    return {
+        "total_booking_value": grouped["total_booking_value"].sum(),
+        "total_distance_travelled": grouped["total_distance_travelled"].sum(),
+        # Averages of the per-vehicle averages, not per booking.
+        "avg_booking_value": grouped["avg_booking_value"].mean(),
+        "avg_distance_travelled": grouped["avg_distance_travelled"].mean(),
+    }
+
+
+def vehicle_type(data, start_date=None, end_date=None, mark=None):
+    """KPIs, the per-vehicle totals and means, and the per-vehicle fare and distance percentiles.
+
+    Percentiles are estimated from the quantile sketches and count only
+    rides with a recorded fare or distance.
+    """
+    filtered_cube = slice_cube(data.cube, start_date, end_date)
+    _stage(mark, "slice", len(data.cube.cells))
+    grouped = _by_vehicle(data, start_date, end_date)
+    kpis = {**_vehicle_kpis(grouped), **_percentile_kpis(data, "Ride Distance", start_date, end_date)}
+    _stage(mark, "kpis", len(filtered_cube.cells))
+
+    def kpi_fn(cube, start, end):
+        return {**_vehicle_kpis(_by_vehicle(data, start, end)), **_percentile_kpis(data, "Ride Distance", start, end)}
+
+    deltas = _compare(data, kpi_fn, start_date, end_date, kpis, mark=mark)
+    charts = {
+        "Booking Value & Distance by Vehicle": grouped,
+        "Revenue Share by Vehicle": grouped,
+        "Revenue vs. Distance": grouped,
+        "Booking Value Percentiles by Vehicle": vehicle_quantiles(data.quantiles, "Booking Value", start_date, end_date),
+        "Ride Distance Percentiles by Vehicle": vehicle_quantiles(data.quantiles, "Ride Distance", start_date, end_date),
+    }
+    _stage(mark, "charts", len(filtered_cube.cells))
+    return {"kpis": kpis, "deltas": deltas, "charts": charts}
+
+
+def revenue(data, start_date=None, end_date=None, k=TOP_K, mark=None):
+    """KPIs, revenue series, the Booking Value histogram and percentiles, and the top ``k`` customers.
+
+    "revenue_growth" is the percent change in revenue from the previous
+    window of the same length, read off the daily running totals; None when
+    that window has no revenue or is not wholly inside the data. The Booking Value percentiles come from the
+    quantile sketches, like on the VEHICLE TYPE page.
+    """
+    def kpi_fn(cube, start, end):
+        kpis = compute_kpis(cube, ["total_revenue", "avg_booking_value", "revenue_per_ride"])
+        window = previous_window(start, end)
+        previous = range_totals(data.daily, *window)["Booking Value sum"] if covers(data.daily, *window) else None
+        kpis["revenue_growth"] = change("total_revenue", kpis["total_revenue"], previous)
+        kpis.update(_percentile_kpis(data, "Booking Value", start, end))
+        return kpis
+
+    filtered_cube = slice_cube(data.cube, start_date, end_date)
+    _stage(mark, "slice", len(data.cube.cells))
+    kpis = kpi_fn(filtered_cube, *_closed_range(data, start_date, end_date))
+    _stage(mark, "kpis", len(filtered_cube.cells))
+    deltas = _compare(data, kpi_fn, start_date, end_date, kpis, mark=mark)
+    charts = {
+        "Daily Revenue Trend": metric(daily(data.daily, start_date, end_date), "Booking Value"),
+        "Monthly Revenue Trend": metric(breakdown(data.cube, "Month", start_date, end_date, observed=False), "Booking Value"),
+        "Revenue by Vehicle Type": metric(breakdown(data.cube, "Vehicle Type", start_date, end_date), "Booking Value"),
+        "Revenue by Payment Method": metric(breakdown(data.cube, "Payment Method", start_date, end_date), "Booking Value"),
+        "Histogram of Booking Values": histogram_frame(*histogram(data.histograms, "Booking Value", start_date, end_date)),
+        "Booking Value Percentiles by Vehicle Type": vehicle_quantiles(data.quantiles, "Booking Value", start_date, end_date),
+    }
+    _stage(mark, "charts", len(filtered_cube.cells))
+    if data.customers is not None:
+        charts[f"Top {k} Customers"] = top_customers(data.customers, start_date, end_date, k)
+    else:
+        charts[f"Top {k} Customers"] = data.backend.top_k("Customer ID", "Booking Value", k, start_date, end_date)
+    _stage(mark, f"Top {k} Customers")
+    return {"kpis": kpis, "deltas": deltas, "charts": charts}
+
+
+def cancellation(data, start_date=None, end_date=None, mark=None):
+    """KPIs and cancellation breakdowns; a reason chart is None when there are no such cancellations."""
+    cube = data.cube
+    filtered_cube = slice_cube(cube, start_date, end_date)
+    cancelled = {"Booking Status": matching_values(cube.cell_index, "Booking Status", "Cancelled")}
+    _stage(mark, "slice", len(cube.cells))
+
+    def kpi_fn(cube, start, end):
+        return compute_kpis(cube, ["total_rows", "completed_bookings", "cancelled_bookings", "cancellation_rate",
+                                   "customer_cancellations", "driver_cancellations", "revenue_lost"])
+
+    kpis = kpi_fn(filtered_cube, start_date, end_date)
+    _stage(mark, "kpis", len(filtered_cube.cells))
+    deltas = _compare(data, kpi_fn, start_date, end_date, kpis, mark=mark)
+    charts = {
+        "Customer Cancellation Reasons": None,
+        "Driver Cancellation Reasons": None,
+        "Cancellations Over Time": daily(data.daily, start_date, end_date)["cancellations"],
+        "Cancellations by Hour": metric(breakdown(cube, "Hour", start_date, end_date, cancelled)),
+        "Revenue Loss by Vehicle Type": metric(breakdown(cube, "Vehicle Type", start_date, end_date, cancelled), "Booking Value"),
+    }
+    if kpis["customer_cancellations"] > 0:
+        reasons = breakdown(cube, "Reason for cancelling by Customer", start_date, end_date, {"Booking Status": "Cancelled by Customer"})
+        charts["Customer Cancellation Reasons"] = metric(reasons).sort_values(ascending=False)
+    if kpis["driver_cancellations"] > 0:
+        reasons = breakdown(cube, "Driver Cancellation Reason", start_date, end_date, {"Booking Status": "Cancelled by Driver"})
+        charts["Driver Cancellation Reasons"] = metric(reasons).sort_values(ascending=False)
+    _stage(mark, "charts", len(filtered_cube.cells))
+    return {"kpis": kpis, "deltas": deltas, "charts": charts}
+
+
+def ratings(data, start_date=None, end_date=None, mark=None):
+    """KPIs, rating histograms, trends and the rating-vs-value points (or their ``DensityGrid``)."""
+    def kpi_fn(cube, start, end):
+        kpis = compute_kpis(cube, ["avg_customer_rating", "avg_driver_rating"])
+        kpis["rating_difference"] = kpis["avg_customer_rating"] - kpis["avg_driver_rating"]
+        return kpis
+
+    filtered_cube = slice_cube(data.cube, start_date, end_date)
+    _stage(mark, "slice", len(data.cube.cells))
+    kpis = kpi_fn(filtered_cube, start_date, end_date)
+    _stage(mark, "kpis", len(filtered_cube.cells))
+    deltas = _compare(data, kpi_fn, start_date, end_date, kpis, mark=mark)
+
+    by_day = daily(data.daily, start_date, end_date)
+    daily_ratings = pd.DataFrame({
+        "avg_cust_rating": metric(by_day, "Customer Rating", "mean"),
+        "avg_driver_rating": metric(by_day, "Driver Ratings", "mean")
+    }).reset_index()
+
+    avg_ratings_by_vehicle = metric(breakdown(data.cube, "Vehicle Type", start_date, end_date), "Customer Rating", "mean").rename("Customer Rating").sort_values(ascending=False)
+    top_bottom_vehicles = pd.concat([avg_ratings_by_vehicle.head(5), avg_ratings_by_vehicle.tail(5)]).reset_index()
+    top_bottom_vehicles['Performance'] = top_bottom_vehicles['Customer Rating'].apply(lambda x: 'Top 5' if x >= avg_ratings_by_vehicle.head(5).min() else 'Bottom 5')
+
+    # The per-booking scatter needs individual bookings, so it comes from the backend.
+    n_points = data.backend.count(start_date, end_date)
+    if n_points > MAX_SCATTER_POINTS:
+        points = data.backend.density("Booking Value", "Customer Rating", start_date, end_date)
+    else:
+        points = data.backend.rows(["Booking Value", "Customer Rating"], start_date, end_date)
+
+    charts = {
+        "Distribution of Ratings": {
+            col: histogram_frame(*histogram(data.histograms, col, start_date, end_date))
+            for col in ["Customer Rating", "Driver Ratings"]
+        },
+        "Average Daily Rating Trend": daily_ratings,
+        "Top/Bottom 5 Vehicle Types by Customer Rating": top_bottom_vehicles,
+        "Customer Rating vs. Booking Value": points,
+    }
+    _stage(mark, "charts", n_points)
+    return {"kpis": kpis, "deltas": deltas, "charts": charts}
+
+
+PAGES = {
+    "OVERALL": overall,
+    "VEHICLE TYPE": vehicle_type,
+    "REVENUE": revenue,
+    "CANCELLATION": cancellation,
+    "RATINGS": ratings,
+}
@@ -1,8 +1,24 @@
-import streamlit as st
+import os
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import date, timedelta
+import streamlit as st
+from datetime import date
+
+import analytics
+from analytics import Dataset
+from backends import PARQUET_DIR, QUERY_BACKEND, PandasBackend, parquet_version
+from charts import page_figures
+from column_store import STORE_DIR, attach_dataset, store_version
+from comparison import DIFFERENCE_KPIS
+from cube import _cached_cube
+from data_loader import _cached_bookings, data_version
+from histograms import _cached_histograms
+from page_cache import shared_page_cache
+from partitions import PARTITION_DIR, load_partitions
+from profiling import PageProfile
+from quantiles import _cached_quantile_sketches
+from sketches import _cached_sketches
+from timeseries import _cached_daily_series
+from top_customers import TOP_K, _cached_customer_index
 
 
 st.set_page_config(page_title="Uber Analytics Hub", layout="wide", initial_sidebar_state="expanded")
@@ -43,60 +59,55 @@ st.markdown(
 )
 
 
-try:
-    df = pd.read_csv("ncr_ride_bookings.csv")
-except FileNotFoundError:
-    st.error("Error: The file 'ncr_ride_bookings.csv' was not found. Please make sure it is in the same directory as the app.py file.")
-    st.stop()
+@st.cache_resource(max_entries=1, show_spinner="Aggregating the Parquet store...")
+def load_parquet_dataset(directory, files, mtime_ns, size):
+    """The DuckDB-backed dataset for one version of the Parquet files, shared by every session."""
+    return analytics.read_parquet_dataset(directory)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Attaching the column store...")
+def load_store_dataset(directory, version):
+    """The dataset for one version of the shared column store; the bookings and aggregates stay memory-mapped."""
+    return attach_dataset(directory, version)
 
 
+profile = PageProfile()
 try:
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Time"] = pd.to_datetime(df["Time"], format="%H:%M:%S").dt.time
+    if QUERY_BACKEND == "duckdb":
+        version = parquet_version(PARQUET_DIR)
+        data = load_parquet_dataset(*version)
+    elif STORE_DIR:
+        version = store_version(STORE_DIR)
+        data = load_store_dataset(*version)
+    elif os.path.isdir(PARTITION_DIR):
+        version, df_clean, cube, hists, customers, daily, sketches, quantiles = load_partitions()
+        data = Dataset(df_clean, cube, hists, customers, daily, sketches, quantiles, PandasBackend(df_clean))
+    else:
+        # One stat for the whole run, so every aggregate and the page cache
+        # are keyed by the same version even if the CSV is rewritten meanwhile.
+        version = data_version()
+        df_clean = _cached_bookings(*version)
+        data = Dataset(df_clean, _cached_cube(*version), _cached_histograms(*version), _cached_customer_index(*version),
+                       _cached_daily_series(*version), _cached_sketches(*version), _cached_quantile_sketches(*version),
+                       PandasBackend(df_clean))
+except FileNotFoundError as error:
+    if QUERY_BACKEND == "duckdb":
+        st.error(f"Error: {error}. Run stream_ingest.py to write the Parquet dataset, or point HUB_PARQUET_DIR at it.")
+        st.stop()
+    if STORE_DIR:
+        st.error(f"Error: {error}. Run column_store.py to publish the bookings, or unset HUB_COLUMN_STORE.")
+        st.stop()
+    st.error("Error: The file 'ncr_ride_bookings.csv' was not found. Please make sure it is in the same directory as the app.py file.")
+    st.stop()
 except KeyError:
     st.error("Error: The DataFrame does not contain the expected 'Date' and 'Time' columns. Please check your CSV file.")
     st.stop()
 
 
-df["Year"] = df["Date"].dt.year
-df["Month"] = df["Date"].dt.month_name()
-df["Weekday"] = df["Date"].dt.day_name()
-df["Hour"] = pd.to_datetime(df["Time"], format="%H:%M:%S").dt.hour
-df["Is_Weekend"] = df["Weekday"].isin(["Saturday", "Sunday"])
-df["DateOnly"] = df["Date"].dt.date
-
-
-df["Ride Distance"] = df["Ride Distance"].fillna(0)
-df["Booking Value"] = df["Booking Value"].fillna(0)
-df["Driver Ratings"] = df["Driver Ratings"].fillna(df["Driver Ratings"].mean())
-df["Customer Rating"] = df["Customer Rating"].fillna(df["Customer Rating"].mean())
-
-
-df["Vehicle Type"] = df["Vehicle Type"].str.lower()
-df["Vehicle Type"] = df["Vehicle Type"].str.replace('go sedan', 'go sedan')
-df["Vehicle Type"] = df["Vehicle Type"].str.replace('go mini', 'go mini')
-df["Vehicle Type"] = df["Vehicle Type"].str.replace('e-bike', 'ebike')
-df["Vehicle Type"] = df["Vehicle Type"].str.replace('premier sedan', 'premier sedan')
-df["Vehicle Type"] = df["Vehicle Type"].str.replace('uber xl', 'uber xl')
-
-
-cols = [
-    "Date", "Month", "Weekday", "Hour", "Is_Weekend",
-    "Booking ID", "Booking Status", "Vehicle Type",
-    "Ride Distance", "Booking Value",
-    "Driver Ratings", "Customer Rating", "Payment Method",
-    "Reason for cancelling by Customer", "Driver Cancellation Reason",
-    "Customer ID", "DateOnly"
-]
-df_clean = df[cols].copy()
-
-
-min_date = df_clean["Date"].min().date()
-max_date = df_clean["Date"].max().date()
-
-
-months_order = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-weekdays_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+cube = data.cube
+profile.mark("load", rows=int(cube.cells["rows"].sum()))
+min_date = cube.cells["DateOnly"].min().date()
+max_date = cube.cells["DateOnly"].max().date()
 
 
 st.markdown(
@@ -271,6 +282,12 @@ st.markdown(
         font-weight: bold;
         color: #333;
     }
+
+    .kpi-delta {
+        font-size: 11px;
+        color: #666;
+        margin-top: 6px;
+    }
     
     /* Section headers */
     .section-header {
@@ -369,53 +386,116 @@ with st.sidebar:
         if st.button(option, key=f"nav_{option}"):
             st.session_state.selected_page = option
 
-selected = st.session_state.selected_page
-
+    approximate = st.checkbox("Approximate distinct counts", key="approx_counts",
+                              help="Estimate unique customers and filtered daily bookings from HyperLogLog sketches, within about ±5%.")
+    profile.show_panel = st.checkbox("Show render timings", key="show_profile")
 
-if selected == "OVERALL":
+selected = st.session_state.selected_page
+profile.page = selected
+profile.mark("page setup")
+page_cache = shared_page_cache()
+
+
+def cached_results(compute, *view):
+    """The selected page's results for ``view``, from the shared page cache or ``compute``."""
+    results, hit = page_cache.get_or_compute((selected, version) + view, compute)
+    profile.mark("page cache hit" if hit else "page cache store")
+    profile.details["page_cache"] = page_cache.stats()
+    return results
+
+
+def kpi_delta(deltas, name):
+    """A KPI card's change against the previous period and the same period last year."""
+    unit = DIFFERENCE_KPIS.get(name, "%")
+    changes = []
+    for baseline, label in [("previous", "vs prev"), ("last_year", "vs last yr")]:
+        value = deltas[name].get(baseline)
+        if value is None:
+            changes.append(f"n/a {label}")
+        else:
+            value = round(value, 2 if unit == "" else 1)
+            arrow = "▲" if value > 0 else "▼" if value < 0 else ""
+            changes.append(f"{arrow}{abs(value):.{2 if unit == '' else 1}f}{unit} {label}")
+    return f'<div class="kpi-delta" title="Change from the previous period of the same length and from the same dates last year">{" · ".join(changes)}</div>'
+
+
+def percentile_cards(kpis, deltas, name, label, fmt):
+    """A row of KPI cards for the ``analytics.KPI_PERCENTILES`` of one measure; "n/a" when there are no values."""
+    for col, p in zip(st.columns(len(analytics.KPI_PERCENTILES)), analytics.KPI_PERCENTILES):
+        value = kpis[f"{p}_{name}"]
+        with col:
+            st.markdown(f"""
+                <div class="kpi-card">
+                    <div class="kpi-title">{"Median" if p == "median" else p.upper()} {label}</div>
+                    <div class="kpi-value">{"n/a" if pd.isna(value) else fmt.format(value)}</div>
+                    {kpi_delta(deltas, f"{p}_{name}")}
+                </div>
+                """, unsafe_allow_html=True)
+
+
+def with_figures(results):
+    """``analytics`` page results plus their figures under "figures"."""
+    results["figures"] = page_figures(selected, results["charts"], mark=profile.mark)
+    return results
+
+
+@st.fragment
+def page_fragment(render):
+    """Draw a page as a fragment: its widgets rerun only the page, not the styles, header, sidebar and data loading."""
+    if profile.finished:
+        # A rerun of this fragment alone, on the full run's profile.
+        profile.restart()
+    render()
+    profile.finish()
+
+
+def overall_page():
     # Date filters
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("Start Date", min_date, min_value=min_date, max_value=max_date, key="overall_start")
     with col2:
         end_date = st.date_input("End Date", max_date, min_value=min_date, max_value=max_date, key="overall_end")
-    
-    filtered_df = df_clean[(df_clean["Date"].dt.date >= start_date) & (df_clean["Date"].dt.date <= end_date)]
-    
+
 
     col3, col4, col5 = st.columns(3)
     with col3:
-        vehicle_type = st.selectbox("Vehicle Type", ["All"] + list(df_clean["Vehicle Type"].unique()))
+        vehicle_type = st.selectbox("Vehicle Type", ["All"] + list(cube.cell_index["Vehicle Type"]))
     with col4:
-        booking_status = st.selectbox("Booking Status", ["All"] + list(df_clean["Booking Status"].unique()))
+        booking_status = st.selectbox("Booking Status", ["All"] + list(cube.cell_index["Booking Status"]))
     with col5:
-        payment_method = st.selectbox("Payment Method", ["All"] + list(df_clean["Payment Method"].unique()))
-    
+        payment_method = st.selectbox("Payment Method", ["All"] + list(cube.cell_index["Payment Method"]))
 
+
+    filters = {}
     if vehicle_type != "All":
-        filtered_df = filtered_df[filtered_df["Vehicle Type"] == vehicle_type]
+        filters["Vehicle Type"] = vehicle_type
     if booking_status != "All":
-        filtered_df = filtered_df[filtered_df["Booking Status"] == booking_status]
+        filters["Booking Status"] = booking_status
     if payment_method != "All":
-        filtered_df = filtered_df[filtered_df["Payment Method"] == payment_method]
-
-
-    total_bookings = filtered_df["Booking ID"].nunique()
-    total_revenue = filtered_df["Booking Value"].sum()
-    avg_ride_distance = filtered_df["Ride Distance"].mean()
-    avg_booking_value = filtered_df["Booking Value"].mean()
-    avg_hourly_bookings = filtered_df["Booking ID"].nunique() / (len(filtered_df["Hour"].unique()) or 1)
-    weekend_bookings = filtered_df[filtered_df["Is_Weekend"]]["Booking ID"].nunique()
-    weekend_percentage = (weekend_bookings / total_bookings * 100) if total_bookings > 0 else 0
-
-
-    kpi_col1, kpi_col2, kpi_col3, kpi_col4, kpi_col5 = st.columns(5)
+        filters["Payment Method"] = payment_method
+
+    results = cached_results(lambda: with_figures(analytics.overall(data, start_date, end_date, filters, approximate, mark=profile.mark)),
+                             start_date, end_date, tuple(sorted(filters.items())), approximate)
+    kpis = results["kpis"]
+    deltas = results["deltas"]
+    figures = results["figures"]
+    total_bookings = kpis["total_bookings"]
+    total_revenue = kpis["total_revenue"]
+    avg_ride_distance = kpis["avg_ride_distance"]
+    avg_booking_value = kpis["avg_booking_value"]
+    weekend_percentage = kpis["weekend_percentage"]
+    unique_customers = kpis["unique_customers"]
+
+
+    kpi_col1, kpi_col2, kpi_col3, kpi_col4, kpi_col5, kpi_col6 = st.columns(6)
     with kpi_col1:
         st.markdown(
             f"""
             <div class="kpi-card">
                 <div class="kpi-title">Total Bookings</div>
                 <div class="kpi-value">{total_bookings/1000:.1f}K</div>
+                {kpi_delta(deltas, "total_bookings")}
             </div>
             """,
             unsafe_allow_html=True
@@ -425,6 +505,7 @@ if selected == "OVERALL":
             <div class="kpi-card">
                 <div class="kpi-title">Total Revenue</div>
                 <div class="kpi-value">₹{total_revenue/1000:.0f}K</div>
+                {kpi_delta(deltas, "total_revenue")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col3:
@@ -432,6 +513,7 @@ if selected == "OVERALL":
             <div class="kpi-card">
                 <div class="kpi-title">Avg Distance</div>
                 <div class="kpi-value">{avg_ride_distance:.1f} km</div>
+                {kpi_delta(deltas, "avg_ride_distance")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col4:
@@ -439,6 +521,7 @@ if selected == "OVERALL":
             <div class="kpi-card">
                 <div class="kpi-title">Avg Value</div>
                 <div class="kpi-value">₹{avg_booking_value:.0f}</div>
+                {kpi_delta(deltas, "avg_booking_value")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col5:
@@ -446,136 +529,118 @@ if selected == "OVERALL":
             <div class="kpi-card">
                 <div class="kpi-title">Weekend %</div>
                 <div class="kpi-value">{weekend_percentage:.1f}%</div>
+                {kpi_delta(deltas, "weekend_percentage")}
+            </div>
+            """, unsafe_allow_html=True)
+    with kpi_col6:
+        st.markdown(f"""
+            <div class="kpi-card">
+                <div class="kpi-title">Unique Customers</div>
+                <div class="kpi-value">{"≈" if approximate else ""}{unique_customers/1000:.1f}K</div>
+                {kpi_delta(deltas, "unique_customers")}
             </div>
             """, unsafe_allow_html=True)
 
+    profile.mark("kpi cards")
     st.markdown("<div class='section-header'>Time-based Analysis</div>", unsafe_allow_html=True)
-    
+
 
     chart_col1, chart_col2 = st.columns(2, gap="medium")
-    
+
     with chart_col1:
-        hourly_bookings = filtered_df.groupby("Hour")["Booking ID"].nunique()
-        fig_hour = go.Figure([go.Bar(x=hourly_bookings.index, y=hourly_bookings.values, marker_color='#000')])
-        fig_hour.update_layout(
-            title={'text': 'Bookings by Hour', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_hour, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Bookings by Hour", figures["Bookings by Hour"])
 
     with chart_col2:
-        weekday_bookings = filtered_df.groupby("Weekday")["Booking ID"].nunique().reindex(weekdays_order)
-        fig_weekday = go.Figure([go.Bar(x=weekday_bookings.index, y=weekday_bookings.values, marker_color='#000')])
-        fig_weekday.update_layout(
-            title={'text': 'Bookings by Weekday', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_weekday, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Bookings by Weekday", figures["Bookings by Weekday"])
 
 
-    daily_trend = filtered_df.groupby("DateOnly")["Booking ID"].nunique().rolling(window=7).mean()
-    fig_daily = go.Figure([go.Scatter(x=daily_trend.index, y=daily_trend.values, line=dict(color='#000'), fill='tozeroy')])
-    fig_daily.update_layout(
-        title={'text': 'Daily Trend (7-day Moving Average)', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-        height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-    st.plotly_chart(fig_daily, use_container_width=True, config={'displayModeBar': False})
+    profile.plotly_chart("Daily Trend (7-day Moving Average)", figures["Daily Trend (7-day Moving Average)"])
+
 
-elif selected == "VEHICLE TYPE":
+def vehicle_type_page():
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("Start Date", min_date, key="vehicle_start")
     with col2:
         end_date = st.date_input("End Date", max_date, key="vehicle_end")
-    
-    filtered_df = df_clean[(df_clean["Date"].dt.date >= start_date) & (df_clean["Date"].dt.date <= end_date)]
-    success_df = filtered_df[filtered_df["Booking Status"] == "Completed"]
-    
-    grouped = filtered_df.groupby("Vehicle Type").agg(
-        total_booking_value=("Booking Value", "sum"),
-        total_distance_travelled=("Ride Distance", "sum"),
-        avg_booking_value=("Booking Value", "mean"),
-        avg_distance_travelled=("Ride Distance", "mean")
-    ).reset_index()
+
+    results = cached_results(lambda: with_figures(analytics.vehicle_type(data, start_date, end_date, mark=profile.mark)),
+                             start_date, end_date)
+    kpis = results["kpis"]
+    deltas = results["deltas"]
+    figures = results["figures"]
     kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
     with kpi_col1:
         st.markdown(f"""
             <div class="kpi-card">
                 <div class="kpi-title">Total Booking Value</div>
-                <div class="kpi-value" style="font-size: 22px;">₹{grouped['total_booking_value'].sum():,.0f}</div>
+                <div class="kpi-value" style="font-size: 22px;">₹{kpis['total_booking_value']:,.0f}</div>
+                {kpi_delta(deltas, "total_booking_value")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col2:
         st.markdown(f"""
             <div class="kpi-card">
                 <div class="kpi-title">Total Distance Travelled</div>
-                <div class="kpi-value" style="font-size: 22px;">{grouped['total_distance_travelled'].sum():,.0f} km</div>
+                <div class="kpi-value" style="font-size: 22px;">{kpis['total_distance_travelled']:,.0f} km</div>
+                {kpi_delta(deltas, "total_distance_travelled")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col3:
         st.markdown(f"""
             <div class="kpi-card">
                 <div class="kpi-title">Avg Booking Value</div>
-                <div class="kpi-value" style="font-size: 22px;">₹{grouped['avg_booking_value'].mean():,.2f}</div>
+                <div class="kpi-value" style="font-size: 22px;">₹{kpis['avg_booking_value']:,.2f}</div>
+                {kpi_delta(deltas, "avg_booking_value")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col4:
         st.markdown(f"""
             <div class="kpi-card">
                 <div class="kpi-title">Avg Distance</div>
-                <div class="kpi-value" style="font-size: 22px;">{grouped['avg_distance_travelled'].mean():,.2f} km</div>
+                <div class="kpi-value" style="font-size: 22px;">{kpis['avg_distance_travelled']:,.2f} km</div>
+                {kpi_delta(deltas, "avg_distance_travelled")}
             </div>
             """, unsafe_allow_html=True)
+    percentile_cards(kpis, deltas, "ride_distance", "Distance", "{:,.1f} km")
+    profile.mark("kpi cards")
 
     chart_col1, chart_col2 = st.columns(2, gap="medium")
-    
+
     with chart_col1:
-        fig_bar = go.Figure()
-        fig_bar.add_trace(go.Bar(x=grouped['Vehicle Type'], y=grouped['total_booking_value'], name='Booking Value', marker_color='#000'))
-        fig_bar.add_trace(go.Bar(x=grouped['Vehicle Type'], y=grouped['total_distance_travelled'], name='Distance', marker_color='#666'))
-        fig_bar.update_layout(
-            title={'text': 'Booking Value & Distance by Vehicle', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            barmode='group', height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white',
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_bar, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Booking Value & Distance by Vehicle", figures["Booking Value & Distance by Vehicle"])
 
     with chart_col2:
-        fig_pie = px.pie(grouped, values='total_booking_value', names='Vehicle Type', title='Revenue Share by Vehicle', hole=0.5,
-                         color_discrete_sequence=['#000', '#333', '#666', '#999', '#ccc', '#e0e0e0'])
-        fig_pie.update_layout(
-            title={'text': 'Revenue Share by Vehicle', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white',
-            legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1)
-        )
-        st.plotly_chart(fig_pie, use_container_width=True, config={'displayModeBar': False})
-    
-    fig_bubble = px.scatter(grouped, x="total_booking_value", y="total_distance_travelled", size="avg_distance_travelled", color="Vehicle Type",
-                            hover_name="Vehicle Type", size_max=60, title="Revenue vs. Distance (Bubble size indicates Avg. Distance)",
-                            color_discrete_sequence=['#000', '#333', '#666', '#999', '#ccc', '#e0e0e0'])
-    fig_bubble.update_layout(
-        title={'text': 'Revenue vs. Distance (Bubble size indicates Avg. Distance)', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-        height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white',
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-    st.plotly_chart(fig_bubble, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Revenue Share by Vehicle", figures["Revenue Share by Vehicle"])
+
+    profile.plotly_chart("Revenue vs. Distance", figures["Revenue vs. Distance"])
+
+    st.markdown("<div class='section-header'>Fare and Distance Percentiles</div>", unsafe_allow_html=True)
+
+    chart_col3, chart_col4 = st.columns(2, gap="medium")
+    with chart_col3:
+        profile.plotly_chart("Booking Value Percentiles by Vehicle", figures["Booking Value Percentiles by Vehicle"])
 
-elif selected == "REVENUE":
+    with chart_col4:
+        profile.plotly_chart("Ride Distance Percentiles by Vehicle", figures["Ride Distance Percentiles by Vehicle"])
+
+
+def revenue_page():
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("Start Date", date(2024, 1, 1), min_value=min_date, max_value=max_date, key="revenue_start")
     with col2:
         end_date = st.date_input("End Date", date(2024, 12, 30), min_value=min_date, max_value=max_date, key="revenue_end")
-    
-    filtered_df = df_clean[(df_clean["Date"].dt.date >= start_date) & (df_clean["Date"].dt.date <= end_date)]
-    
-    total_revenue = filtered_df["Booking Value"].sum()
-    avg_booking_value = filtered_df["Booking Value"].mean()
-    total_bookings = filtered_df["Booking ID"].nunique()
-    revenue_per_ride = total_revenue / total_bookings if total_bookings > 0 else 0
-    prev_period = filtered_df[filtered_df["Date"].dt.date < start_date]
-    prev_revenue = prev_period["Booking Value"].sum()
-    revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
+
+    results = cached_results(lambda: with_figures(analytics.revenue(data, start_date, end_date, mark=profile.mark)),
+                             start_date, end_date)
+    kpis = results["kpis"]
+    deltas = results["deltas"]
+    figures = results["figures"]
+    total_revenue = kpis["total_revenue"]
+    avg_booking_value = kpis["avg_booking_value"]
+    revenue_per_ride = kpis["revenue_per_ride"]
+    revenue_growth = kpis["revenue_growth"]
 
     kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
     with kpi_col1:
@@ -583,6 +648,7 @@ elif selected == "REVENUE":
             <div class="kpi-card">
                 <div class="kpi-title">Total Revenue</div>
                 <div class="kpi-value">₹{total_revenue:,.0f}</div>
+                {kpi_delta(deltas, "total_revenue")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col2:
@@ -590,6 +656,7 @@ elif selected == "REVENUE":
             <div class="kpi-card">
                 <div class="kpi-title">Avg Booking Value</div>
                 <div class="kpi-value">₹{avg_booking_value:.2f}</div>
+                {kpi_delta(deltas, "avg_booking_value")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col3:
@@ -597,74 +664,49 @@ elif selected == "REVENUE":
             <div class="kpi-card">
                 <div class="kpi-title">Revenue per Ride</div>
                 <div class="kpi-value">₹{revenue_per_ride:.2f}</div>
+                {kpi_delta(deltas, "revenue_per_ride")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col4:
         st.markdown(f"""
             <div class="kpi-card">
                 <div class="kpi-title">Revenue Growth %</div>
-                <div class="kpi-value">{revenue_growth:.1f}%</div>
+                <div class="kpi-value">{"n/a" if revenue_growth is None else f"{revenue_growth:.1f}%"}</div>
+                {kpi_delta(deltas, "revenue_growth")}
             </div>
             """, unsafe_allow_html=True)
+    percentile_cards(kpis, deltas, "booking_value", "Booking Value", "₹{:,.0f}")
 
+    profile.mark("kpi cards")
     st.markdown("<div class='section-header'>Revenue Over Time</div>", unsafe_allow_html=True)
-    
+
     chart_col1, chart_col2 = st.columns(2, gap="medium")
     with chart_col1:
-        daily_revenue = filtered_df.groupby("DateOnly")["Booking Value"].sum()
-        fig_daily = go.Figure([go.Scatter(x=daily_revenue.index, y=daily_revenue.values, line=dict(color='#000'), fill='tozeroy')])
-        fig_daily.update_layout(
-            title={'text': 'Daily Revenue Trend', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_daily, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Daily Revenue Trend", figures["Daily Revenue Trend"])
 
     with chart_col2:
-        monthly_revenue = filtered_df.groupby("Month")["Booking Value"].sum().reindex(months_order)
-        fig_monthly = go.Figure([go.Bar(x=monthly_revenue.index, y=monthly_revenue.values, marker_color='#000')])
-        fig_monthly.update_layout(
-            title={'text': 'Monthly Revenue Trend', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_monthly, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Monthly Revenue Trend", figures["Monthly Revenue Trend"])
 
     st.markdown("<div class='section-header'>Revenue by Category</div>", unsafe_allow_html=True)
-    
+
     chart_col3, chart_col4 = st.columns(2, gap="medium")
     with chart_col3:
-        revenue_by_vehicle = filtered_df.groupby("Vehicle Type")["Booking Value"].sum()
-        fig_vehicle = go.Figure([go.Bar(x=revenue_by_vehicle.index, y=revenue_by_vehicle.values, marker_color='#000')])
-        fig_vehicle.update_layout(
-            title={'text': 'Revenue by Vehicle Type', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_vehicle, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Revenue by Vehicle Type", figures["Revenue by Vehicle Type"])
 
     with chart_col4:
-        revenue_by_payment = filtered_df.groupby("Payment Method")["Booking Value"].sum()
-        fig_payment = go.Figure([go.Bar(x=revenue_by_payment.index, y=revenue_by_payment.values, marker_color='#000')])
-        fig_payment.update_layout(
-            title={'text': 'Revenue by Payment Method', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_payment, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Revenue by Payment Method", figures["Revenue by Payment Method"])
 
     st.markdown("<div class='section-header'>Revenue Distribution</div>", unsafe_allow_html=True)
-    
+
     chart_col5, chart_col6 = st.columns(2, gap="medium")
     with chart_col5:
-        fig_hist = px.histogram(filtered_df, x="Booking Value", nbins=20, title="Histogram of Booking Values", color_discrete_sequence=['#000'])
-        fig_hist.update_layout(
-            title={'text': 'Histogram of Booking Values', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_hist, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Histogram of Booking Values", figures["Histogram of Booking Values"])
 
     with chart_col6:
-        top_customers = filtered_df.groupby("Customer ID")["Booking Value"].sum().sort_values(ascending=False).head(10).reset_index()
-        table_html = """
+        top = results["charts"][f"Top {TOP_K} Customers"]
+        table_html = f"""
         <div style="height: 300px; overflow-y: auto;">
-            <h3 class="section-header" style="margin-top: 0;">Top 10 Customers</h3>
+            <h3 class="section-header" style="margin-top: 0;">Top {TOP_K} Customers</h3>
             <table class="professional-table">
                 <thead>
                     <tr>
@@ -674,27 +716,32 @@ elif selected == "REVENUE":
                 </thead>
                 <tbody>
         """
-        for _, row in top_customers.iterrows():
-            table_html += f'<tr><td>{row["Customer ID"]}</td><td>₹{row["Booking Value"]:,.2f}</td></tr>'
+        table_html += "".join(f'<tr><td>{customer}</td><td>₹{value:,.2f}</td></tr>'
+                              for customer, value in zip(top["Customer ID"], top["Booking Value"]))
         table_html += "</tbody></table></div>"
         st.markdown(table_html, unsafe_allow_html=True)
+        profile.mark(f"Top {TOP_K} Customers: send", payload_bytes=len(table_html.encode()))
 
-elif selected == "CANCELLATION":
+    profile.plotly_chart("Booking Value Percentiles by Vehicle Type", figures["Booking Value Percentiles by Vehicle Type"])
+
+
+def cancellation_page():
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("Start Date", date(2024, 1, 1), min_value=min_date, max_value=max_date, key="cancel_start")
     with col2:
         end_date = st.date_input("End Date", date(2024, 12, 30), min_value=min_date, max_value=max_date, key="cancel_end")
-    
-    filtered_df = df_clean[(df_clean["Date"].dt.date >= start_date) & (df_clean["Date"].dt.date <= end_date)]
-    
-    total_bookings = len(filtered_df)
-    completed_bookings = len(filtered_df[filtered_df["Booking Status"] == "Completed"])
-    cancelled_bookings = total_bookings - completed_bookings
-    cancellation_rate = (cancelled_bookings / total_bookings * 100) if total_bookings > 0 else 0
-    cust_cancellations = len(filtered_df[filtered_df["Booking Status"] == "Cancelled by Customer"])
-    driver_cancellations = len(filtered_df[filtered_df["Booking Status"] == "Cancelled by Driver"])
-    revenue_lost = filtered_df[filtered_df["Booking Status"].str.contains("Cancelled")]["Booking Value"].sum()
+
+    results = cached_results(lambda: with_figures(analytics.cancellation(data, start_date, end_date, mark=profile.mark)),
+                             start_date, end_date)
+    kpis = results["kpis"]
+    deltas = results["deltas"]
+    figures = results["figures"]
+    total_bookings = kpis["total_rows"]
+    completed_bookings = kpis["completed_bookings"]
+    cancelled_bookings = kpis["cancelled_bookings"]
+    cancellation_rate = kpis["cancellation_rate"]
+    revenue_lost = kpis["revenue_lost"]
 
     kpi_col1, kpi_col2, kpi_col3, kpi_col4, kpi_col5 = st.columns(5)
     with kpi_col1:
@@ -702,6 +749,7 @@ elif selected == "CANCELLATION":
             <div class="kpi-card">
                 <div class="kpi-title">Total Bookings</div>
                 <div class="kpi-value">{total_bookings/1000:.1f}K</div>
+                {kpi_delta(deltas, "total_rows")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col2:
@@ -709,6 +757,7 @@ elif selected == "CANCELLATION":
             <div class="kpi-card">
                 <div class="kpi-title">Completed</div>
                 <div class="kpi-value">{completed_bookings/1000:.1f}K</div>
+                {kpi_delta(deltas, "completed_bookings")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col3:
@@ -716,6 +765,7 @@ elif selected == "CANCELLATION":
             <div class="kpi-card">
                 <div class="kpi-title">Cancelled</div>
                 <div class="kpi-value">{cancelled_bookings/1000:.1f}K</div>
+                {kpi_delta(deltas, "cancelled_bookings")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col4:
@@ -723,6 +773,7 @@ elif selected == "CANCELLATION":
             <div class="kpi-card">
                 <div class="kpi-title">Cancel Rate</div>
                 <div class="kpi-value">{cancellation_rate:.1f}%</div>
+                {kpi_delta(deltas, "cancellation_rate")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col5:
@@ -730,87 +781,59 @@ elif selected == "CANCELLATION":
             <div class="kpi-card">
                 <div class="kpi-title">Revenue Lost</div>
                 <div class="kpi-value">₹{revenue_lost/1000:.0f}K</div>
+                {kpi_delta(deltas, "revenue_lost")}
             </div>
             """, unsafe_allow_html=True)
 
+    profile.mark("kpi cards")
     st.markdown("<div class='section-header'>Cancellation Breakdown</div>", unsafe_allow_html=True)
-    
+
     chart_col1, chart_col2 = st.columns(2, gap="medium")
-    
-    cust_cancel_df = filtered_df[filtered_df["Booking Status"] == "Cancelled by Customer"]
-    driver_cancel_df = filtered_df[filtered_df["Booking Status"] == "Cancelled by Driver"]
-    
+
     with chart_col1:
-        if len(cust_cancel_df) > 0:
-            cust_reasons = cust_cancel_df["Reason for cancelling by Customer"].value_counts()
-            fig_cust = px.pie(names=cust_reasons.index, values=cust_reasons.values, title="Customer Cancellation Reasons", 
-                             color_discrete_sequence=['#000', '#333', '#666', '#999', '#ccc'])
-            fig_cust.update_layout(
-                title={'text': 'Customer Cancellation Reasons', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-                height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white'
-            )
-            st.plotly_chart(fig_cust, use_container_width=True, config={'displayModeBar': False})
+        if figures["Customer Cancellation Reasons"] is not None:
+            profile.plotly_chart("Customer Cancellation Reasons", figures["Customer Cancellation Reasons"])
 
     with chart_col2:
-        if len(driver_cancel_df) > 0:
-            driver_reasons = driver_cancel_df["Driver Cancellation Reason"].value_counts()
-            fig_driver = px.pie(names=driver_reasons.index, values=driver_reasons.values, title="Driver Cancellation Reasons",
-                               color_discrete_sequence=['#000', '#333', '#666', '#999', '#ccc'])
-            fig_driver.update_layout(
-                title={'text': 'Driver Cancellation Reasons', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-                height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white'
-            )
-            st.plotly_chart(fig_driver, use_container_width=True, config={'displayModeBar': False})
+        if figures["Driver Cancellation Reasons"] is not None:
+            profile.plotly_chart("Driver Cancellation Reasons", figures["Driver Cancellation Reasons"])
 
     st.markdown("<div class='section-header'>Cancellation Trends</div>", unsafe_allow_html=True)
-    
+
     chart_col3, chart_col4 = st.columns(2, gap="medium")
-    
+
     with chart_col3:
-        cancel_over_time = filtered_df[filtered_df["Booking Status"].str.contains("Cancelled")].groupby("DateOnly").size()
-        fig_time = go.Figure([go.Scatter(x=cancel_over_time.index, y=cancel_over_time.values, line=dict(color='#000'), fill='tozeroy')])
-        fig_time.update_layout(
-            title={'text': 'Cancellations Over Time', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_time, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Cancellations Over Time", figures["Cancellations Over Time"])
 
     with chart_col4:
-        cancel_by_hour = filtered_df[filtered_df["Booking Status"].str.contains("Cancelled")].groupby("Hour").size()
-        fig_hour = go.Figure([go.Bar(x=cancel_by_hour.index, y=cancel_by_hour.values, marker_color='#000')])
-        fig_hour.update_layout(
-            title={'text': 'Cancellations by Hour', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-        )
-        st.plotly_chart(fig_hour, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Cancellations by Hour", figures["Cancellations by Hour"])
 
-    cancel_by_vehicle_impact = filtered_df[filtered_df["Booking Status"].str.contains("Cancelled")].groupby("Vehicle Type")["Booking Value"].sum()
-    fig_vehicle_impact = go.Figure([go.Bar(x=cancel_by_vehicle_impact.index, y=cancel_by_vehicle_impact.values, marker_color='#000')])
-    fig_vehicle_impact.update_layout(
-        title={'text': 'Revenue Loss by Vehicle Type', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-        height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', showlegend=False
-    )
-    st.plotly_chart(fig_vehicle_impact, use_container_width=True, config={'displayModeBar': False})
+    profile.plotly_chart("Revenue Loss by Vehicle Type", figures["Revenue Loss by Vehicle Type"])
 
-elif selected == "RATINGS":
+
+def ratings_page():
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("Start Date", min_date, key="ratings_start")
     with col2:
         end_date = st.date_input("End Date", max_date, key="ratings_end")
-    
-    filtered_df = df_clean[(df_clean["Date"].dt.date >= start_date) & (df_clean["Date"].dt.date <= end_date)]
 
-    overall_cust_rating = filtered_df["Customer Rating"].mean().round(2)
-    overall_driver_rating = filtered_df["Driver Ratings"].mean().round(2)
-    rating_difference = (overall_cust_rating - overall_driver_rating).round(2)
-    
+    results = cached_results(lambda: with_figures(analytics.ratings(data, start_date, end_date, mark=profile.mark)),
+                             start_date, end_date)
+    kpis = results["kpis"]
+    deltas = results["deltas"]
+    figures = results["figures"]
+    overall_cust_rating = round(kpis["avg_customer_rating"], 2)
+    overall_driver_rating = round(kpis["avg_driver_rating"], 2)
+    rating_difference = round(overall_cust_rating - overall_driver_rating, 2)
+
     kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
     with kpi_col1:
         st.markdown(f"""
             <div class="kpi-card">
                 <div class="kpi-title">Overall Customer Rating</div>
                 <div class="kpi-value" style="font-size: 22px;">⭐ {overall_cust_rating}</div>
+                {kpi_delta(deltas, "avg_customer_rating")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col2:
@@ -818,6 +841,7 @@ elif selected == "RATINGS":
             <div class="kpi-card">
                 <div class="kpi-title">Overall Driver Rating</div>
                 <div class="kpi-value" style="font-size: 22px;">⭐ {overall_driver_rating}</div>
+                {kpi_delta(deltas, "avg_driver_rating")}
             </div>
             """, unsafe_allow_html=True)
     with kpi_col3:
@@ -825,61 +849,31 @@ elif selected == "RATINGS":
             <div class="kpi-card">
                 <div class="kpi-title">Rating Difference</div>
                 <div class="kpi-value" style="font-size: 22px;">{rating_difference}</div>
+                {kpi_delta(deltas, "rating_difference")}
             </div>
             """, unsafe_allow_html=True)
+    profile.mark("kpi cards")
 
     chart_col1, chart_col2 = st.columns(2, gap="medium")
     with chart_col1:
-
-        fig_dist = px.histogram(filtered_df, x=["Customer Rating", "Driver Ratings"], barmode="overlay",
-                                color_discrete_sequence=['#000', '#666'])
-        fig_dist.update_layout(
-            title={'text': 'Distribution of Ratings', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white',
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_dist, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Distribution of Ratings", figures["Distribution of Ratings"])
 
     with chart_col2:
-        daily_ratings = filtered_df.groupby("DateOnly").agg(
-            avg_cust_rating=("Customer Rating", "mean"),
-            avg_driver_rating=("Driver Ratings", "mean")
-        ).reset_index()
-        fig_trend = go.Figure()
-        fig_trend.add_trace(go.Scatter(x=daily_ratings['DateOnly'], y=daily_ratings['avg_cust_rating'], mode='lines', name='Customer Rating', line=dict(color='#000')))
-        fig_trend.add_trace(go.Scatter(x=daily_ratings['DateOnly'], y=daily_ratings['avg_driver_rating'], mode='lines', name='Driver Rating', line=dict(color='#666')))
-        fig_trend.update_layout(
-            title={'text': 'Average Daily Rating Trend', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white',
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_trend, use_container_width=True, config={'displayModeBar': False})
+        profile.plotly_chart("Average Daily Rating Trend", figures["Average Daily Rating Trend"])
 
     chart_col3, chart_col4 = st.columns(2, gap="medium")
     with chart_col3:
-        avg_ratings_by_vehicle = filtered_df.groupby("Vehicle Type")["Customer Rating"].mean().sort_values(ascending=False)
-        top_bottom_vehicles = pd.concat([avg_ratings_by_vehicle.head(5), avg_ratings_by_vehicle.tail(5)]).reset_index()
-        top_bottom_vehicles['Performance'] = top_bottom_vehicles['Customer Rating'].apply(lambda x: 'Top 5' if x >= avg_ratings_by_vehicle.head(5).min() else 'Bottom 5')
-        
-        fig_top_bottom = px.bar(top_bottom_vehicles, x='Vehicle Type', y='Customer Rating', color='Performance',
-                                title='Top/Bottom 5 Vehicle Types by Customer Rating',
-                                color_discrete_map={'Top 5': '#000', 'Bottom 5': '#ccc'})
-        fig_top_bottom.update_layout(
-            title={'text': 'Top/Bottom 5 Vehicle Types by Customer Rating', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white',
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_top_bottom, use_container_width=True, config={'displayModeBar': False})
-    
+        profile.plotly_chart("Top/Bottom 5 Vehicle Types by Customer Rating", figures["Top/Bottom 5 Vehicle Types by Customer Rating"])
+
     with chart_col4:
-        ratings_vs_value = filtered_df.groupby("Booking ID").agg(
-            booking_value=("Booking Value", "mean"),
-            customer_rating=("Customer Rating", "mean")
-        ).reset_index()
-        fig_scatter = px.scatter(ratings_vs_value, x="booking_value", y="customer_rating", title="Customer Rating vs. Booking Value",
-                                 color_discrete_sequence=['#000'])
-        fig_scatter.update_layout(
-            title={'text': 'Customer Rating vs. Booking Value', 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
-            height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white'
-        )
-        st.plotly_chart(fig_scatter, use_container_width=True, config={'displayModeBar': False})
\ No newline at end of file
+        profile.plotly_chart("Customer Rating vs. Booking Value", figures["Customer Rating vs. Booking Value"])
+
+
+PAGE_RENDERERS = {
+    "OVERALL": overall_page,
+    "VEHICLE TYPE": vehicle_type_page,
+    "REVENUE": revenue_page,
+    "CANCELLATION": cancellation_page,
+    "RATINGS": ratings_page,
+}
+page_fragment(PAGE_RENDERERS[selected])
@@ -0,0 +1,329 @@
+import glob
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from cube import GRAIN, MEASURES, _assemble, build_cube
+from data_loader import CATEGORY_COLUMNS, _category_dtype, calendar_columns, date_slice
+from histograms import HISTOGRAM_BINS, DayHistograms, _edges, build_histograms
+from quantiles import GAMMA, QUANTILE_MEASURES, QuantileSketches, build_quantile_sketches
+from sketches import build_sketches
+from top_customers import build_customer_index
+
+
+# The engine the app queries: "pandas" keeps the cleaned bookings in memory;
+# "duckdb" runs an embedded DuckDB over the Parquet files in HUB_PARQUET_DIR
+# (stream_ingest's default output) and only holds the aggregates.
+QUERY_BACKEND = os.environ.get("HUB_BACKEND", "pandas")
+PARQUET_DIR = os.environ.get("HUB_PARQUET_DIR", "ncr_ride_bookings_parquet")
+DENSITY_BINS = (60, 40)
+
+# Bin centres along each axis and the (len(x), len(y)) point counts.
+DensityGrid = namedtuple("DensityGrid", ["x", "y", "counts"])
+
+
+def _values(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    """Count the ``(x, y)`` pairs in each cell of a 2D grid; pairs with a missing value are dropped."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[keep], y[keep], bins=bins)
+    return DensityGrid((x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts)
+
+
+class PandasBackend:
+    """Queries over the cleaned bookings frame held in memory.
+
+    Every backend answers the same calls, each over the bookings in an
+    inclusive date range that match ``filters`` (a column mapped to a value
+    or a list of values):
+
+    * ``count``: the number of bookings;
+    * ``aggregate``: ``rows`` and a "<measure> sum"/"<measure> sumsq" pair
+      per ``cube.MEASURES``, overall (a Series) or per ``by`` group (a
+      DataFrame), so ``cube.metric`` reads sums, means and counts off it;
+    * ``distinct_count``: exact distinct values of a column, overall or per group;
+    * ``top_k``: the ``k`` groups with the highest total of a measure;
+    * ``rows``: the bookings themselves, for the few charts that need them;
+    * ``density``: a ``DensityGrid`` of two columns.
+
+    ``cube``, ``histograms``, ``quantile_sketches``, ``customer_index`` and
+    ``distinct_sketches`` build the page aggregates; the last two are None
+    when the backend answers those questions itself.
+    """
+
+    def __init__(self, df_clean):
+        self.df_clean = df_clean
+
+    def _select(self, start_date=None, end_date=None, filters=None):
+        rows = date_slice(self.df_clean, start_date, end_date)
+        for col, value in (filters or {}).items():
+            rows = rows[rows[col].isin(_values(value))]
+        return rows
+
+    def count(self, start_date=None, end_date=None, filters=None):
+        return len(self._select(start_date, end_date, filters))
+
+    def aggregate(self, by=None, start_date=None, end_date=None, filters=None):
+        rows = self._select(start_date, end_date, filters)
+        work = pd.DataFrame({"rows": np.ones(len(rows), dtype="int64")}, index=rows.index)
+        for measure in MEASURES:
+            values = rows[measure].astype("float64")
+            work[f"{measure} sum"] = values
+            work[f"{measure} sumsq"] = values * values
+        if by is None:
+            return work.sum()
+        return work.groupby([rows[col] for col in _values(by)], observed=True).sum()
+
+    def distinct_count(self, column, start_date=None, end_date=None, filters=None, by=None):
+        """Exact number of distinct non-missing values of ``column``, overall or per ``by`` group."""
+        rows = self._select(start_date, end_date, filters)
+        if by is None:
+            return int(rows[column].nunique())
+        return rows.groupby(by, observed=True)[column].nunique()
+
+    def top_k(self, by, measure, k, start_date=None, end_date=None, filters=None):
+        """A frame of ``by`` and its ``measure`` total, highest first; zero totals are left out."""
+        rows = self._select(start_date, end_date, filters)
+        totals = rows.groupby(by, observed=True, sort=False)[measure].sum()
+        totals = totals[totals != 0].sort_values(ascending=False, kind="stable").head(k)
+        return totals.reset_index()
+
+    def rows(self, columns, start_date=None, end_date=None, filters=None):
+        return self._select(start_date, end_date, filters)[columns]
+
+    def density(self, x, y, start_date=None, end_date=None, filters=None, bins=DENSITY_BINS):
+        rows = self._select(start_date, end_date, filters)
+        return density_grid(rows[x], rows[y], bins)
+
+    def cube(self):
+        return build_cube(self.df_clean)
+
+    def histograms(self):
+        return build_histograms(self.df_clean)
+
+    def quantile_sketches(self):
+        return build_quantile_sketches(self.df_clean)
+
+    def customer_index(self):
+        return build_customer_index(self.df_clean)
+
+    def distinct_sketches(self):
+        return build_sketches(self.df_clean)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _where(start_date=None, end_date=None, filters=None, required=()):
+    """A WHERE clause and its parameters; ``required`` columns must be present."""
+    clauses, params = [f"{_quote(col)} IS NOT NULL" for col in required], []
+    if start_date is not None:
+        clauses.append('"DateOnly" >= ?')
+        params.append(pd.Timestamp(start_date).normalize().to_pydatetime())
+    if end_date is not None:
+        clauses.append('"DateOnly" < ?')
+        params.append((pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_pydatetime())
+    for col, value in (filters or {}).items():
+        values = _values(value)
+        clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})" if values else "FALSE")
+        params.extend(values)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def parquet_version(directory=PARQUET_DIR):
+    """Cache key for the Parquet files under ``directory``: (directory, files, newest mtime, total size).
+
+    Raises ``FileNotFoundError`` when it holds no Parquet files.
+    """
+    directory = os.path.abspath(directory)
+    stats = [os.stat(path) for path in glob.glob(os.path.join(directory, "**", "*.parquet"), recursive=True)]
+    if not stats:
+        raise FileNotFoundError(f"No Parquet files under {directory}")
+    return directory, len(stats), max(stat.st_mtime_ns for stat in stats), sum(stat.st_size for stat in stats)
+
+
+class DuckDBBackend:
+    """The ``PandasBackend`` queries run by an embedded DuckDB over a Parquet dataset.
+
+    ``directory`` is read as written by ``stream_ingest``: every
+    ``*.parquet`` file below it, with the columns of the cleaned bookings.
+    Nothing but query results is loaded into memory, so the aggregates of
+    histories far larger than memory are built by scanning the files, and
+    DuckDB spills to disk when a query needs to. There is no customer index
+    or distinct-ID sketch: ``top_k`` and ``distinct_count`` answer those
+    queries directly, and distinct counts are always exact (DuckDB's
+    ``approx_count_distinct`` is far less accurate than ``sketches``). Each
+    query runs on its own cursor, so sessions can query from several threads.
+    """
+
+    def __init__(self, directory=PARQUET_DIR):
+        if duckdb is None:
+            raise ImportError("duckdb is required for the DuckDB backend.")
+        self.directory = directory
+        pattern = os.path.join(os.path.abspath(directory), "**", "*.parquet").replace("'", "''")
+        self._con = duckdb.connect()
+        self._con.execute(f"CREATE VIEW bookings AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = false)")
+        self._dtypes = {}
+
+    def _query(self, sql, params=()):
+        return self._con.cursor().execute(sql, list(params)).df()
+
+    def _dtype(self, column):
+        # The categories df_clean would have: the known values, then any others present.
+        if column not in self._dtypes:
+            present = self._query(f"SELECT DISTINCT {_quote(column)} AS v FROM bookings")["v"]
+            self._dtypes[column] = _category_dtype(present, CATEGORY_COLUMNS[column])
+        return self._dtypes[column]
+
+    def _typed(self, frame):
+        for col in frame.columns:
+            if col in CATEGORY_COLUMNS:
+                frame[col] = frame[col].astype(self._dtype(col))
+            elif col == "DateOnly":
+                frame[col] = frame[col].astype("datetime64[s]")
+        return frame
+
+    def _by(self, frame, by):
+        frame = self._typed(frame)
+        return frame.set_index(by).sort_index()
+
+    def count(self, start_date=None, end_date=None, filters=None):
+        where, params = _where(start_date, end_date, filters)
+        return int(self._query(f"SELECT count(*) AS n FROM bookings {where}", params)["n"].iloc[0])
+
+    def _sums(self):
+        sums = ["count(*) AS rows"]
+        for measure in MEASURES:
+            value = f"CAST({_quote(measure)} AS DOUBLE)"
+            sums.append(f"fsum({value}) AS {_quote(measure + ' sum')}")
+            sums.append(f"fsum({value} * {value}) AS {_quote(measure + ' sumsq')}")
+        return sums
+
+    def aggregate(self, by=None, start_date=None, end_date=None, filters=None):
+        where, params = _where(start_date, end_date, filters)
+        keys = [] if by is None else [_quote(col) for col in _values(by)]
+        group = f"GROUP BY {', '.join(keys)}" if keys else ""
+        sums = self._query(f"SELECT {', '.join(keys + self._sums())} FROM bookings {where} {group}", params)
+        if by is None:
+            return sums.iloc[0].fillna(0)
+        return self._by(sums, by)
+
+    def distinct_count(self, column, start_date=None, end_date=None, filters=None, by=None):
+        where, params = _where(start_date, end_date, filters)
+        count = f"count(DISTINCT {_quote(column)})"
+        if by is None:
+            return int(self._query(f"SELECT {count} AS n FROM bookings {where}", params)["n"].iloc[0])
+        counts = self._query(f"SELECT {_quote(by)}, {count} AS n FROM bookings {where} GROUP BY 1", params)
+        return self._by(counts, by)["n"].astype("int64")
+
+    def top_k(self, by, measure, k, start_date=None, end_date=None, filters=None):
+        """A frame of ``by`` and its ``measure`` total, highest first; zero totals are left out."""
+        where, params = _where(start_date, end_date, filters, required=[by])
+        totals = self._query(
+            f"SELECT {_quote(by)}, fsum({_quote(measure)}) AS total FROM bookings {where} "
+            f"GROUP BY 1 HAVING total <> 0 ORDER BY total DESC, 1 LIMIT {int(k)}", params)
+        return totals.rename(columns={"total": measure})
+
+    def rows(self, columns, start_date=None, end_date=None, filters=None):
+        where, params = _where(start_date, end_date, filters)
+        selected = ", ".join(_quote(col) for col in columns)
+        return self._typed(self._query(f'SELECT {selected} FROM bookings {where} ORDER BY "Date"', params))
+
+    def _bin(self, column, lo, width, n_bins):
+        # Equal-width bin of ``column``, with the maximum in the last bin like np.histogram.
+        return f"least(greatest(floor(({_quote(column)} - {float(lo)!r}) / {float(width)!r}), 0), {n_bins - 1})::BIGINT"
+
+    def density(self, x, y, start_date=None, end_date=None, filters=None, bins=DENSITY_BINS):
+        where, params = _where(start_date, end_date, filters, required=[x, y])
+        bounds = self._query(f"SELECT min({_quote(x)}) AS x0, max({_quote(x)}) AS x1, min({_quote(y)}) AS y0, "
+                             f"max({_quote(y)}) AS y1 FROM bookings {where}", params).iloc[0]
+        edges = []
+        for lo, hi, n_bins in [(bounds["x0"], bounds["x1"], bins[0]), (bounds["y0"], bounds["y1"], bins[1])]:
+            lo, hi = (0.0, 1.0) if pd.isna(lo) else (float(lo), float(hi))
+            if lo == hi:
+                lo, hi = lo - 0.5, hi + 0.5
+            edges.append(np.linspace(lo, hi, n_bins + 1))
+        cells = self._query(
+            f"SELECT {self._bin(x, edges[0][0], edges[0][1] - edges[0][0], bins[0])} AS i, "
+            f"{self._bin(y, edges[1][0], edges[1][1] - edges[1][0], bins[1])} AS j, count(*) AS n "
+            f"FROM bookings {where} GROUP BY ALL", params)
+        counts = np.zeros(bins, dtype=np.float64)
+        np.add.at(counts, (cells["i"].to_numpy(), cells["j"].to_numpy()), cells["n"].to_numpy())
+        return DensityGrid((edges[0][:-1] + edges[0][1:]) / 2, (edges[1][:-1] + edges[1][1:]) / 2, counts)
+
+    def cube(self):
+        """The booking cube, aggregated by DuckDB: one GROUP BY for the cells, one scan for the repeated IDs."""
+        grain = ", ".join(_quote(col) for col in GRAIN)
+        repeated = ('WITH marked AS (SELECT *, count(*) OVER (PARTITION BY "Booking ID") > 1 AS repeated '
+                    'FROM bookings) ')
+        cells = self._query(
+            f"{repeated}SELECT {grain}, count(*) AS rows, count(*) FILTER (WHERE NOT repeated) AS unique_id_rows, "
+            f"{', '.join(self._sums()[1:])} FROM marked GROUP BY ALL ORDER BY \"DateOnly\" NULLS LAST")
+        cells = self._typed(cells)
+        cells = cells.assign(**calendar_columns(cells["DateOnly"]))
+        duplicates = self._typed(self._query(
+            f'{repeated}SELECT {grain}, "Booking ID" FROM marked WHERE repeated ORDER BY "DateOnly" NULLS LAST, "Date"'))
+        duplicates = duplicates.assign(**calendar_columns(duplicates["DateOnly"]))
+        return _assemble(cells, duplicates)
+
+    def _day_index(self):
+        return self._typed(self._query(
+            'SELECT DISTINCT "DateOnly" FROM bookings WHERE "DateOnly" IS NOT NULL ORDER BY 1'))["DateOnly"]
+
+    def histograms(self):
+        """``build_histograms`` over the Parquet files: DuckDB counts each day's rows per bin."""
+        days = self._day_index()
+        edges, counts = {}, {}
+        for col, bins in HISTOGRAM_BINS.items():
+            bounds = self._query(f"SELECT min({_quote(col)}) AS lo, max({_quote(col)}) AS hi FROM bookings").iloc[0]
+            ends = np.array([] if pd.isna(bounds["lo"]) else [bounds["lo"], bounds["hi"]], dtype=np.float64)
+            edges[col] = _edges(ends, bins)
+            n_bins = len(edges[col]) - 1
+            width = edges[col][1] - edges[col][0]
+            day_counts = self._typed(self._query(
+                f'SELECT "DateOnly", {self._bin(col, edges[col][0], width, n_bins)} AS bin, count(*) AS n '
+                f'FROM bookings WHERE "DateOnly" IS NOT NULL AND {_quote(col)} IS NOT NULL GROUP BY ALL'))
+            grid = np.zeros((len(days), n_bins), dtype=np.int64)
+            np.add.at(grid, (days.searchsorted(day_counts["DateOnly"]), day_counts["bin"].to_numpy()),
+                      day_counts["n"].to_numpy())
+            counts[col] = grid
+        return DayHistograms(pd.DataFrame({"DateOnly": days}), edges, counts)
+
+    def quantile_sketches(self):
+        """``build_quantile_sketches`` over the Parquet files: DuckDB counts each day and vehicle's rows per bucket."""
+        first, last = self._query('SELECT min("DateOnly") AS lo, max("DateOnly") AS hi FROM bookings').iloc[0]
+        days = pd.date_range(first, last, freq="D", name="DateOnly").astype("datetime64[s]")
+        vehicles = pd.Index(self._dtype("Vehicle Type").categories)
+        offsets, counts = {}, {}
+        for measure in QUANTILE_MEASURES:
+            buckets = self._typed(self._query(
+                f'SELECT "DateOnly", "Vehicle Type", ceil(ln({_quote(measure)}) / ln({GAMMA!r}))::BIGINT AS bucket, '
+                f'count(*) AS n FROM bookings WHERE "DateOnly" IS NOT NULL AND "Vehicle Type" IS NOT NULL '
+                f'AND {_quote(measure)} > 0 GROUP BY ALL'))
+            keys = buckets["bucket"].to_numpy()
+            offset = int(keys.min()) if keys.size else 0
+            n_buckets = int(keys.max()) - offset + 1 if keys.size else 1
+            grid = np.zeros((len(days), len(vehicles), n_buckets), dtype=np.int32)
+            np.add.at(grid, (days.get_indexer(buckets["DateOnly"]), buckets["Vehicle Type"].cat.codes.to_numpy(),
+                             keys - offset), buckets["n"].to_numpy())
+            offsets[measure], counts[measure] = offset, grid
+        return QuantileSketches(days, vehicles, offsets, counts)
+
+    def customer_index(self):
+        return None
+
+    def distinct_sketches(self):
+        return None
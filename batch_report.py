@@ -0,0 +1,140 @@
+import argparse
+import html
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from analytics import PAGES, DensityGrid, read_dataset
+from charts import page_figures
+from data_loader import DATA_PATH
+
+
+REPORT_DIR = "reports"
+FORMATS = ["html", "json"]
+
+# The dataset each worker process computes from, loaded once per process.
+_data = None
+
+
+def _init_worker(path):
+    global _data
+    if _data is None:
+        _data = read_dataset(path)
+
+
+def parse_range(value):
+    """``(start, end)`` dates from ``"YYYY-MM-DD:YYYY-MM-DD"``."""
+    start, end = value.split(":")
+    return date.fromisoformat(start), date.fromisoformat(end)
+
+
+def month_ranges(first, last):
+    """``(start, end)`` of every calendar month from ``first`` to ``last``, clipped to them."""
+    months = pd.period_range(first, last, freq="M")
+    return [(max(month.start_time.date(), first), min(month.end_time.date(), last)) for month in months]
+
+
+def jsonable(value):
+    """Page results as plain JSON types: frames as records, series as ``{"name", "index", "data"}``."""
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient="records", date_format="iso"))
+    if isinstance(value, pd.Series):
+        return json.loads(value.to_json(orient="split", date_format="iso"))
+    if isinstance(value, DensityGrid):
+        return {field: jsonable(v) for field, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return jsonable(value.tolist())
+    if isinstance(value, list):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def report_html(page, start_date, end_date, results, figures):
+    """A standalone HTML page: the KPIs with their deltas, every figure and any table charts."""
+    parts = [f"<h1>{html.escape(page)}</h1>", f"<p>{start_date} to {end_date}</p>", "<table>",
+             "<tr><th>KPI</th><th>Value</th><th>vs previous period</th><th>vs last year</th></tr>"]
+    for name, value in results["kpis"].items():
+        deltas = results["deltas"][name]
+        parts.append(f"<tr><th>{html.escape(name)}</th><td>{jsonable(value)}</td>"
+                     f"<td>{jsonable(deltas.get('previous'))}</td><td>{jsonable(deltas.get('last_year'))}</td></tr>")
+    parts.append("</table>")
+    plotlyjs = "cdn"
+    for title, data in results["charts"].items():
+        fig = figures.get(title)
+        if fig is not None:
+            parts.append(fig.to_html(full_html=False, include_plotlyjs=plotlyjs))
+            plotlyjs = False
+        elif isinstance(data, pd.DataFrame):
+            parts.append(f"<h2>{html.escape(title)}</h2>" + data.to_html(index=False))
+    return f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(page)}</title></head><body>\n" + "\n".join(parts) + "\n</body></html>\n"
+
+
+def write_report(task):
+    """Compute one page for one date range and write its reports; returns the paths and seconds taken."""
+    page, start_date, end_date, out_dir, formats = task
+    started = time.perf_counter()
+    results = PAGES[page](_data, start_date, end_date)
+    directory = os.path.join(out_dir, f"{start_date}_{end_date}")
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.join(directory, page.lower().replace(" ", "_"))
+    paths = []
+    if "json" in formats:
+        with open(f"{name}.json", "w") as f:
+            json.dump({"page": page, "start_date": str(start_date), "end_date": str(end_date), **jsonable(results)}, f)
+        paths.append(f"{name}.json")
+    if "html" in formats:
+        with open(f"{name}.html", "w", encoding="utf-8") as f:
+            f.write(report_html(page, start_date, end_date, results, page_figures(page, results["charts"])))
+        paths.append(f"{name}.html")
+    return paths, time.perf_counter() - started
+
+
+def run_reports(ranges, path=DATA_PATH, out_dir=REPORT_DIR, formats=FORMATS, pages=None, workers=None, monthly=False):
+    """Write every page in ``pages`` (all by default) for each date range, fanned out over ``workers`` processes.
+
+    With no ``ranges`` and no ``monthly``, the whole date range of the data is
+    reported. Yields ``(paths, seconds)`` per page and range as they finish.
+    """
+    global _data
+    _data = read_dataset(path)
+    first = _data.cube.cells["DateOnly"].min().date()
+    last = _data.cube.cells["DateOnly"].max().date()
+    ranges = list(ranges) + (month_ranges(first, last) if monthly else [])
+    tasks = [(page, start, end, out_dir, formats) for start, end in ranges or [(first, last)] for page in pages or PAGES]
+    if workers == 1:
+        yield from map(write_report, tasks)
+        return
+    # Forked workers inherit the dataset loaded above; spawned ones read it once each.
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path,)) as pool:
+        yield from pool.map(write_report, tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute dashboard pages for date ranges into static HTML/JSON reports.")
+    parser.add_argument("ranges", nargs="*", type=parse_range, help="date ranges as START:END, e.g. 2024-01-01:2024-03-31")
+    parser.add_argument("--monthly", action="store_true", help="also report every calendar month in the data")
+    parser.add_argument("--csv", default=DATA_PATH, help="bookings CSV to report on")
+    parser.add_argument("--out", default=REPORT_DIR, help="directory the reports are written under")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=FORMATS, dest="formats")
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), help="pages to report (default: all)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = 0
+    for paths, seconds in run_reports(args.ranges, args.csv, args.out, args.formats, args.pages, args.workers, args.monthly):
+        written += len(paths)
+        print(f"{seconds:6.2f}s  {', '.join(paths)}")
+    print(f"Wrote {written} files in {time.perf_counter() - started:.1f}s")
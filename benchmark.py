@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from cube import build_cube
+from data_loader import DATA_PATH, clean_bookings, csv_version, read_raw_bookings, read_snapshot, snapshot_path, write_snapshot
+from histograms import build_histograms
+from quantiles import build_quantile_sketches
+from sketches import build_sketches
+from synthetic_data import SIZES, parse_rows, write_synthetic_csv
+from timeseries import build_daily_series
+from top_customers import build_customer_index
+
+
+BENCH_DIR = "bench_data"
+PAGES = ["OVERALL", "VEHICLE TYPE", "REVENUE", "CANCELLATION", "RATINGS"]
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(APP_PATH),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _RunLog(logging.Handler):
+    """Keeps the JSON record ``profiling`` logs for each script run."""
+
+    def __init__(self):
+        super().__init__()
+        self.runs = []
+
+    def emit(self, record):
+        self.runs.append(json.loads(record.getMessage()))
+
+
+class Recorder:
+    """Times benchmark steps and collects one result dict per step."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.results = []
+        self.context = {"commit": commit(), "python": platform.python_version(), "pandas": pd.__version__}
+
+    def step(self, name, fn, rows=None, **extra):
+        rows = self.rows if rows is None else rows
+        started = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - started
+        self.results.append({
+            **self.context, "rows": rows, "step": name, "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds) if seconds > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1), **extra,
+        })
+        return value
+
+
+def _bench_pages(recorder, data_dir):
+    """Render each page headless with ``AppTest``: once with an empty page cache, then again."""
+    from streamlit.testing.v1 import AppTest
+
+    import profiling
+    from page_cache import shared_page_cache
+
+    handler = _RunLog()
+    profiling.logger.addHandler(handler)
+    profiling.logger.setLevel(logging.INFO)
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        app = AppTest.from_file(APP_PATH, default_timeout=3600)
+        recorder.step("app first run", app.run)
+        for page in PAGES:
+            app.button(key=f"nav_{page}").click()
+            shared_page_cache.clear()
+            for name in (f"page {page}", f"page {page} (cached)"):
+                recorder.step(name, app.run)
+                if app.exception:
+                    raise RuntimeError(f"{page}: {app.exception[0].value}")
+                recorder.results[-1]["stages"] = {stage["stage"]: round(stage["seconds"], 6) for stage in handler.runs[-1]["stages"]}
+    finally:
+        os.chdir(cwd)
+        profiling.logger.removeHandler(handler)
+
+
+def run_benchmark(rows, data_dir=BENCH_DIR, seed=0, pages=True):
+    """Time every stage from CSV to rendered pages on ``rows`` synthetic bookings.
+
+    The CSV is generated under ``data_dir/<rows>/`` unless it already exists.
+    Returns one dict per step with wall time, rows/sec and the process's peak
+    RSS so far.
+    """
+    size_dir = os.path.join(data_dir, str(rows))
+    csv_path = os.path.join(size_dir, DATA_PATH)
+    recorder = Recorder(rows)
+    if not os.path.exists(csv_path):
+        recorder.step("generate", lambda: write_synthetic_csv(csv_path, rows, seed))
+
+    # Tag the snapshot with the CSV it came from, so the app's first run maps it instead of parsing the CSV.
+    version = csv_version(csv_path)
+    # The frames are bound as default arguments because they are deleted
+    # below to keep the page steps' peak RSS apart from the build steps'.
+    raw = recorder.step("read csv", lambda: read_raw_bookings(csv_path))
+    df_clean = recorder.step("clean", lambda raw=raw: clean_bookings(raw))
+    del raw
+    recorder.step("write snapshot", lambda df=df_clean: write_snapshot(df, snapshot_path(csv_path), version))
+    recorder.step("read snapshot", lambda: read_snapshot(snapshot_path(csv_path)))
+    cube = recorder.step("build cube", lambda df=df_clean: build_cube(df))
+    recorder.step("build daily series", lambda cube=cube: build_daily_series(cube))
+    recorder.step("build histograms", lambda df=df_clean: build_histograms(df))
+    recorder.step("build customer index", lambda df=df_clean: build_customer_index(df))
+    recorder.step("build sketches", lambda df=df_clean: build_sketches(df))
+    recorder.step("build quantile sketches", lambda df=df_clean: build_quantile_sketches(df))
+    del df_clean, cube
+    if pages:
+        _bench_pages(recorder, size_dir)
+    return recorder.results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loading and every dashboard page on synthetic data.")
+    parser.add_argument("sizes", nargs="*", default=["100k"], help=f"row counts or any of {', '.join(SIZES)}")
+    parser.add_argument("--data-dir", default=BENCH_DIR, help="where generated CSVs are kept between runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-pages", action="store_true", help="skip rendering the pages")
+    parser.add_argument("--output", help="also append the JSON lines to this file")
+    args = parser.parse_args()
+
+    if len(args.sizes) > 1:
+        # One process per size, so each peak RSS belongs to that size alone.
+        for size in args.sizes:
+            command = [sys.executable, os.path.abspath(__file__), size, "--data-dir", args.data_dir, "--seed", str(args.seed)]
+            command += ["--no-pages"] if args.no_pages else []
+            command += ["--output", args.output] if args.output else []
+            subprocess.run(command, check=True)
+        sys.exit(0)
+
+    lines = [json.dumps(result) for result in run_benchmark(parse_rows(args.sizes[0]), args.data_dir, args.seed, not args.no_pages)]
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write("\n".join(lines) + "\n")
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def build_bitmaps(frame, columns):
+    """Packed bitmaps ``{column: {value: bits}}`` for categorical ``columns``.
+
+    Each bitmap has one bit per row of ``frame`` (``np.packbits`` order) and
+    is set where the row holds that value. Values that never occur get no
+    entry.
+    """
+    index = {}
+    for col in columns:
+        codes = frame[col].cat.codes.to_numpy()
+        index[col] = {}
+        for code, value in enumerate(frame[col].cat.categories):
+            hits = codes == code
+            if hits.any():
+                index[col][value] = np.packbits(hits)
+    return index
+
+
+def matching_values(index, column, pattern):
+    """Indexed values of ``column`` containing ``pattern``, e.g. every "Cancelled" status."""
+    return [value for value in index[column] if pattern in value]
+
+
+def select_rows(index, n_rows, filters, lo=0, hi=None):
+    """Positions in ``[lo, hi)`` of the rows that pass every filter.
+
+    ``filters`` maps an indexed column to a value or a list of values (any of
+    which may match). The per-column bitmaps are OR-ed, AND-ed across columns
+    and only the ``[lo, hi)`` window is unpacked.
+    """
+    hi = n_rows if hi is None else hi
+    empty = np.zeros((n_rows + 7) // 8, dtype=np.uint8)
+    bits = None
+    for col, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        col_bits = empty
+        for v in values:
+            if not pd.isna(v) and v in index[col]:
+                col_bits = col_bits | index[col][v]
+        bits = col_bits if bits is None else bits & col_bits
+    if bits is None:
+        return np.arange(lo, hi)
+
+    first_byte = lo // 8
+    window = np.unpackbits(bits[first_byte:(hi + 7) // 8])
+    window = window[lo - first_byte * 8:hi - first_byte * 8]
+    return np.flatnonzero(window) + lo
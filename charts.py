@@ -0,0 +1,187 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from backends import DensityGrid
+
+
+# Point count at which a scatter switches from SVG to WebGL.
+WEBGL_POINTS = 1_000
+DENSITY_COLORSCALE = [[0, '#ccc'], [1, '#000']]
+GREYS = ['#000', '#333', '#666', '#999', '#ccc', '#e0e0e0']
+TOP_LEGEND = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+
+
+def scatter_render_mode(points):
+    """``render_mode`` for ``px.scatter``: SVG for small charts, WebGL above ``WEBGL_POINTS``."""
+    return "webgl" if points > WEBGL_POINTS else "svg"
+
+
+def density_heatmap(grid, x_name, y_name):
+    """A ``go.Heatmap`` of a ``DensityGrid``; empty cells are left blank.
+
+    Only the bin centres and counts reach the browser.
+    """
+    z = np.where(grid.counts > 0, grid.counts, np.nan).T
+    return go.Heatmap(
+        x=grid.x, y=grid.y, z=z,
+        colorscale=DENSITY_COLORSCALE, colorbar=dict(title="Bookings"),
+        hovertemplate=f"{x_name}: %{{x:.3g}}<br>{y_name}: %{{y:.3g}}<br>Bookings: %{{z}}<extra></extra>",
+    )
+
+
+def histogram_bars(bins, name=None, color='#000', opacity=None):
+    """A ``go.Bar`` trace drawing a pre-binned histogram frame of "left", "right" and "count".
+
+    Only the bin centres, widths and counts are sent to the browser.
+    """
+    left = bins["left"].to_numpy()
+    right = bins["right"].to_numpy()
+    return go.Bar(x=(left + right) / 2, y=bins["count"].to_numpy(), width=right - left, name=name,
+                  marker_color=color, opacity=opacity)
+
+
+def _style(fig, title, **layout):
+    fig.update_layout(
+        title={'text': title, 'x': 0.5, 'xanchor': 'center', 'font': {'size': 14, 'color': '#000'}},
+        height=300, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='white', plot_bgcolor='white', **layout
+    )
+    return fig
+
+
+def bar_figure(series, title):
+    return _style(go.Figure([go.Bar(x=series.index, y=series.values, marker_color='#000')]), title, showlegend=False)
+
+
+def area_figure(series, title):
+    return _style(go.Figure([go.Scatter(x=series.index, y=series.values, line=dict(color='#000'), fill='tozeroy')]), title, showlegend=False)
+
+
+def reasons_pie(reasons, title):
+    return _style(px.pie(names=reasons.index, values=reasons.values, title=title, color_discrete_sequence=GREYS[:5]), title)
+
+
+def vehicle_bars(grouped, title):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=grouped['Vehicle Type'], y=grouped['total_booking_value'], name='Booking Value', marker_color='#000'))
+    fig.add_trace(go.Bar(x=grouped['Vehicle Type'], y=grouped['total_distance_travelled'], name='Distance', marker_color='#666'))
+    return _style(fig, title, barmode='group', legend=TOP_LEGEND)
+
+
+def revenue_share_pie(grouped, title):
+    fig = px.pie(grouped, values='total_booking_value', names='Vehicle Type', title=title, hole=0.5, color_discrete_sequence=GREYS)
+    return _style(fig, title, legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1))
+
+
+def revenue_distance_bubbles(grouped, title):
+    title = f"{title} (Bubble size indicates Avg. Distance)"
+    fig = px.scatter(grouped, x="total_booking_value", y="total_distance_travelled", size="avg_distance_travelled", color="Vehicle Type",
+                     hover_name="Vehicle Type", size_max=60, title=title,
+                     render_mode=scatter_render_mode(len(grouped)), color_discrete_sequence=GREYS)
+    return _style(fig, title, legend=TOP_LEGEND)
+
+
+def booking_value_histogram(bins, title):
+    fig = go.Figure([histogram_bars(bins)])
+    fig.update_xaxes(title="Booking Value")
+    fig.update_yaxes(title="count")
+    return _style(fig, title, showlegend=False, bargap=0)
+
+
+def ratings_histogram(bins, title):
+    fig = go.Figure([
+        histogram_bars(bins[col], name=col, color=color, opacity=0.6)
+        for col, color in zip(bins, ['#000', '#666'])
+    ])
+    fig.update_xaxes(title="value")
+    fig.update_yaxes(title="count")
+    return _style(fig, title, barmode="overlay", bargap=0, legend=TOP_LEGEND)
+
+
+def percentile_boxes(percentiles, title):
+    """One box per vehicle from precomputed percentiles: p25 to p75 with the median, whiskers at p5 and p95, p99 marked."""
+    vehicles = percentiles["Vehicle Type"]
+    fig = go.Figure([
+        go.Box(x=vehicles, q1=percentiles["p25"], median=percentiles["median"], q3=percentiles["p75"],
+               lowerfence=percentiles["p5"], upperfence=percentiles["p95"], name="p5–p95",
+               marker_color='#000', fillcolor='#ccc'),
+        go.Scatter(x=vehicles, y=percentiles["p99"], mode='markers', name='p99', marker=dict(color='#666', symbol='line-ew-open', size=14)),
+        go.Scatter(x=vehicles, y=percentiles["p90"], mode='markers', name='p90', marker=dict(color='#999', symbol='line-ew-open', size=14)),
+    ])
+    return _style(fig, title, legend=TOP_LEGEND)
+
+
+def rating_trend(daily_ratings, title):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=daily_ratings['DateOnly'], y=daily_ratings['avg_cust_rating'], mode='lines', name='Customer Rating', line=dict(color='#000')))
+    fig.add_trace(go.Scatter(x=daily_ratings['DateOnly'], y=daily_ratings['avg_driver_rating'], mode='lines', name='Driver Rating', line=dict(color='#666')))
+    return _style(fig, title, legend=TOP_LEGEND)
+
+
+def top_bottom_bars(top_bottom_vehicles, title):
+    fig = px.bar(top_bottom_vehicles, x='Vehicle Type', y='Customer Rating', color='Performance', title=title,
+                 color_discrete_map={'Top 5': '#000', 'Bottom 5': '#ccc'})
+    return _style(fig, title, legend=TOP_LEGEND)
+
+
+def rating_scatter(points, title):
+    """Customer Rating against Booking Value: a point per booking, or a heatmap of a ``DensityGrid``."""
+    if isinstance(points, DensityGrid):
+        fig = go.Figure([density_heatmap(points, "Booking Value", "Customer Rating")])
+        fig.update_xaxes(title="Booking Value")
+        fig.update_yaxes(title="Customer Rating")
+    else:
+        fig = px.scatter(points, x="Booking Value", y="Customer Rating", title=title,
+                         render_mode=scatter_render_mode(len(points)), color_discrete_sequence=['#000'])
+    return _style(fig, title)
+
+
+# How each page's ``analytics`` chart data is drawn, by chart title.
+PAGE_FIGURES = {
+    "OVERALL": {
+        "Bookings by Hour": bar_figure,
+        "Bookings by Weekday": bar_figure,
+        "Daily Trend (7-day Moving Average)": area_figure,
+    },
+    "VEHICLE TYPE": {
+        "Booking Value & Distance by Vehicle": vehicle_bars,
+        "Revenue Share by Vehicle": revenue_share_pie,
+        "Revenue vs. Distance": revenue_distance_bubbles,
+        "Booking Value Percentiles by Vehicle": percentile_boxes,
+        "Ride Distance Percentiles by Vehicle": percentile_boxes,
+    },
+    "REVENUE": {
+        "Daily Revenue Trend": area_figure,
+        "Monthly Revenue Trend": bar_figure,
+        "Revenue by Vehicle Type": bar_figure,
+        "Revenue by Payment Method": bar_figure,
+        "Histogram of Booking Values": booking_value_histogram,
+        "Booking Value Percentiles by Vehicle Type": percentile_boxes,
+    },
+    "CANCELLATION": {
+        "Customer Cancellation Reasons": reasons_pie,
+        "Driver Cancellation Reasons": reasons_pie,
+        "Cancellations Over Time": area_figure,
+        "Cancellations by Hour": bar_figure,
+        "Revenue Loss by Vehicle Type": bar_figure,
+    },
+    "RATINGS": {
+        "Distribution of Ratings": ratings_histogram,
+        "Average Daily Rating Trend": rating_trend,
+        "Top/Bottom 5 Vehicle Types by Customer Rating": top_bottom_bars,
+        "Customer Rating vs. Booking Value": rating_scatter,
+    },
+}
+
+
+def page_figures(page, charts, mark=None):
+    """The figures for ``page``'s chart data, by title; None where the data is None.
+
+    ``mark``, when given, is called with ``"<title>: build"`` after each figure.
+    """
+    figures = {}
+    for title, build in PAGE_FIGURES[page].items():
+        figures[title] = None if charts[title] is None else build(charts[title], title)
+        if mark is not None:
+            mark(f"{title}: build")
+    return figures
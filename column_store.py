@@ -0,0 +1,252 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from analytics import Dataset, build_dataset
+from backends import PandasBackend
+from cube import Cube
+from data_loader import DATA_PATH, _fresh_snapshot, read_bookings, read_snapshot
+from histograms import DayHistograms
+from quantiles import QuantileSketches
+from sketches import DistinctSketches
+from timeseries import DailySeries
+from top_customers import CustomerIndex
+
+
+# Directory of the shared column store; set HUB_COLUMN_STORE to have the app
+# attach to it instead of loading its own copy of the bookings. A path under
+# /dev/shm keeps the store in RAM.
+STORE_DIR = os.environ.get("HUB_COLUMN_STORE")
+CURRENT = "CURRENT"
+LAYOUT = "columns.json"
+# The dataset's aggregates, published next to the columns so that replicas
+# map them instead of each building their own.
+AGGREGATES = "aggregates.json"
+AGGREGATE_FIELDS = ["cube", "histograms", "customers", "daily", "sketches", "quantiles"]
+_TUPLES = {kind.__name__: kind for kind in (Cube, DayHistograms, CustomerIndex, DailySeries, DistinctSketches, QuantileSketches)}
+# Published versions kept on disk. A replica must pick up a new version
+# before this many more are published, or the one it is about to attach to
+# may already be gone.
+KEEP_VERSIONS = 3
+
+
+def _versions(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("v") and name[1:].isdigit())
+
+
+def _write_column(path, position, values):
+    """Save one column as ``<position>*.npy`` files and return its layout entry."""
+    def save(suffix, array):
+        np.save(os.path.join(path, f"{position}{suffix}.npy"), np.ascontiguousarray(array))
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        save("", values.array.codes)
+        return {"kind": "category", "categories": values.cat.categories.tolist(), "ordered": bool(values.cat.ordered)}
+    if pd.api.types.is_string_dtype(values.dtype):
+        # Arrow's large_string layout: int64 offsets into one UTF-8 buffer, plus a validity bitmap.
+        array = pa.array(values, type=pa.large_string(), from_pandas=True)
+        if isinstance(array, pa.ChunkedArray):
+            # Columns read from a snapshot come in several record batches.
+            array = array.combine_chunks()
+        validity, offsets, data = array.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64)[:len(array) + 1]
+        save(".offsets", offsets)
+        save(".data", np.frombuffer(data, dtype=np.uint8)[:offsets[-1]] if data is not None else np.empty(0, np.uint8))
+        if array.null_count:
+            save(".validity", np.frombuffer(validity, dtype=np.uint8)[:-(-len(array) // 8)])
+        return {"kind": "string", "null_count": array.null_count}
+    save("", values.to_numpy())
+    return {"kind": "array"}
+
+
+def _map(path):
+    try:
+        return np.load(path, mmap_mode="r").view(np.ndarray)
+    except ValueError:
+        # Empty arrays cannot be memory-mapped.
+        return np.load(path)
+
+
+def _read_column(path, position, spec, rows):
+    def load(suffix=""):
+        return _map(os.path.join(path, f"{position}{suffix}.npy"))
+
+    if spec["kind"] == "category":
+        dtype = pd.CategoricalDtype(spec["categories"], ordered=spec["ordered"])
+        return pd.Categorical.from_codes(load(), dtype=dtype, validate=False)
+    if spec["kind"] == "string":
+        validity = pa.py_buffer(load(".validity")) if spec["null_count"] else None
+        array = pa.Array.from_buffers(pa.large_string(), rows,
+                                      [validity, pa.py_buffer(load(".offsets")), pa.py_buffer(load(".data"))],
+                                      spec["null_count"])
+        return pd.arrays.ArrowStringArray(pa.chunked_array([array]), dtype=pd.StringDtype("pyarrow", na_value=np.nan))
+    return load()
+
+
+def _write_value(path, value, names):
+    """Save ``value`` under ``path`` and return the JSON spec ``_read_value`` rebuilds it from.
+
+    Frames, indexes and arrays go to ``.npy`` files named from the ``names``
+    iterator; dicts, tuples, the aggregate namedtuples and scalars are
+    described in the spec itself.
+    """
+    if isinstance(value, pd.DataFrame):
+        index = None if value.index.equals(pd.RangeIndex(len(value))) else _write_value(path, value.index, names)
+        columns = []
+        for col in value.columns:
+            name = next(names)
+            columns.append({"name": col, "file": name, **_write_column(path, name, value[col])})
+        return {"kind": "frame", "rows": len(value), "index": index, "columns": columns}
+    if isinstance(value, pd.Index):
+        name = next(names)
+        return {"kind": "index", "name": value.name, "rows": len(value), "file": name,
+                "column": _write_column(path, name, pd.Series(value, copy=False))}
+    if isinstance(value, np.ndarray):
+        name = next(names)
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(value))
+        return {"kind": "ndarray", "file": name}
+    if isinstance(value, dict):
+        return {"kind": "dict", "items": [[_write_value(path, key, names), _write_value(path, item, names)]
+                                          for key, item in value.items()]}
+    if isinstance(value, tuple):
+        items = [_write_value(path, item, names) for item in value]
+        return {"kind": type(value).__name__ if type(value).__name__ in _TUPLES else "tuple", "items": items}
+    if isinstance(value, np.datetime64):
+        return {"kind": "datetime64", "value": str(value)}
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return {"kind": "scalar", "value": value}
+    raise TypeError(f"Cannot publish a {type(value).__name__} to the column store.")
+
+
+def _read_value(path, spec):
+    """The value ``_write_value`` described by ``spec``, with every array memory-mapped."""
+    kind = spec["kind"]
+    if kind == "frame":
+        data = {col["name"]: _read_column(path, col["file"], col, spec["rows"]) for col in spec["columns"]}
+        index = None if spec["index"] is None else _read_value(path, spec["index"])
+        return pd.DataFrame(data, index=index, copy=False)
+    if kind == "index":
+        return pd.Index(_read_column(path, spec["file"], spec["column"], spec["rows"]), name=spec["name"], copy=False)
+    if kind == "ndarray":
+        return _map(os.path.join(path, f"{spec['file']}.npy"))
+    if kind == "dict":
+        return {_read_value(path, key): _read_value(path, item) for key, item in spec["items"]}
+    if kind == "tuple":
+        return tuple(_read_value(path, item) for item in spec["items"])
+    if kind in _TUPLES:
+        return _TUPLES[kind](*(_read_value(path, item) for item in spec["items"]))
+    if kind == "datetime64":
+        return np.datetime64(spec["value"])
+    return spec["value"]
+
+
+def publish(df_clean, directory=STORE_DIR, keep=KEEP_VERSIONS):
+    """Write ``df_clean`` and its aggregates as a new version of the store and make it current.
+
+    The version is written to a temporary directory, renamed into place once
+    complete, and only then named in the ``CURRENT`` file, which is replaced
+    atomically. A version is never changed after it is published, so a
+    reader sees either the old version or the new one, never a mix. Only one
+    process should publish to a store. Returns the new version's name.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to publish the column store.")
+    os.makedirs(directory, exist_ok=True)
+    versions = _versions(directory)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:06d}"
+    tmp_path = os.path.join(directory, f".{version}.{os.getpid()}.tmp")
+    os.mkdir(tmp_path)
+    columns = [{"name": col, **_write_column(tmp_path, position, df_clean[col])}
+               for position, col in enumerate(df_clean.columns)]
+    with open(os.path.join(tmp_path, LAYOUT), "w") as f:
+        json.dump({"rows": len(df_clean), "columns": columns}, f)
+    dataset = build_dataset(df_clean)
+    names = (f"a{position}" for position in itertools.count())
+    aggregates = _write_value(tmp_path, {field: getattr(dataset, field) for field in AGGREGATE_FIELDS}, names)
+    with open(os.path.join(tmp_path, AGGREGATES), "w") as f:
+        json.dump(aggregates, f)
+    os.rename(tmp_path, os.path.join(directory, version))
+
+    tmp_current = os.path.join(directory, f"{CURRENT}.{os.getpid()}.tmp")
+    with open(tmp_current, "w") as f:
+        f.write(version)
+    os.replace(tmp_current, os.path.join(directory, CURRENT))
+    # Processes that still map a removed version keep reading it: its files
+    # are only freed once the last mapping is closed.
+    for old in _versions(directory)[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+def current_version(directory=STORE_DIR):
+    """The name of the store's current version; ``FileNotFoundError`` when nothing was published."""
+    try:
+        with open(os.path.join(directory, CURRENT)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No column store published in {directory}") from None
+
+
+def store_version(directory=STORE_DIR):
+    """Cache key for the store's current version: (directory, version)."""
+    return os.path.abspath(directory), current_version(directory)
+
+
+def attach_store(directory=STORE_DIR, version=None):
+    """The cleaned bookings frame of a published version (by default the current one), without copying it.
+
+    Every column is a read-only memory map of the version's files: numeric
+    and date columns as NumPy arrays, categoricals as codes over them and
+    string columns as Arrow arrays on the mapped buffers. Processes that
+    attach to the same version share one copy in the page cache.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to attach the column store.")
+    path = os.path.join(directory, version or current_version(directory))
+    with open(os.path.join(path, LAYOUT)) as f:
+        layout = json.load(f)
+    data = {spec["name"]: _read_column(path, position, spec, layout["rows"])
+            for position, spec in enumerate(layout["columns"])}
+    return pd.DataFrame(data, copy=False)
+
+
+def attach_dataset(directory=STORE_DIR, version=None):
+    """The ``Dataset`` of a published version, with the bookings and its aggregates memory-mapped.
+
+    Versions published without aggregates have them built here instead.
+    """
+    version = version or current_version(directory)
+    df_clean = attach_store(directory, version)
+    path = os.path.join(directory, version)
+    try:
+        with open(os.path.join(path, AGGREGATES)) as f:
+            spec = json.load(f)
+    except FileNotFoundError:
+        return build_dataset(df_clean)
+    return Dataset(df_clean=df_clean, backend=PandasBackend(df_clean), **_read_value(path, spec))
+
+
+def _read_source(csv_path):
+    snapshot = _fresh_snapshot(csv_path)
+    df_clean = read_snapshot(snapshot) if snapshot else None
+    return read_bookings(csv_path) if df_clean is None else df_clean
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the cleaned bookings to the shared column store.")
+    parser.add_argument("csv_path", nargs="?", default=DATA_PATH)
+    parser.add_argument("--store", default=STORE_DIR or "ncr_ride_bookings_store", help="store directory")
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS, help="published versions to keep")
+    args = parser.parse_args()
+    version = publish(_read_source(args.csv_path), args.store, args.keep)
+    print(f"Published {os.path.join(args.store, version)}")
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pandas as pd
+
+
+# KPIs compared by their difference rather than their relative change, with
+# the unit the difference is shown in: percentages move in points, ratings in
+# stars. Every other KPI's delta is a percent change.
+DIFFERENCE_KPIS = {
+    "weekend_percentage": " pp", "cancellation_rate": " pp", "revenue_growth": " pp",
+    "avg_customer_rating": "", "avg_driver_rating": "", "rating_difference": "",
+}
+
+
+def previous_window(start_date, end_date):
+    """The window of the same length that ends the day before ``start_date``."""
+    length = end_date - start_date + timedelta(days=1)
+    return start_date - length, start_date - timedelta(days=1)
+
+
+def last_year_window(start_date, end_date):
+    """The same calendar dates one year earlier; 29 February maps to the 28th."""
+    year = pd.DateOffset(years=1)
+    return (pd.Timestamp(start_date) - year).date(), (pd.Timestamp(end_date) - year).date()
+
+
+BASELINES = {"previous": previous_window, "last_year": last_year_window}
+
+
+def change(name, current, baseline):
+    """How ``current`` moved from ``baseline``; None when either is missing or the percent change is undefined."""
+    if current is None or baseline is None or pd.isna(current) or pd.isna(baseline):
+        return None
+    if name in DIFFERENCE_KPIS:
+        return current - baseline
+    return (current - baseline) / abs(baseline) * 100 if baseline else None
+
+
+def compare_windows(window_kpis, start_date, end_date, kpis):
+    """Deltas of ``kpis`` against each of ``BASELINES``: ``{name: {baseline: change}}``.
+
+    ``window_kpis(start_date, end_date)`` computes the same KPIs for another
+    window, returning None when it holds no bookings or the data does not
+    cover all of it; those deltas are None.
+    """
+    deltas = {name: {} for name in kpis}
+    if end_date < start_date:
+        return deltas
+    for baseline, window in BASELINES.items():
+        other = window_kpis(*window(start_date, end_date))
+        for name, value in kpis.items():
+            deltas[name][baseline] = None if other is None else change(name, value, other.get(name))
+    return deltas
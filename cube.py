@@ -0,0 +1,161 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from bitmap_index import build_bitmaps, select_rows
+from data_loader import CATEGORY_COLUMNS, DATA_PATH, _cached_bookings, calendar_columns, data_version, date_bounds, date_slice
+
+
+# One cube cell per combination of these columns. The two reason columns are
+# only populated for cancelled bookings (where Payment Method is empty), so
+# carrying them costs few extra cells and keeps the CANCELLATION pies off the
+# raw rows.
+GRAIN = [
+    "DateOnly", "Hour", "Vehicle Type", "Booking Status", "Payment Method",
+    "Reason for cancelling by Customer", "Driver Cancellation Reason"
+]
+MEASURES = ["Booking Value", "Ride Distance", "Driver Ratings", "Customer Rating"]
+# Filter columns with bitmap indexes over the cells and duplicate rows.
+INDEXED = ["Vehicle Type", "Booking Status", "Payment Method"]
+
+# cells: one row per GRAIN combination, sorted by DateOnly, with ``rows``,
+# ``unique_id_rows`` and a "<measure> sum"/"<measure> sumsq" pair per
+# measure, plus the calendar columns derived from DateOnly.
+# duplicates: the raw rows whose Booking ID occurs more than once, which is
+# all that is needed to keep distinct booking counts exact. "Booking Code"
+# is the factorized Booking ID (-1 when missing).
+# cell_index/duplicate_index: bitmap indexes over INDEXED; only the full cube
+# carries them, slices leave them as None.
+Cube = namedtuple("Cube", ["cells", "duplicates", "cell_index", "duplicate_index"], defaults=(None, None))
+
+
+def _cells(rows, repeated):
+    work = rows[GRAIN].assign(rows=1, unique_id_rows=(~repeated).astype("int64"))
+    for measure in MEASURES:
+        values = rows[measure].astype("float64")
+        work[f"{measure} sum"] = values
+        work[f"{measure} sumsq"] = values * values
+
+    cells = work.groupby(GRAIN, observed=True, dropna=False).sum().reset_index()
+    return cells.assign(**calendar_columns(cells["DateOnly"]))
+
+
+def _assemble(cells, duplicate_rows):
+    duplicates = duplicate_rows[GRAIN + ["Month", "Weekday", "Is_Weekend", "Booking ID"]].reset_index(drop=True)
+    duplicates["Booking Code"] = pd.factorize(duplicates["Booking ID"])[0]
+    return Cube(cells, duplicates, build_bitmaps(cells, INDEXED), build_bitmaps(duplicates, INDEXED))
+
+
+def build_cube(df_clean):
+    """Roll ``df_clean`` up to one row per ``GRAIN`` cell."""
+    repeated = df_clean["Booking ID"].duplicated(keep=False)
+    return _assemble(_cells(df_clean, repeated), df_clean[repeated])
+
+
+def append_to_cube(cube, df_clean, delta):
+    """Fold ``delta``, rows just appended to ``df_clean``, into ``cube``.
+
+    Only the days that hold a delta row, or an older row whose Booking ID the
+    delta repeats, are re-aggregated; every other cell is reused as-is.
+    """
+    delta_ids = delta["Booking ID"].unique()
+    sharing = df_clean[df_clean["Booking ID"].isin(delta_ids)]
+    new_repeats = sharing.loc[sharing["Booking ID"].duplicated(keep=False), "Booking ID"].unique()
+    repeated_ids = pd.Index(cube.duplicates["Booking ID"].unique()).union(pd.Index(new_repeats))
+
+    days = pd.Index(delta["DateOnly"].unique()).union(
+        pd.Index(sharing.loc[sharing["Booking ID"].isin(new_repeats), "DateOnly"].unique()))
+    slices = [date_slice(df_clean, day, day) for day in days.dropna()]
+    if days.hasnans:
+        slices.append(df_clean[df_clean["DateOnly"].isna()])
+    rows = pd.concat(slices)
+    repeated = rows["Booking ID"].isin(repeated_ids)
+
+    kept_cells = cube.cells[~cube.cells["DateOnly"].isin(days)]
+    kept_duplicates = cube.duplicates[~cube.duplicates["DateOnly"].isin(days)]
+    cells = pd.concat([kept_cells, _cells(rows, repeated)], ignore_index=True)
+    duplicate_rows = pd.concat([kept_duplicates, rows[repeated]], ignore_index=True)
+
+    # New category values in the delta widen df_clean's dtypes; bring the
+    # reused cells along so the concatenation stays categorical.
+    dtypes = {col: df_clean[col].dtype for col in GRAIN if col in CATEGORY_COLUMNS}
+    cells = cells.astype(dtypes).sort_values("DateOnly", kind="stable", ignore_index=True)
+    duplicate_rows = duplicate_rows.astype(dtypes).sort_values("DateOnly", kind="stable", ignore_index=True)
+    return _assemble(cells, duplicate_rows)
+
+
+def slice_cube(cube, start_date=None, end_date=None, filters=None):
+    """Restrict the full cube to an inclusive date range and column filters.
+
+    ``filters`` maps a column to a value, or to a list of accepted values.
+    Filters on ``INDEXED`` columns are answered from the bitmap indexes;
+    any other column falls back to a boolean mask over the selected rows.
+    """
+    filters = filters or {}
+    indexed = {col: value for col, value in filters.items() if col in INDEXED}
+
+    def select(frame, index):
+        lo, hi = date_bounds(frame, start_date, end_date, "DateOnly")
+        if indexed:
+            frame = frame.iloc[select_rows(index, len(frame), indexed, lo, hi)]
+        else:
+            frame = frame.iloc[lo:hi]
+        for col, value in filters.items():
+            if col not in indexed:
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                frame = frame[frame[col].isin(values)]
+        return frame
+
+    return Cube(select(cube.cells, cube.cell_index), select(cube.duplicates, cube.duplicate_index))
+
+
+def rollup(cells, by=None, observed=True):
+    """Sum the cube cells, overall (a Series) or per ``by`` group (a DataFrame)."""
+    value_columns = cells.columns.difference(GRAIN + ["Month", "Weekday", "Is_Weekend"])
+    if by is None:
+        return cells[value_columns].sum()
+    return cells.groupby(by, observed=observed)[value_columns].sum()
+
+
+def metric(sums, measure=None, how="sum"):
+    """Read a metric off ``rollup`` output.
+
+    ``measure=None`` gives the row count; otherwise ``how`` is one of "sum",
+    "mean" or "std" (sample standard deviation from the sums of squares).
+    Empty groups give NaN means, like ``Series.mean()`` on no rows.
+    """
+    rows = sums["rows"]
+    if measure is None:
+        return rows
+    total = sums[f"{measure} sum"]
+    if how == "sum":
+        return total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / rows
+        if how == "mean":
+            return mean
+        if how == "std":
+            variance = (sums[f"{measure} sumsq"] - rows * mean * mean) / (rows - 1)
+            return np.sqrt(np.maximum(variance, 0))
+    raise ValueError(f"Unknown aggregation: {how}")
+
+
+def distinct_bookings(cube, by=None, observed=True):
+    """Exact number of distinct Booking IDs, overall or per ``by`` group."""
+    if by is None:
+        return int(cube.cells["unique_id_rows"].sum() + cube.duplicates["Booking ID"].nunique())
+    singles = cube.cells.groupby(by, observed=observed)["unique_id_rows"].sum()
+    repeats = cube.duplicates.groupby(by, observed=observed)["Booking ID"].nunique()
+    return singles.add(repeats, fill_value=0).astype("int64")
+
+
+@st.cache_resource(max_entries=1, show_spinner="Building booking cube...")
+def _cached_cube(path, source, mtime_ns, size):
+    return build_cube(_cached_bookings(path, source, mtime_ns, size))
+
+
+def load_cube(path=DATA_PATH):
+    """Return the cube for the current bookings data, shared like ``load_bookings``."""
+    return _cached_cube(*data_version(path))
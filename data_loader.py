@@ -0,0 +1,316 @@
+import os
+import sys
+
+import pandas as pd
+import streamlit as st
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+
+DATA_PATH = "ncr_ride_bookings.csv"
+SNAPSHOT_SUFFIX = ".feather"
+# Bump whenever the df_clean schema changes so stale snapshots are rebuilt.
+SCHEMA_VERSION = "4"
+
+CLEAN_COLUMNS = [
+    "Date", "Month", "Weekday", "Hour", "Is_Weekend",
+    "Booking ID", "Booking Status", "Vehicle Type",
+    "Ride Distance", "Booking Value",
+    "Driver Ratings", "Customer Rating", "Payment Method",
+    "Reason for cancelling by Customer", "Driver Cancellation Reason",
+    "Customer ID", "DateOnly"
+]
+
+# Raw CSV columns that feed df_clean; everything else is skipped at parse time.
+RAW_COLUMNS = [
+    "Date", "Time", "Booking ID", "Booking Status", "Vehicle Type",
+    "Ride Distance", "Booking Value", "Driver Ratings", "Customer Rating",
+    "Payment Method", "Reason for cancelling by Customer",
+    "Driver Cancellation Reason", "Customer ID"
+]
+
+RATING_COLUMNS = ["Driver Ratings", "Customer Rating"]
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+BOOKING_STATUSES = ["Completed", "Incomplete", "Cancelled by Customer", "Cancelled by Driver", "No Driver Found"]
+VEHICLE_TYPES = ["auto", "bike", "ebike", "go mini", "go sedan", "premier sedan", "uber xl"]
+PAYMENT_METHODS = ["UPI", "Cash", "Uber Wallet", "Credit Card", "Debit Card"]
+
+# Low-cardinality string columns; held as categoricals in memory and stored
+# dictionary-encoded in the snapshot. Values missing from a known list are
+# appended after it in sorted order rather than dropped. Month and Weekday
+# are ordered so sorting and groupby follow the calendar.
+CATEGORY_COLUMNS = {
+    "Month": MONTHS,
+    "Weekday": WEEKDAYS,
+    "Booking Status": BOOKING_STATUSES,
+    "Vehicle Type": VEHICLE_TYPES,
+    "Payment Method": PAYMENT_METHODS,
+    "Reason for cancelling by Customer": [],
+    "Driver Cancellation Reason": [],
+}
+
+
+def _category_dtype(values, known):
+    extra = sorted(set(values.dropna().unique()) - set(known))
+    return pd.CategoricalDtype(list(known) + extra, ordered=known is MONTHS or known is WEEKDAYS)
+
+
+def _set_categories(values, known):
+    # astype() leaves a categorical alone when only the category order
+    # differs, since unordered dtypes with the same values compare equal.
+    dtype = _category_dtype(values, known)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.set_categories(dtype.categories, ordered=dtype.ordered)
+    return values.astype(dtype)
+
+
+def calendar_columns(dates):
+    """Month, Weekday and Is_Weekend for a datetime Series.
+
+    Month/Weekday are built from integer codes rather than month_name()/day_name()
+    so no per-row strings are ever allocated; -1 marks a missing date.
+    """
+    month = dates.dt.month.fillna(0).astype("int8") - 1
+    weekday = dates.dt.weekday.fillna(-1).astype("int8")
+    return {
+        "Month": pd.Categorical.from_codes(month, dtype=pd.CategoricalDtype(MONTHS, ordered=True)),
+        "Weekday": pd.Categorical.from_codes(weekday, dtype=pd.CategoricalDtype(WEEKDAYS, ordered=True)),
+        "Is_Weekend": (weekday >= 5).to_numpy(),
+    }
+
+
+def clean_bookings(df, rating_fill=None):
+    """Derive the calendar columns, fill gaps and return the ``df_clean`` frame.
+
+    Missing ratings are filled with the column mean of ``df`` unless
+    ``rating_fill`` maps the rating columns to the values to use instead.
+
+    The result uses the compact schema: categoricals for the text columns in
+    ``CATEGORY_COLUMNS``, int8 ``Hour``, float32 ratings and a day-resolution
+    datetime64 ``DateOnly``. Rows are sorted by ``Date`` (missing dates last)
+    so that ``date_slice`` can binary-search them.
+
+    Raises ``KeyError`` when the raw frame is missing the ``Date``/``Time`` columns.
+    """
+    df["Date"] = pd.to_datetime(df["Date"])
+    hour = pd.to_datetime(df["Time"], format="%H:%M:%S").dt.hour
+
+    for col, values in calendar_columns(df["Date"]).items():
+        df[col] = values
+    df["Hour"] = hour.astype("int8")
+    df["DateOnly"] = df["Date"].dt.normalize().astype("datetime64[s]")
+
+    df["Ride Distance"] = df["Ride Distance"].fillna(0)
+    df["Booking Value"] = df["Booking Value"].fillna(0)
+    for col in RATING_COLUMNS:
+        fill = df[col].mean() if rating_fill is None else rating_fill[col]
+        df[col] = df[col].fillna(fill).astype("float32")
+
+    # Normalise the (few) vehicle categories instead of every row.
+    vehicle = df["Vehicle Type"].astype("category")
+    labels = vehicle.cat.categories
+    df["Vehicle Type"] = vehicle.map(dict(zip(labels, labels.str.lower().str.replace('e-bike', 'ebike'))))
+
+    df_clean = df[CLEAN_COLUMNS].sort_values("Date", kind="stable", ignore_index=True)
+    return df_clean.assign(**{col: _set_categories(df_clean[col], known) for col, known in CATEGORY_COLUMNS.items()})
+
+
+def append_bookings(df_clean, *deltas):
+    """Concatenate cleaned frames onto ``df_clean``, keeping the categorical schema and Date order.
+
+    Category lists are merged when a delta brings new values. When every
+    frame's rows are dated on or after the last row of the frame before it
+    the frames are simply stacked; otherwise the result is re-sorted.
+    """
+    frames = [df_clean, *deltas]
+    for col, known in CATEGORY_COLUMNS.items():
+        if not all(frame[col].cat.categories.equals(df_clean[col].cat.categories) for frame in deltas):
+            both = pd.concat([frame[col].cat.categories.to_series() for frame in frames])
+            categories = _category_dtype(both, known).categories
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    # Cleaned frames keep missing dates last, so compare against each final row.
+    nonempty = [frame["Date"] for frame in frames if len(frame)]
+    in_order = all(dates.min() >= before.iloc[-1] for before, dates in zip(nonempty, nonempty[1:]))
+    combined = pd.concat(frames, ignore_index=True)
+    return combined if in_order else combined.sort_values("Date", kind="stable", ignore_index=True)
+
+
+def date_bounds(frame, start_date=None, end_date=None, column="Date"):
+    """Positions ``(lo, hi)`` of the rows whose ``column`` falls on a day in [start_date, end_date].
+
+    ``frame`` must be sorted by ``column``, as df_clean and the cube are; both
+    bounds are found with a binary search.
+    """
+    values = frame[column].to_numpy()
+    lo, hi = 0, len(values)
+    if start_date is not None:
+        lo = values.searchsorted(pd.Timestamp(start_date).to_datetime64(), side="left")
+    if end_date is not None:
+        hi = values.searchsorted((pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64(), side="left")
+    return int(lo), int(max(lo, hi))
+
+
+def date_slice(frame, start_date=None, end_date=None, column="Date"):
+    """Positional slice of ``frame`` covering the ``date_bounds`` range."""
+    lo, hi = date_bounds(frame, start_date, end_date, column)
+    return frame.iloc[lo:hi]
+
+
+def memory_report(df_clean):
+    """Bytes per column in ``df_clean`` next to the legacy object/int64/float64 layout."""
+    rows = []
+    for col in df_clean.columns:
+        values = df_clean[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            legacy = values.astype(object)
+        elif col == "DateOnly":
+            legacy = values.dt.date
+        elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            legacy = values.astype("int64")
+        elif pd.api.types.is_float_dtype(values):
+            legacy = values.astype("float64")
+        else:
+            legacy = values
+        rows.append((col, str(values.dtype), values.memory_usage(index=False, deep=True),
+                     legacy.memory_usage(index=False, deep=True)))
+    return pd.DataFrame(rows, columns=["column", "dtype", "bytes", "legacy_bytes"]).set_index("column")
+
+
+def snapshot_path(path=DATA_PATH):
+    return os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+
+
+def csv_version(path):
+    """``(mtime_ns, size)`` of the CSV at ``path``, as recorded in the snapshot built from it."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_snapshot(df_clean, path, source_version=None):
+    """Write ``df_clean`` to an uncompressed Feather (Arrow IPC) file.
+
+    Categoricals are stored as dictionary-encoded columns and ``Date`` as a
+    timestamp column. ``source_version`` is the ``csv_version`` of the CSV
+    the frame was read from; it is kept in the file's metadata so the
+    snapshot is only used while the CSV is unchanged. The file is written
+    next to ``path`` and renamed into place so that a reader never sees a
+    half-written snapshot.
+    """
+    table = pa.Table.from_pandas(df_clean, preserve_index=False)
+    metadata = {**table.schema.metadata, b"schema_version": SCHEMA_VERSION.encode()}
+    if source_version is not None:
+        metadata[b"csv_mtime_ns"], metadata[b"csv_size"] = (str(value).encode() for value in source_version)
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """Memory-map a snapshot written by ``write_snapshot``.
+
+    Returns ``None`` when the snapshot was written for another schema version.
+    """
+    table = feather.read_table(path, memory_map=True)
+    if (table.schema.metadata or {}).get(b"schema_version") != SCHEMA_VERSION.encode():
+        return None
+    return table.to_pandas(split_blocks=True)
+
+
+def read_raw_bookings(path):
+    """Read the ``RAW_COLUMNS`` of a bookings CSV, text columns as categoricals."""
+    return pd.read_csv(path, usecols=lambda col: col in RAW_COLUMNS,
+                       dtype={col: "category" for col in CATEGORY_COLUMNS})
+
+
+def read_bookings(path=DATA_PATH):
+    """Parse and clean the bookings CSV at ``path``."""
+    return clean_bookings(read_raw_bookings(path))
+
+
+def _fresh_snapshot(path):
+    # A snapshot is usable when it records the CSV's current mtime and size,
+    # or when it was deployed without the CSV. Comparing the two files'
+    # mtimes is not enough: copies that keep mtimes (cp -p, rsync -a) can
+    # put an older CSV behind a newer snapshot.
+    if pa is None:
+        return None
+    snap = snapshot_path(path)
+    try:
+        with pa.memory_map(snap) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    try:
+        version = csv_version(path)
+    except FileNotFoundError:
+        return snap
+    recorded = metadata.get(b"csv_mtime_ns"), metadata.get(b"csv_size")
+    return snap if recorded == tuple(str(value).encode() for value in version) else None
+
+
+@st.cache_resource(max_entries=1, show_spinner="Loading bookings...")
+def _cached_bookings(path, source, mtime_ns, size):
+    # mtime/size are only part of the cache key so that a rewritten file
+    # misses the cache; max_entries=1 evicts the stale frame.
+    if source != path:
+        df_clean = read_snapshot(source)
+        if df_clean is not None:
+            return df_clean
+    snapshot = _fresh_snapshot(path)
+    df_clean = read_snapshot(snapshot) if snapshot else None
+    if df_clean is not None:
+        return df_clean
+    df_clean = read_bookings(path)
+    if pa is not None:
+        try:
+            # Tag it with the stat the key was built from: if the CSV changed
+            # while it was parsed, the next key misses and it is parsed again.
+            write_snapshot(df_clean, snapshot_path(path), (mtime_ns, size))
+        except OSError:
+            pass
+    return df_clean
+
+
+def data_version(path=DATA_PATH):
+    """Cache key for the data behind ``path``: (csv path, source path, mtime, size).
+
+    The source and its mtime and size are the CSV's, so writing the snapshot
+    does not change the key. Only without a CSV is the source the snapshot.
+    Raises ``FileNotFoundError`` when neither exists.
+    """
+    source = path if os.path.exists(path) else _fresh_snapshot(path) or path
+    stat = os.stat(source)
+    return os.path.abspath(path), os.path.abspath(source), stat.st_mtime_ns, stat.st_size
+
+
+def load_bookings(path=DATA_PATH):
+    """Return the cleaned bookings frame, shared by every session in the process.
+
+    The frame is memory-mapped from the Feather snapshot when it was built
+    from the CSV as it is now; otherwise the CSV is parsed and the snapshot
+    refreshed.
+    Either way it is loaded once per (path, mtime, size) and handed out as-is,
+    so callers must treat it as read-only and filter into new frames instead
+    of assigning into it.
+    """
+    return _cached_bookings(*data_version(path))
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    if pa is None:
+        sys.exit("pyarrow is required to write the bookings snapshot.")
+    version = csv_version(csv_path)
+    df_clean = read_bookings(csv_path)
+    write_snapshot(df_clean, snapshot_path(csv_path), version)
+    print(f"Wrote {snapshot_path(csv_path)}")
+    report = memory_report(df_clean)
+    print(report.to_string())
+    print(f"Total: {report['bytes'].sum() / 1e6:.1f} MB (legacy layout {report['legacy_bytes'].sum() / 1e6:.1f} MB)")
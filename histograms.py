@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_loader import DATA_PATH, _cached_bookings, data_version, date_bounds
+
+
+# Bins per histogram column: an int is that many equal-width bins over the
+# column's range, a float is a fixed bin width centred on its multiples (the
+# ratings are recorded to one decimal).
+HISTOGRAM_BINS = {"Booking Value": 20, "Customer Rating": 0.1, "Driver Ratings": 0.1}
+
+# days: one-column frame of the distinct DateOnly values, sorted.
+# edges: {column: bin edges}, fixed when the histograms are first built.
+# counts: {column: int64 array of shape (len(days), bins)}, one row per day.
+DayHistograms = namedtuple("DayHistograms", ["days", "edges", "counts"])
+
+
+def _edges(values, bins):
+    values = values[~np.isnan(values)]
+    lo, hi = (values.min(), values.max()) if values.size else (0.0, 1.0)
+    if isinstance(bins, int):
+        return np.histogram_bin_edges(values, bins=bins, range=(lo, hi))
+    steps = np.arange(np.round(lo / bins), np.round(hi / bins) + 2)
+    return (steps - 0.5) * bins
+
+
+def _day_counts(day_codes, n_days, values, edges):
+    n_bins = len(edges) - 1
+    keep = (day_codes >= 0) & ~np.isnan(values)
+    # Values outside the edges (only possible for rows appended later) are
+    # counted in the outermost bins.
+    bins = np.clip(np.searchsorted(edges, values[keep], side="right") - 1, 0, n_bins - 1)
+    flat = np.bincount(day_codes[keep] * n_bins + bins, minlength=n_days * n_bins)
+    return flat.reshape(n_days, n_bins)
+
+
+def build_histograms(df_clean, edges=None):
+    """Per-day bin counts of every ``HISTOGRAM_BINS`` column in ``df_clean``.
+
+    ``edges`` reuses existing bin edges; by default they are derived from the
+    data. Rows without a date or value are not counted.
+    """
+    day_codes, days = pd.factorize(df_clean["DateOnly"], sort=True)
+    if edges is None:
+        edges = {col: _edges(df_clean[col].to_numpy(dtype="float64"), bins) for col, bins in HISTOGRAM_BINS.items()}
+    counts = {col: _day_counts(day_codes, len(days), df_clean[col].to_numpy(dtype="float64"), edges[col])
+              for col in HISTOGRAM_BINS}
+    return DayHistograms(pd.DataFrame({"DateOnly": days}), edges, counts)
+
+
+def append_histograms(hists, delta):
+    """Add the rows of ``delta`` to ``hists``, keeping its bin edges."""
+    new = build_histograms(delta, hists.edges)
+    days = hists.days["DateOnly"].to_numpy()
+    new_days = new.days["DateOnly"].to_numpy()
+    all_days = np.union1d(days, new_days)
+    old_at, new_at = all_days.searchsorted(days), all_days.searchsorted(new_days)
+    counts = {}
+    for col, old in hists.counts.items():
+        merged = np.zeros((len(all_days), old.shape[1]), dtype=np.int64)
+        merged[old_at] += old
+        merged[new_at] += new.counts[col]
+        counts[col] = merged
+    return DayHistograms(pd.DataFrame({"DateOnly": all_days}), hists.edges, counts)
+
+
+def histogram(hists, column, start_date=None, end_date=None):
+    """``(edges, counts)`` for ``column`` over the days in [start_date, end_date]."""
+    lo, hi = date_bounds(hists.days, start_date, end_date, column="DateOnly")
+    return hists.edges[column], hists.counts[column][lo:hi].sum(axis=0)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Binning histograms...")
+def _cached_histograms(path, source, mtime_ns, size):
+    return build_histograms(_cached_bookings(path, source, mtime_ns, size))
+
+
+def load_histograms(path=DATA_PATH):
+    """Return the per-day histograms for the current bookings data, shared like ``load_bookings``."""
+    return _cached_histograms(*data_version(path))
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+KPI_NAMES = [
+    "total_bookings", "total_rows", "total_revenue", "total_distance",
+    "avg_booking_value", "avg_ride_distance", "revenue_per_ride",
+    "avg_hourly_bookings", "weekend_bookings", "weekend_percentage",
+    "completed_bookings", "cancelled_bookings", "cancellation_rate",
+    "customer_cancellations", "driver_cancellations", "revenue_lost",
+    "avg_customer_rating", "avg_driver_rating",
+]
+
+
+def _ratio(numerator, denominator, empty=float("nan")):
+    return numerator / denominator if denominator > 0 else empty
+
+
+def _distinct(codes):
+    return np.unique(codes[codes >= 0]).size
+
+
+def compute_kpis(cube, names=None):
+    """Every KPI card value for a cube slice, from a single pass over its cells.
+
+    Per-status and weekend splits come from ``np.bincount`` over the
+    categorical codes, weighted by the cell counts and sums. Distinct
+    bookings are the cells' ``unique_id_rows`` plus the distinct factorized
+    codes among the slice's duplicate-ID rows. Returns a dict restricted to
+    ``names`` (all of ``KPI_NAMES`` by default); means over no rows are NaN.
+    """
+    cells = cube.cells
+    rows = cells["rows"].to_numpy()
+    singles = cells["unique_id_rows"].to_numpy()
+    value = cells["Booking Value sum"].to_numpy()
+
+    status = cells["Booking Status"]
+    statuses = list(status.cat.categories)
+    # Shift the codes by one so missing statuses (-1) land in bin 0.
+    status_codes = status.cat.codes.to_numpy().astype(np.int64) + 1
+    rows_by_status = np.bincount(status_codes, weights=rows, minlength=len(statuses) + 1)[1:]
+    value_by_status = np.bincount(status_codes, weights=value, minlength=len(statuses) + 1)[1:]
+    singles_by_weekend = np.bincount(cells["Is_Weekend"].to_numpy(), weights=singles, minlength=2)
+    active_hours = np.count_nonzero(np.bincount(cells["Hour"].to_numpy(), minlength=24))
+
+    duplicate_codes = cube.duplicates["Booking Code"].to_numpy()
+    duplicate_weekend = cube.duplicates["Is_Weekend"].to_numpy()
+
+    total_rows = int(rows.sum())
+    total_bookings = int(singles.sum()) + _distinct(duplicate_codes)
+    weekend_bookings = int(singles_by_weekend[1]) + _distinct(duplicate_codes[duplicate_weekend])
+    total_revenue = value.sum()
+    total_distance = cells["Ride Distance sum"].to_numpy().sum()
+    by_status = dict(zip(statuses, rows_by_status))
+    completed = int(by_status.get("Completed", 0))
+    cancelled_statuses = [i for i, name in enumerate(statuses) if "Cancelled" in name]
+
+    kpis = {
+        "total_bookings": total_bookings,
+        "total_rows": total_rows,
+        "total_revenue": total_revenue,
+        "total_distance": total_distance,
+        "avg_booking_value": _ratio(total_revenue, total_rows),
+        "avg_ride_distance": _ratio(total_distance, total_rows),
+        "revenue_per_ride": _ratio(total_revenue, total_bookings, 0),
+        "avg_hourly_bookings": total_bookings / (active_hours or 1),
+        "weekend_bookings": weekend_bookings,
+        "weekend_percentage": _ratio(weekend_bookings * 100, total_bookings, 0),
+        "completed_bookings": completed,
+        "cancelled_bookings": total_rows - completed,
+        "cancellation_rate": _ratio((total_rows - completed) * 100, total_rows, 0),
+        "customer_cancellations": int(by_status.get("Cancelled by Customer", 0)),
+        "driver_cancellations": int(by_status.get("Cancelled by Driver", 0)),
+        "revenue_lost": value_by_status[cancelled_statuses].sum(),
+        "avg_customer_rating": _ratio(cells["Customer Rating sum"].to_numpy().sum(), total_rows),
+        "avg_driver_rating": _ratio(cells["Driver Ratings sum"].to_numpy().sum(), total_rows),
+    }
+    if names is None:
+        return kpis
+    return {name: kpis[name] for name in names}
@@ -0,0 +1,334 @@
+import argparse
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+from benchmark import APP_PATH, PAGES, commit
+
+
+DEFAULT_PORT = 8599
+# Widgets a session reads back from the deltas of each run.
+WIDGET_TYPES = ["button", "date_input", "selectbox", "checkbox"]
+OVERALL_FILTERS = ["Vehicle Type", "Booking Status", "Payment Method"]
+
+# One rerun as the session saw it. started/seconds: perf_counter time the
+# BackMsg was sent and the time until the run finished. status: the
+# script_finished status name, or "timeout"/"disconnected". errors: exception
+# elements drawn. bytes: size of the ForwardMsgs received.
+Run = namedtuple("Run", ["session", "page", "action", "started", "seconds", "status", "errors", "bytes"])
+
+
+class Session:
+    """One simulated analyst: a websocket client speaking the browser's side of Streamlit's protocol.
+
+    ``rerun`` sends a rerun request with the widget states changed so far,
+    as the browser does, and reads ForwardMsgs until the script (or, with
+    ``fragment_id``, the fragment) has finished. The widgets drawn by each
+    run are kept by type and label so the next action can address them.
+    """
+
+    def __init__(self, websocket, timeout=60):
+        self._ws = websocket
+        self.timeout = timeout
+        self.page_hash = ""
+        self.widgets = {}
+        self.states = {}
+
+    def rerun(self, triggers=(), fragment_id=""):
+        """``(started, seconds, status, errors, bytes)`` of one rerun."""
+        msg = BackMsg()
+        request = msg.rerun_script
+        request.page_script_hash = self.page_hash
+        request.widget_states.widgets.extend(list(self.states.values()) + list(triggers))
+        if fragment_id:
+            request.fragment_id = fragment_id
+        started = time.perf_counter()
+        self._ws.send(msg.SerializeToString())
+
+        drawn, errors, size = {}, 0, 0
+        while True:
+            data = self._ws.recv(timeout=self.timeout)
+            size += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = forward.new_session.page_script_hash
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                field = element.WhichOneof("type")
+                if field == "exception":
+                    errors += 1
+                elif field in WIDGET_TYPES:
+                    widget = getattr(element, field)
+                    drawn[(field, widget.label)] = (widget, forward.delta.fragment_id)
+            elif kind == "script_finished":
+                status = ForwardMsg.ScriptFinishedStatus.Name(forward.script_finished)
+                if status != "FINISHED_EARLY_FOR_RERUN":
+                    break
+        seconds = time.perf_counter() - started
+
+        # A fragment run only redraws the fragment; the rest of the page stays.
+        self.widgets = {**self.widgets, **drawn} if fragment_id else drawn
+        shown = {widget.id for widget, _ in self.widgets.values()}
+        self.states = {widget_id: state for widget_id, state in self.states.items() if widget_id in shown}
+        return started, seconds, status, errors, size
+
+    def navigate(self, page):
+        button, _ = self.widgets[("button", page)]
+        return self.rerun([WidgetState(id=button.id, trigger_value=True)])
+
+    def date_bounds(self):
+        widget, _ = self.widgets[("date_input", "Start Date")]
+        return date.fromisoformat(widget.min), date.fromisoformat(widget.max)
+
+    def set_dates(self, start_date, end_date):
+        for label, value in [("Start Date", start_date), ("End Date", end_date)]:
+            widget, fragment_id = self.widgets[("date_input", label)]
+            state = WidgetState(id=widget.id)
+            state.string_array_value.data[:] = [value.isoformat()]
+            self.states[widget.id] = state
+        return self.rerun(fragment_id=fragment_id)
+
+    def choose_filters(self, rng):
+        """Set each OVERALL filter to "All" or, half the time, a random value."""
+        for label in OVERALL_FILTERS:
+            widget, fragment_id = self.widgets[("selectbox", label)]
+            option = rng.choice(widget.options[1:]) if rng.random() < 0.5 and len(widget.options) > 1 else widget.options[0]
+            self.states[widget.id] = WidgetState(id=widget.id, string_value=option)
+        return self.rerun(fragment_id=fragment_id)
+
+
+def _connect(url, timeout):
+    return connect(url.replace("http", "ws", 1) + "/_stcore/stream", subprotocols=["streamlit"],
+                   max_size=None, open_timeout=timeout)
+
+
+def _random_range(rng, first, last):
+    start = first + timedelta(days=rng.randint(0, (last - first).days))
+    return start, start + timedelta(days=rng.randint(0, (last - start).days))
+
+
+def simulate(url, session, until, think=0.0, seed=0, timeout=60):
+    """Click through the pages as one session until ``until`` (a ``time.perf_counter`` value).
+
+    The session opens the app, then repeatedly navigates to a random page
+    and makes one to three changes on it: a random date range, or on
+    OVERALL, half the time, random filters. ``think`` is the mean pause in
+    seconds after each change (exponentially distributed). Returns the
+    session's ``Run`` records; a timeout or dropped connection ends it.
+    """
+    rng = random.Random(seed * 100_003 + session)
+    runs = []
+    page, action = "OVERALL", "open"
+    with _connect(url, timeout) as websocket:
+        client = Session(websocket, timeout)
+        try:
+            runs.append(Run(session, page, action, *client.rerun()))
+            first, last = client.date_bounds()
+            while time.perf_counter() < until:
+                page, action = rng.choice(PAGES), "navigate"
+                runs.append(Run(session, page, action, *client.navigate(page)))
+                for _ in range(rng.randint(1, 3)):
+                    if time.perf_counter() >= until:
+                        break
+                    if page == "OVERALL" and rng.random() < 0.5:
+                        action = "filters"
+                        runs.append(Run(session, page, action, *client.choose_filters(rng)))
+                    else:
+                        action = "dates"
+                        runs.append(Run(session, page, action, *client.set_dates(*_random_range(rng, first, last))))
+                    if think:
+                        time.sleep(rng.expovariate(1 / think))
+        except TimeoutError:
+            runs.append(Run(session, page, action, time.perf_counter(), None, "timeout", 0, 0))
+        except ConnectionClosed:
+            runs.append(Run(session, page, action, time.perf_counter(), None, "disconnected", 0, 0))
+    return runs
+
+
+class ResourceSampler:
+    """Samples the CPU use and RSS of a server process and its children every ``interval`` seconds.
+
+    CPU is a percentage of one core, so a server busy on two cores reads
+    200. Needs psutil; without it no samples are taken.
+    """
+
+    def __init__(self, pid, interval=1.0):
+        self.interval = interval
+        self.samples = []
+        self._root = psutil.Process(pid) if psutil is not None and pid is not None else None
+        self._processes = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        processes = [self._root] + self._root.children(recursive=True)
+        cpu = rss = 0.0
+        for process in processes:
+            # cpu_percent compares against the previous call on the same object.
+            process = self._processes.setdefault(process.pid, process)
+            try:
+                cpu += process.cpu_percent(None)
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                self._processes.pop(process.pid, None)
+        return cpu, rss / (1024 * 1024)
+
+    def _run(self):
+        started = time.perf_counter()
+        self._sample()
+        while not self._stop.wait(self.interval):
+            cpu, rss = self._sample()
+            self.samples.append({"elapsed_seconds": round(time.perf_counter() - started, 3),
+                                 "cpu_percent": round(cpu, 1), "rss_mb": round(rss, 1)})
+
+    def __enter__(self):
+        if self._root is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def start_server(data_dir=".", port=DEFAULT_PORT, timeout=120):
+    """Start ``streamlit run app.py`` headless in ``data_dir``; returns the process once it is healthy.
+
+    The server inherits the environment, so ``HUB_*`` settings apply to it.
+    """
+    command = [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+               "--server.port", str(port), "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"]
+    server = subprocess.Popen(command, cwd=data_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise TimeoutError(f"streamlit did not become healthy within {timeout}s")
+
+
+def warm_up(url, timeout=600):
+    """Open one session and visit every page, so data loading is not measured."""
+    with _connect(url, timeout) as websocket:
+        client = Session(websocket, timeout)
+        client.rerun()
+        for page in PAGES:
+            client.navigate(page)
+
+
+def summarize(runs, seconds):
+    """Per-page and overall ("ALL") rerun counts, errors, throughput and latency percentiles."""
+    frame = pd.DataFrame(runs, columns=Run._fields)
+    results = []
+    for page, group in [("ALL", frame)] + [(page, frame[frame["page"] == page]) for page in PAGES]:
+        latencies = group["seconds"].dropna().to_numpy(dtype=np.float64)
+        failed = ~group["status"].isin(["FINISHED_SUCCESSFULLY", "FINISHED_FRAGMENT_RUN_SUCCESSFULLY"])
+        result = {"page": page, "reruns": len(latencies), "errors": int(failed.sum() + (group["errors"] > 0).sum()),
+                  "reruns_per_sec": round(len(latencies) / seconds, 2) if seconds > 0 else None}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            result.update({"p50_seconds": round(p50, 4), "p95_seconds": round(p95, 4), "p99_seconds": round(p99, 4),
+                           "max_seconds": round(latencies.max(), 4), "mean_bytes": round(group["bytes"].mean())})
+        results.append(result)
+    return results
+
+
+def run_load_test(levels, duration=60.0, data_dir=".", port=DEFAULT_PORT, url=None, pid=None,
+                  think=0.0, seed=0, interval=1.0, timeout=60):
+    """Run ``duration`` seconds of each concurrency level in ``levels`` against one server.
+
+    Starts ``streamlit run app.py`` in ``data_dir`` unless ``url`` points at
+    a running server (whose ``pid``, if given, is sampled). Each level opens
+    that many fresh sessions at once. Returns one dict per level and page
+    with throughput and rerun latency percentiles, then one per resource
+    sample with the server's CPU and RSS.
+    """
+    server = None
+    if url is None:
+        server = start_server(data_dir, port)
+        url, pid = f"http://localhost:{port}", server.pid
+    context = {"commit": commit(), "python": sys.version.split()[0], "pandas": pd.__version__}
+    results = []
+    try:
+        warm_up(url)
+        for sessions in levels:
+            with ResourceSampler(pid, interval) as sampler:
+                started = time.perf_counter()
+                until = started + duration
+                with ThreadPoolExecutor(sessions) as pool:
+                    futures = [pool.submit(simulate, url, session, until, think, seed, timeout) for session in range(sessions)]
+                    runs = [run for future in futures for run in future.result()]
+                elapsed = time.perf_counter() - started
+            level = {**context, "sessions": sessions, "duration_seconds": round(elapsed, 3)}
+            summary = summarize(runs, elapsed)
+            if sampler.samples:
+                summary[0]["cpu_percent_mean"] = round(float(np.mean([s["cpu_percent"] for s in sampler.samples])), 1)
+                summary[0]["rss_mb_max"] = max(s["rss_mb"] for s in sampler.samples)
+            results += [{**level, "kind": "latency", **row} for row in summary]
+            results += [{**level, "kind": "resources", **sample} for sample in sampler.samples]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the dashboard with concurrent simulated sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="concurrency levels to run in turn")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per level")
+    parser.add_argument("--data-dir", default=".", help="directory the server runs in (holding the bookings data)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--url", help="test an already running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="process id of the --url server, to sample its CPU and RSS")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause in seconds after each change")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between CPU/RSS samples")
+    parser.add_argument("--output", help="also append the JSON lines to this file")
+    args = parser.parse_args()
+    if psutil is None:
+        print("psutil is not installed; CPU and RSS will not be sampled.", file=sys.stderr)
+
+    results = run_load_test(args.sessions, args.duration, args.data_dir, args.port, args.url, args.pid,
+                            args.think, args.seed, args.interval)
+    lines = [json.dumps(result) for result in results]
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write("\n".join(lines) + "\n")
+    for result in results:
+        if result["kind"] == "latency" and result["page"] == "ALL":
+            print(f"{result['sessions']:>4} sessions: {result['reruns_per_sec']} reruns/s, "
+                  f"p50 {result.get('p50_seconds')}s, p95 {result.get('p95_seconds')}s, p99 {result.get('p99_seconds')}s, "
+                  f"{result['errors']} errors, CPU {result.get('cpu_percent_mean')}%, RSS {result.get('rss_mb_max')} MB",
+                  file=sys.stderr)
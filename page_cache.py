@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+
+# Upper bound on the estimated size of everything held in the page cache.
+PAGE_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def result_bytes(value):
+    """Rough size of a page result: figures by their JSON spec, frames by their memory use."""
+    if isinstance(value, go.Figure):
+        return len(value.to_json())
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sum(result_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_bytes(v) for v in value)
+    return 64
+
+
+class PageCache:
+    """LRU cache of computed page results, bounded by their estimated size in bytes.
+
+    Keys identify a view, e.g. ``(page, data version, start_date, end_date,
+    filters)``; values are the page's aggregated frames, KPI values and
+    figures and must be treated as read-only, since every session sharing
+    the cache gets the same objects. ``hits`` and ``misses`` count lookups.
+    """
+
+    def __init__(self, max_bytes=PAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The cached value for ``key``, or None; a hit makes the entry most recent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store ``value`` and evict least recently used entries until it fits.
+
+        A value larger than the whole budget is not stored.
+        """
+        size = result_bytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            while self._entries and self.bytes + size > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+
+    def get_or_compute(self, key, compute):
+        """``(value, hit)``: the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def stats(self):
+        return {"entries": len(self), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+@st.cache_resource
+def shared_page_cache():
+    """The page cache shared by every session in the process."""
+    return PageCache()
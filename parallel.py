@@ -0,0 +1,192 @@
+import multiprocessing
+import os
+import threading
+import weakref
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from cube import rollup, slice_cube
+from data_loader import date_bounds
+
+
+# Worker processes for the month map-reduce; HUB_WORKERS overrides the CPU count.
+PARALLEL_WORKERS = int(os.environ.get("HUB_WORKERS", os.cpu_count() or 1))
+# Cubes with fewer cells than this are sliced and rolled up in one pass:
+# below it the fan-out costs more than the work it splits.
+PARALLEL_MIN_CELLS = 2_000_000
+# Each partition is a run of whole calendar months with at least this many cells.
+PARTITION_CELLS = 250_000
+
+# block: the SharedMemory holding the cells; layout: its ``share_frame`` layout.
+# bounds: ``(lo, hi)`` cell positions of each partition.
+# days: ``(first, last)`` DateOnly of each partition.
+MonthPartitions = namedtuple("MonthPartitions", ["block", "layout", "bounds", "days"])
+
+_executor = None
+_lock = threading.Lock()
+# id(cells) -> (weak reference to cells, MonthPartitions)
+_shared = {}
+# id(cells) -> (weak reference to cells, (bounds, days))
+_runs = {}
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # forkserver, not fork: the Streamlit server runs sessions on threads.
+            _executor = ProcessPoolExecutor(PARALLEL_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+        return _executor
+
+
+def month_bounds(cells, min_cells=PARTITION_CELLS):
+    """``(lo, hi)`` positions of runs of whole calendar months with at least ``min_cells`` cells each.
+
+    ``cells`` must be sorted by DateOnly; the last run may be smaller.
+    """
+    months = cells["DateOnly"].to_numpy().astype("datetime64[M]").view("int64")
+    starts = np.flatnonzero(np.diff(months)) + 1
+    bounds, lo = [], 0
+    for start in starts.tolist():
+        if start - lo >= min_cells:
+            bounds.append((lo, start))
+            lo = start
+    if lo < len(months):
+        bounds.append((lo, len(months)))
+    return bounds
+
+
+def share_frame(frame):
+    """Copy ``frame``'s columns into one shared memory block.
+
+    Returns the block, which the caller closes and unlinks, and a picklable
+    layout ``(name, length, columns)`` for ``attach_frame``; categorical
+    columns travel as their codes.
+    """
+    arrays, columns, offset = [], [], 0
+    for col in frame.columns:
+        values = frame[col]
+        dtype = values.dtype if isinstance(values.dtype, pd.CategoricalDtype) else None
+        array = np.ascontiguousarray(values.cat.codes.to_numpy() if dtype is not None else values.to_numpy())
+        offset = -(-offset // 8) * 8
+        columns.append((col, array.dtype.str, offset, dtype))
+        arrays.append((offset, array))
+        offset += array.nbytes
+    block = SharedMemory(create=True, size=max(offset, 1))
+    for start, array in arrays:
+        np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=start)[:] = array
+    return block, (block.name, len(frame), columns)
+
+
+def attach_frame(layout, lo=0, hi=None):
+    """Rows ``lo:hi`` of a frame placed by ``share_frame``, copied out of shared memory."""
+    name, length, columns = layout
+    hi = length if hi is None else hi
+    block = SharedMemory(name=name)
+    try:
+        data = {}
+        for col, dtype, offset, categorical in columns:
+            array = np.ndarray(length, np.dtype(dtype), buffer=block.buf, offset=offset)[lo:hi].copy()
+            data[col] = pd.Categorical.from_codes(array, dtype=categorical) if categorical is not None else array
+        return pd.DataFrame(data)
+    finally:
+        block.close()
+
+
+def _release(key, block):
+    with _lock:
+        _shared.pop(key, None)
+    block.close()
+    block.unlink()
+
+
+def _forget_runs(key):
+    with _lock:
+        _runs.pop(key, None)
+
+
+def month_runs(cells):
+    """``(bounds, days)`` of the ``month_bounds`` partitions of ``cells``, computed once per frame.
+
+    ``days`` holds the ``(first, last)`` DateOnly of each partition.
+    """
+    with _lock:
+        entry = _runs.get(id(cells))
+        if entry is not None and entry[0]() is cells:
+            return entry[1]
+    bounds = month_bounds(cells)
+    dates = cells["DateOnly"]
+    runs = (bounds, [(dates.iloc[lo], dates.iloc[hi - 1]) for lo, hi in bounds])
+    with _lock:
+        _runs[id(cells)] = (weakref.ref(cells), runs)
+    weakref.finalize(cells, _forget_runs, id(cells))
+    return runs
+
+
+def month_partitions(cells):
+    """The ``MonthPartitions`` of ``cells``, placed in shared memory once per frame.
+
+    The block is unlinked when ``cells`` is garbage collected, i.e. once the
+    data version it belongs to has been replaced.
+    """
+    with _lock:
+        entry = _shared.get(id(cells))
+        if entry is not None and entry[0]() is cells:
+            return entry[1]
+    bounds, days = month_runs(cells)
+    block, layout = share_frame(cells)
+    partitions = MonthPartitions(block, layout, bounds, days)
+    with _lock:
+        _shared[id(cells)] = (weakref.ref(cells), partitions)
+    weakref.finalize(cells, _release, id(cells), block)
+    return partitions
+
+
+def _rollup_partition(cells, start_date, end_date, filters, by, observed):
+    lo, hi = date_bounds(cells, start_date, end_date, "DateOnly")
+    cells = cells.iloc[lo:hi]
+    for col, value in (filters or {}).items():
+        cells = cells[cells[col].isin(value if isinstance(value, (list, tuple, set)) else [value])]
+    return rollup(cells, by, observed)
+
+
+def _rollup_shared(task):
+    layout, lo, hi, *query = task
+    return _rollup_partition(attach_frame(layout, lo, hi), *query)
+
+
+def breakdown(cube, by, start_date=None, end_date=None, filters=None, observed=True, pool=True):
+    """``rollup(slice_cube(cube, start_date, end_date, filters).cells, by, observed)``, map-reduced over months.
+
+    The cells are split into ``month_bounds`` partitions: each partition is
+    sliced and rolled up on its own and the partial sums are added in month
+    order. Means come out right because ``metric`` divides the merged sums by
+    the merged row counts. Cubes of at least ``PARALLEL_MIN_CELLS`` cells run
+    the partitions in ``PARALLEL_WORKERS`` worker processes that read the
+    cells from shared memory; smaller ones, or any cube when ``pool`` is
+    False or there is one worker, roll up one slice here and cut it at the
+    same month boundaries. Either way the same rows are added in the same
+    order, so the results are identical.
+    """
+    cells = cube.cells
+    bounds, days = month_runs(cells)
+    first = None if start_date is None else pd.Timestamp(start_date)
+    last = None if end_date is None else pd.Timestamp(end_date)
+    overlapping = [i for i, (day_lo, day_hi) in enumerate(days)
+                   if (last is None or day_lo <= last) and (first is None or pd.isna(day_hi) or day_hi >= first)]
+    if not overlapping:
+        return rollup(cells.iloc[:0], by, observed)
+    query = (start_date, end_date, filters, by, observed)
+    if len(cells) >= PARALLEL_MIN_CELLS and pool and PARALLEL_WORKERS > 1 and len(overlapping) > 1:
+        layout = month_partitions(cells).layout
+        partials = list(_pool().map(_rollup_shared, [(layout, *bounds[i], *query) for i in overlapping]))
+    else:
+        sliced = slice_cube(cube, start_date, end_date, filters).cells
+        cuts = [0, *sliced["DateOnly"].searchsorted([days[i][0] for i in overlapping[1:]]), len(sliced)]
+        partials = [rollup(sliced.iloc[lo:hi], by, observed) for lo, hi in zip(cuts, cuts[1:])]
+    levels = 1 if isinstance(by, str) else len(by)
+    return pd.concat(partials).groupby(level=list(range(levels)), observed=observed).sum()
@@ -0,0 +1,146 @@
+import glob
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+from cube import append_to_cube, build_cube
+from data_loader import RATING_COLUMNS, append_bookings, clean_bookings, read_raw_bookings
+from histograms import append_histograms, build_histograms
+from quantiles import append_quantile_sketches, build_quantile_sketches
+from sketches import append_sketches, build_sketches
+from timeseries import build_daily_series
+from top_customers import append_customer_index, build_customer_index
+
+
+# Directory of hourly partition CSVs; when it exists the app serves it
+# instead of ncr_ride_bookings.csv.
+PARTITION_DIR = "ncr_ride_bookings"
+POLL_SECONDS = 60
+
+logger = logging.getLogger("uber_analytics_hub.partitions")
+
+
+class PartitionStore:
+    """Cleaned bookings and the structures derived from them, grown from a directory of partition CSVs.
+
+    Every ``*.csv`` file in ``directory`` is an immutable partition. Writers
+    must write a partition under another name, such as ``<name>.csv.tmp``,
+    and rename it to ``<name>.csv`` once complete, so that a file is never
+    read half-written. ``refresh`` parses and cleans only the files it has
+    not seen yet, each on its own, appends them to
+    ``df_clean`` and folds them into the cube, the per-day histograms, the
+    customer index and the distinct-ID and quantile sketches, so the cost follows the size of the new data rather than
+    the history. The daily series are rebuilt from the cube cells.
+    Missing ratings in a new partition are filled with the running mean of
+    every rating ingested so far; rows that were already loaded keep the fill
+    they were given. Histogram bin edges are fixed by the first refresh.
+    """
+
+    def __init__(self, directory=PARTITION_DIR, poll_seconds=POLL_SECONDS):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        # (version, df_clean, cube, histograms, customer index, daily series,
+        # sketches, quantile sketches),
+        # replaced as a whole so readers never see a frame from one refresh
+        # next to the cube from another.
+        self._state = (0, None, None, None, None, None, None, None)
+        self._seen = set()
+        self._rating_totals = {col: (0.0, 0) for col in RATING_COLUMNS}
+        self._last_poll = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """``(version, df_clean, cube, histograms, customers, daily, sketches, quantiles)`` as of the latest refresh.
+
+        ``version`` counts the refreshes that brought new data. The tuple is
+        read in one step, so the version always matches the data next to it.
+        Everything in it is read-only.
+        """
+        return self._state
+
+    def _rating_fill(self, raw):
+        fill = {}
+        for col in RATING_COLUMNS:
+            total, count = self._rating_totals[col]
+            total, count = total + raw[col].sum(), count + raw[col].count()
+            self._rating_totals[col] = (total, count)
+            fill[col] = total / count if count else float("nan")
+        return fill
+
+    def refresh(self, force=False):
+        """Ingest partitions added since the last refresh and return the new row count.
+
+        Polls the directory at most every ``poll_seconds`` unless ``force`` is
+        set. Once data is loaded, a refresh already running in another session
+        is not waited for. A file that cannot be read or cleaned is logged and
+        left unseen, so the next poll tries it again; the other files are
+        ingested without it.
+        """
+        now = time.monotonic()
+        if not force and self._last_poll is not None and now - self._last_poll < self.poll_seconds:
+            return 0
+        # Wait only when there is nothing to serve yet.
+        if not self._lock.acquire(blocking=self._state[1] is None):
+            return 0
+        try:
+            files = sorted(set(glob.glob(os.path.join(self.directory, "*.csv"))) - self._seen)
+            ingested, deltas = [], []
+            for path in files:
+                totals = dict(self._rating_totals)
+                try:
+                    raw = read_raw_bookings(path)
+                    deltas.append(clean_bookings(raw, self._rating_fill(raw)))
+                except (OSError, ValueError, KeyError):
+                    self._rating_totals = totals
+                    logger.exception("Could not ingest partition %s; it is retried on the next refresh.", path)
+                    continue
+                ingested.append(path)
+            if not deltas:
+                return 0
+            delta = append_bookings(*deltas)
+
+            version, df_clean, cube, hists, customers, _, sketches, quantiles = self._state
+            if df_clean is None:
+                df_clean, cube = delta, build_cube(delta)
+                hists, customers = build_histograms(delta), build_customer_index(delta)
+                sketches, quantiles = build_sketches(delta), build_quantile_sketches(delta)
+            else:
+                df_clean = append_bookings(df_clean, delta)
+                cube = append_to_cube(cube, df_clean, delta)
+                hists = append_histograms(hists, delta)
+                customers = append_customer_index(customers, delta)
+                sketches = append_sketches(sketches, delta)
+                quantiles = append_quantile_sketches(quantiles, delta)
+            self._seen.update(ingested)
+            self._state = (version + 1, df_clean, cube, hists, customers, build_daily_series(cube), sketches, quantiles)
+            return len(delta)
+        finally:
+            self._last_poll = time.monotonic()
+            self._lock.release()
+
+
+@st.cache_resource
+def _partition_store(directory):
+    return PartitionStore(directory)
+
+
+def load_partitions(directory=PARTITION_DIR):
+    """Return ``(version, df_clean, cube, histograms, customers, daily, sketches, quantiles)`` for the partition directory, picking up new files.
+
+    ``version`` is the cache key for exactly this data: (directory, refresh
+    count). It comes from the same snapshot of the store as the data, so a
+    refresh by another session cannot pair old data with a new key. The
+    store is shared by every session in the process, so a partition is
+    ingested once and shows up in all sessions on their next rerun.
+    Raises ``FileNotFoundError`` while the directory holds no partitions.
+    """
+    path = os.path.abspath(directory)
+    store = _partition_store(path)
+    store.refresh()
+    refreshes, *state = store.current()
+    if state[0] is None:
+        raise FileNotFoundError(f"No partition files in {directory}")
+    return ((path, refreshes), *state)
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+import pandas as pd
+import streamlit as st
+
+
+# One JSON object per page render is logged here at INFO. Set HUB_PROFILE_LOG
+# to a file path to append those lines to a file.
+logger = logging.getLogger("uber_analytics_hub.profile")
+if os.environ.get("HUB_PROFILE_LOG") and not logger.handlers:
+    _handler = logging.FileHandler(os.environ["HUB_PROFILE_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+CHART_CONFIG = {'displayModeBar': False}
+
+
+class PageProfile:
+    """Checkpoint timer for one script run.
+
+    ``mark`` closes a stage: it records the time since the previous mark with
+    the rows that stage scanned. ``plotly_chart`` draws a figure and records
+    its send stage, plus the figure's JSON size when ``enabled``. ``details``
+    holds extra per-run values for the log, such as page cache counters.
+    Measuring the size serializes the figure a second time, so it is only
+    done while the timings panel (``show_panel``) or the JSON log is on.
+    """
+
+    def __init__(self):
+        self.page = None
+        self.show_panel = False
+        self.stages = []
+        self.details = {}
+        self.finished = False
+        self._started = self._last = time.perf_counter()
+
+    def restart(self):
+        """Start timing a fragment rerun, which reuses the profile of the full run before it."""
+        self.stages = []
+        self.details = {}
+        self.finished = False
+        self._started = self._last = time.perf_counter()
+
+    @property
+    def enabled(self):
+        return self.show_panel or logger.isEnabledFor(logging.INFO)
+
+    def mark(self, stage, rows=None, payload_bytes=None):
+        now = time.perf_counter()
+        self.stages.append({"stage": stage, "seconds": now - self._last, "rows": rows, "payload_bytes": payload_bytes})
+        self._last = now
+
+    def plotly_chart(self, name, fig):
+        st.plotly_chart(fig, use_container_width=True, config=CHART_CONFIG)
+        self.mark(f"{name}: send")
+        if self.enabled:
+            # Keep the extra serialization out of every stage's time.
+            self.stages[-1]["payload_bytes"] = len(fig.to_json())
+            self._last = time.perf_counter()
+
+    def record(self):
+        return {
+            "time": time.time(),
+            "session": st.session_state.setdefault("profile_session", uuid.uuid4().hex),
+            "page": self.page,
+            "total_seconds": time.perf_counter() - self._started,
+            "stages": self.stages,
+            **self.details,
+        }
+
+    def finish(self):
+        """Log the run and, if ``show_panel`` is set, draw the timings table below the page.
+
+        The table is drawn in place rather than in the sidebar, which a
+        fragment cannot write to.
+        """
+        self.finished = True
+        if not self.enabled:
+            return
+        record = self.record()
+        logger.info(json.dumps(record))
+        if self.show_panel:
+            with st.expander("Render timings", expanded=True):
+                st.markdown(f"**{self.page}** rendered in {record['total_seconds'] * 1000:.0f} ms")
+                stages = pd.DataFrame(self.stages).convert_dtypes()
+                stages["ms"] = (stages.pop("seconds") * 1000).round(1)
+                st.dataframe(stages, hide_index=True, width="stretch")
+                for name, value in self.details.items():
+                    st.caption(f"{name}: {value}")
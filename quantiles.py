@@ -0,0 +1,116 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_loader import DATA_PATH, _cached_bookings, data_version
+from timeseries import calendar_bounds
+
+
+# Values are counted in logarithmic buckets: bucket k holds the values in
+# (GAMMA**(k - 1), GAMMA**k] and stands for 2 * GAMMA**k / (GAMMA + 1), which
+# is within RELATIVE_ACCURACY of every value in it. A quantile read off the
+# merged counts is therefore within 1% of a value of the exact rank.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+QUANTILE_MEASURES = ["Booking Value", "Ride Distance"]
+PERCENTILES = {"p5": 0.05, "p25": 0.25, "median": 0.5, "p75": 0.75, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+
+# days: every calendar day from the first to the last booking date, named "DateOnly".
+# vehicles: Index of the Vehicle Type values.
+# offsets: {measure: key of bucket 0}.
+# counts: {measure: int32 array (len(days), len(vehicles), buckets)}.
+QuantileSketches = namedtuple("QuantileSketches", ["days", "vehicles", "offsets", "counts"])
+
+
+def _keys(values):
+    return np.ceil(np.log(values) / np.log(GAMMA)).astype(np.int64)
+
+
+def build_quantile_sketches(df_clean):
+    """Per-day, per-vehicle bucket counts of every ``QUANTILE_MEASURES`` column.
+
+    Only positive values are counted: missing fares and distances (the
+    cancelled rides) are filled with 0 when the data is cleaned and would
+    otherwise drag every quantile down.
+    """
+    dates = df_clean["DateOnly"]
+    days = pd.date_range(dates.min(), dates.max(), freq="D", name="DateOnly").astype(dates.dtype)
+    day = ((dates - days[0]) // pd.Timedelta(days=1)).fillna(-1).astype("int64").to_numpy()
+    vehicles = pd.Index(df_clean["Vehicle Type"].cat.categories)
+    vehicle = df_clean["Vehicle Type"].cat.codes.to_numpy().astype(np.int64)
+    offsets, counts = {}, {}
+    for measure in QUANTILE_MEASURES:
+        values = df_clean[measure].to_numpy(dtype="float64")
+        keep = (day >= 0) & (vehicle >= 0) & (values > 0)
+        keys = _keys(values[keep])
+        offset = int(keys.min()) if keys.size else 0
+        n_buckets = int(keys.max()) - offset + 1 if keys.size else 1
+        cell = (day[keep] * len(vehicles) + vehicle[keep]) * n_buckets + keys - offset
+        flat = np.bincount(cell, minlength=len(days) * len(vehicles) * n_buckets)
+        offsets[measure] = offset
+        counts[measure] = flat.astype(np.int32).reshape(len(days), len(vehicles), n_buckets)
+    return QuantileSketches(days, vehicles, offsets, counts)
+
+
+def append_quantile_sketches(sketches, delta):
+    """Add the cleaned rows ``delta`` to ``sketches``, widening the calendar, vehicles and buckets as needed."""
+    new = build_quantile_sketches(delta)
+    days = sketches.days.union(new.days)
+    days = pd.date_range(days[0], days[-1], freq="D", name="DateOnly").astype(sketches.days.dtype)
+    vehicles = sketches.vehicles.append(new.vehicles.difference(sketches.vehicles))
+    offsets, counts = {}, {}
+    for measure, old in sketches.counts.items():
+        parts = [(sketches, old), (new, new.counts[measure])]
+        offset = min(source.offsets[measure] for source, _ in parts)
+        end = max(source.offsets[measure] + part.shape[-1] for source, part in parts)
+        merged = np.zeros((len(days), len(vehicles), end - offset), dtype=np.int32)
+        for source, part in parts:
+            rows = days.get_indexer(source.days)[:, None]
+            cols = vehicles.get_indexer(source.vehicles)[None, :]
+            first = source.offsets[measure] - offset
+            merged[rows, cols, first:first + part.shape[-1]] += part
+        offsets[measure], counts[measure] = offset, merged
+    return QuantileSketches(days, vehicles, offsets, counts)
+
+
+def _estimates(counts, offset, qs):
+    # counts: (..., buckets); the result has one column per quantile, NaN where nothing was counted.
+    cumulative = counts.cumsum(axis=-1)
+    total = cumulative[..., -1:]
+    ranks = np.asarray(qs) * (total - 1)
+    buckets = (cumulative[..., None, :] <= ranks[..., None]).sum(axis=-1)
+    values = 2 * GAMMA ** (offset + buckets.astype(np.float64)) / (GAMMA + 1)
+    return np.where(total > 0, values, np.nan)
+
+
+def range_quantiles(sketches, measure, start_date=None, end_date=None, percentiles=PERCENTILES):
+    """``percentiles`` of ``measure`` over [start_date, end_date]: a Series for all vehicles together."""
+    lo, hi = calendar_bounds(sketches.days, start_date, end_date)
+    counts = sketches.counts[measure][lo:hi].sum(axis=(0, 1))
+    return pd.Series(_estimates(counts, sketches.offsets[measure], list(percentiles.values())), index=list(percentiles))
+
+
+def vehicle_quantiles(sketches, measure, start_date=None, end_date=None, percentiles=PERCENTILES):
+    """``percentiles`` of ``measure`` over [start_date, end_date] as a frame with a "Vehicle Type" column and one column per percentile.
+
+    Vehicles without values in the range are left out.
+    """
+    lo, hi = calendar_bounds(sketches.days, start_date, end_date)
+    counts = sketches.counts[measure][lo:hi].sum(axis=0)
+    held = counts.sum(axis=-1) > 0
+    estimates = _estimates(counts[held], sketches.offsets[measure], list(percentiles.values()))
+    frame = pd.DataFrame(estimates, columns=list(percentiles))
+    frame.insert(0, "Vehicle Type", sketches.vehicles[held])
+    return frame
+
+
+@st.cache_resource(max_entries=1, show_spinner="Sketching quantiles...")
+def _cached_quantile_sketches(path, source, mtime_ns, size):
+    return build_quantile_sketches(_cached_bookings(path, source, mtime_ns, size))
+
+
+def load_quantile_sketches(path=DATA_PATH):
+    """Return the quantile sketches for the current bookings data, shared like ``load_bookings``."""
+    return _cached_quantile_sketches(*data_version(path))
@@ -0,0 +1,150 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_loader import DATA_PATH, _cached_bookings, data_version
+from timeseries import calendar_bounds
+
+
+# Each sketch has 2**HLL_PRECISION one-byte registers. The estimate's
+# relative standard error is about 1.04 / sqrt(2**HLL_PRECISION), 2.3% here,
+# so roughly 95% of estimates are within 4.6% of the exact count.
+HLL_PRECISION = 11
+HLL_ERROR = 1.04 / np.sqrt(1 << HLL_PRECISION)
+SKETCHED_IDS = ["Booking ID", "Customer ID"]
+# Filter columns with a sketch per value and day, so a range filtered on one
+# of them can be estimated too.
+SKETCH_DIMENSIONS = ["Vehicle Type", "Booking Status", "Payment Method"]
+
+# days: every calendar day from the first to the last booking date, named "DateOnly".
+# values: {dimension: Index of its values}.
+# registers: {(id column, None): uint8 array (len(days), 2**HLL_PRECISION)} and
+# {(id column, dimension): uint8 array (len(days), len(values[dimension]), 2**HLL_PRECISION)}.
+DistinctSketches = namedtuple("DistinctSketches", ["days", "values", "registers"])
+
+
+def _bit_length(values):
+    # frexp is exact on 32-bit halves, unlike on 64-bit values near 2**64.
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def hll_registers(hashes, groups, n_groups, precision=HLL_PRECISION):
+    """HyperLogLog registers for ``n_groups`` sketches; row ``g`` sketches the ``hashes`` whose group is ``g``."""
+    m = 1 << precision
+    slot = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    rank = ((64 - precision) - _bit_length(rest) + 1).astype(np.uint8)
+    registers = np.zeros(n_groups * m, dtype=np.uint8)
+    np.maximum.at(registers, groups * m + slot, rank)
+    return registers.reshape(n_groups, m)
+
+
+def hll_estimate(registers):
+    """Estimated distinct count of each sketch along the last axis, with linear counting for small counts."""
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.ldexp(1.0, -registers.astype(np.int64)).sum(axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def build_sketches(df_clean):
+    """Per-day HyperLogLog sketches of ``SKETCHED_IDS``, overall and per ``SKETCH_DIMENSIONS`` value."""
+    dates = df_clean["DateOnly"]
+    days = pd.date_range(dates.min(), dates.max(), freq="D", name="DateOnly").astype(dates.dtype)
+    day = ((dates - days[0]) // pd.Timedelta(days=1)).fillna(-1).astype("int64").to_numpy()
+    values = {dim: pd.Index(df_clean[dim].cat.categories) for dim in SKETCH_DIMENSIONS}
+    registers = {}
+    for col in SKETCHED_IDS:
+        keep = (day >= 0) & df_clean[col].notna().to_numpy()
+        hashes = pd.util.hash_pandas_object(df_clean[col][keep], index=False).to_numpy()
+        registers[(col, None)] = hll_registers(hashes, day[keep], len(days))
+        for dim in SKETCH_DIMENSIONS:
+            codes = df_clean[dim].cat.codes.to_numpy()[keep].astype(np.int64)
+            n = len(values[dim])
+            held = codes >= 0
+            grid = hll_registers(hashes[held], day[keep][held] * n + codes[held], len(days) * n)
+            registers[(col, dim)] = grid.reshape(len(days), n, -1)
+    return DistinctSketches(days, values, registers)
+
+
+def append_sketches(sketches, delta):
+    """Merge sketches of the cleaned rows ``delta`` into ``sketches``, widening the calendar and values as needed."""
+    new = build_sketches(delta)
+    days = sketches.days.union(new.days)
+    days = pd.date_range(days[0], days[-1], freq="D", name="DateOnly").astype(sketches.days.dtype)
+    values = {dim: sketches.values[dim].append(new.values[dim].difference(sketches.values[dim])) for dim in SKETCH_DIMENSIONS}
+    registers = {}
+    for key, old in sketches.registers.items():
+        col, dim = key
+        shape = (len(days),) + (() if dim is None else (len(values[dim]),)) + old.shape[-1:]
+        merged = np.zeros(shape, dtype=np.uint8)
+        for source, at in ((sketches, days.get_indexer(sketches.days)), (new, days.get_indexer(new.days))):
+            part = source.registers[key]
+            if dim is None:
+                merged[at] = np.maximum(merged[at], part)
+            else:
+                rows = at[:, None]
+                cols = values[dim].get_indexer(source.values[dim])[None, :]
+                merged[rows, cols] = np.maximum(merged[rows, cols], part)
+        registers[key] = merged
+    return DistinctSketches(days, values, registers)
+
+
+def _daily_registers(sketches, column, start_date=None, end_date=None, filters=None):
+    """``(days, registers)`` of ``column`` over the range, one merged sketch per day; None when ``filters`` can't be answered."""
+    lo, hi = calendar_bounds(sketches.days, start_date, end_date)
+    days = sketches.days[lo:hi]
+    if not filters:
+        return days, sketches.registers[(column, None)][lo:hi]
+    if len(filters) > 1 or next(iter(filters)) not in sketches.values:
+        # A union of sketches can't answer an intersection of filters.
+        return None
+    (dim, value), = filters.items()
+    accepted = value if isinstance(value, (list, tuple, set)) else [value]
+    positions = sketches.values[dim].get_indexer(list(accepted))
+    positions = positions[positions >= 0]
+    registers = sketches.registers[(column, dim)][lo:hi, positions]
+    m = registers.shape[-1]
+    return days, registers.max(axis=1) if len(positions) else np.zeros((len(days), m), dtype=np.uint8)
+
+
+def distinct_count(sketches, column, start_date=None, end_date=None, filters=None, weekdays=None):
+    """Estimated distinct ``column`` values over the range, restricted to ``weekdays`` (0 is Monday) if given.
+
+    ``filters`` may hold at most one of ``SKETCH_DIMENSIONS``; returns None
+    otherwise. The cost depends on the number of days, not rows.
+    """
+    daily = _daily_registers(sketches, column, start_date, end_date, filters)
+    if daily is None:
+        return None
+    days, registers = daily
+    if weekdays is not None:
+        registers = registers[np.isin(days.dayofweek, list(weekdays))]
+    if len(registers) == 0:
+        return 0
+    return int(round(float(hll_estimate(registers.max(axis=0)))))
+
+
+def daily_distinct(sketches, column, start_date=None, end_date=None, filters=None):
+    """Estimated distinct ``column`` values per day over the range as a Series, or None like ``distinct_count``."""
+    daily = _daily_registers(sketches, column, start_date, end_date, filters)
+    if daily is None:
+        return None
+    days, registers = daily
+    return pd.Series(np.round(hll_estimate(registers)), index=days, name=column)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Sketching distinct IDs...")
+def _cached_sketches(path, source, mtime_ns, size):
+    return build_sketches(_cached_bookings(path, source, mtime_ns, size))
+
+
+def load_sketches(path=DATA_PATH):
+    """Return the distinct-ID sketches for the current bookings data, shared like ``load_bookings``."""
+    return _cached_sketches(*data_version(path))
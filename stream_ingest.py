@@ -0,0 +1,61 @@
+import argparse
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_loader import CATEGORY_COLUMNS, DATA_PATH, RATING_COLUMNS, RAW_COLUMNS, clean_bookings
+
+
+CHUNK_ROWS = 500_000
+OUTPUT_DIR = "ncr_ride_bookings_parquet"
+
+
+def rating_means(csv_path, chunksize=CHUNK_ROWS):
+    """First pass: the mean of each rating column, reading only those columns."""
+    totals = {col: 0.0 for col in RATING_COLUMNS}
+    counts = {col: 0 for col in RATING_COLUMNS}
+    for chunk in pd.read_csv(csv_path, usecols=RATING_COLUMNS, chunksize=chunksize):
+        for col in RATING_COLUMNS:
+            totals[col] += chunk[col].sum()
+            counts[col] += chunk[col].count()
+    return {col: totals[col] / counts[col] if counts[col] else float("nan") for col in RATING_COLUMNS}
+
+
+def stream_ingest(csv_path=DATA_PATH, out_dir=OUTPUT_DIR, chunksize=CHUNK_ROWS):
+    """Clean ``csv_path`` chunk by chunk into a month-partitioned Parquet dataset.
+
+    Only one chunk of ``chunksize`` rows is held in memory at a time. Missing
+    ratings are filled with the whole-file means from a first pass, so every
+    row gets the same value as in ``read_bookings``. Each chunk is written as
+    one file per month under ``out_dir/month=YYYY-MM/``, with the same column
+    types as the Feather snapshot. ``out_dir`` must be new or empty.
+    Returns the number of rows written.
+    """
+    if os.path.isdir(out_dir) and os.listdir(out_dir):
+        raise FileExistsError(f"{out_dir} is not empty")
+    fill = rating_means(csv_path, chunksize)
+    reader = pd.read_csv(csv_path, usecols=lambda col: col in RAW_COLUMNS,
+                         dtype={col: "category" for col in CATEGORY_COLUMNS}, chunksize=chunksize)
+    written = 0
+    for part, chunk in enumerate(reader):
+        df_clean = clean_bookings(chunk, rating_fill=fill)
+        months = df_clean["Date"].dt.strftime("%Y-%m").fillna("unknown")
+        for month, rows in df_clean.groupby(months.to_numpy(), sort=False):
+            month_dir = os.path.join(out_dir, f"month={month}")
+            os.makedirs(month_dir, exist_ok=True)
+            table = pa.Table.from_pandas(rows, preserve_index=False)
+            pq.write_table(table, os.path.join(month_dir, f"part-{part:05d}.parquet"))
+        written += len(df_clean)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream the bookings CSV into a month-partitioned Parquet dataset.")
+    parser.add_argument("csv_path", nargs="?", default=DATA_PATH)
+    parser.add_argument("--out", default=OUTPUT_DIR, help="output directory")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="rows held in memory at a time")
+    args = parser.parse_args()
+    rows = stream_ingest(args.csv_path, args.out, args.chunksize)
+    print(f"Wrote {rows} rows to {args.out}")
@@ -0,0 +1,141 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_PATH
+
+
+# Named sizes accepted on the command line and by benchmark.py.
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+CHUNK_ROWS = 1_000_000
+
+# Columns of the NCR export, in file order.
+CSV_COLUMNS = [
+    "Date", "Time", "Booking ID", "Booking Status", "Customer ID", "Vehicle Type",
+    "Pickup Location", "Drop Location", "Avg VTAT", "Avg CTAT",
+    "Cancelled Rides by Customer", "Reason for cancelling by Customer",
+    "Cancelled Rides by Driver", "Driver Cancellation Reason",
+    "Incomplete Rides", "Incomplete Rides Reason",
+    "Booking Value", "Ride Distance", "Driver Ratings", "Customer Rating", "Payment Method"
+]
+
+# (values, probabilities) in the proportions of the real export.
+STATUSES = (["Completed", "Cancelled by Driver", "No Driver Found", "Cancelled by Customer", "Incomplete"],
+            [0.62, 0.18, 0.07, 0.07, 0.06])
+VEHICLES = (["Auto", "Go Mini", "Go Sedan", "Bike", "Premier Sedan", "eBike", "Uber XL"],
+            [0.25, 0.20, 0.18, 0.15, 0.12, 0.07, 0.03])
+PAYMENTS = (["UPI", "Cash", "Uber Wallet", "Credit Card", "Debit Card"],
+            [0.45, 0.25, 0.12, 0.10, 0.08])
+CUSTOMER_REASONS = (["Wrong Address", "Change of plans", "Driver is not moving towards pickup location",
+                     "Driver asked to cancel", "AC is not working"], [0.22, 0.22, 0.20, 0.20, 0.16])
+DRIVER_REASONS = (["Customer related issue", "The customer was sick", "Personal & Car related issues",
+                   "More than permitted people in there"], [0.25, 0.25, 0.25, 0.25])
+INCOMPLETE_REASONS = (["Customer Demand", "Vehicle Breakdown", "Other Issue"], [0.34, 0.33, 0.33])
+LOCATIONS = [
+    "Palam Vihar", "Shastri Nagar", "Khandsa", "Central Secretariat", "Ghitorni Village",
+    "AIIMS", "Vaishali", "Mayur Vihar", "Noida Sector 62", "Rohini", "Saket", "Dwarka Sector 21",
+    "Cyber Hub", "Gurgaon Sector 56", "Connaught Place", "Lajpat Nagar", "Karol Bagh", "Indirapuram",
+]
+# Relative booking volume per hour of day, peaking in the evening.
+HOUR_WEIGHTS = np.array([2, 1, 1, 1, 1, 2, 3, 5, 7, 7, 7, 7, 7, 7, 7, 7, 8, 9, 10, 9, 8, 6, 4, 3], dtype=float)
+
+_TIMES = np.array([f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in range(86400)], dtype=object)
+
+
+def _choice(rng, options, n):
+    values, p = options
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p)]
+
+
+def _codes(prefix, numbers):
+    return ('"' + prefix + pd.Series(numbers).astype(str).str.zfill(7) + '"').to_numpy(dtype=object)
+
+
+def synthetic_bookings(n, rng, first_booking=0, customers=None, year=2024):
+    """``n`` raw bookings in the NCR export schema, one calendar year of dates.
+
+    Booking IDs count up from ``first_booking``, with about 1% reused within
+    the chunk as in the real data. Customers are drawn from ``customers``
+    distinct IDs (``n`` by default). Values, distances, ratings and payment
+    methods are only set for the statuses that carry them in the export.
+    """
+    customers = customers or n
+    start = pd.Timestamp(year=year, month=1, day=1)
+    days = 366 if start.is_leap_year else 365
+    dates = (start + pd.to_timedelta(np.arange(days), unit="D")).strftime("%Y-%m-%d").to_numpy(dtype=object)
+    hours = rng.choice(24, n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = hours * 3600 + rng.integers(0, 3600, n)
+
+    booking = first_booking + np.arange(n)
+    repeat = rng.random(n) < 0.01
+    booking[repeat] = first_booking + rng.integers(0, n, repeat.sum())
+
+    status = _choice(rng, STATUSES, n)
+    completed = status == "Completed"
+    served = completed | (status == "Incomplete")
+    by_customer = status == "Cancelled by Customer"
+    by_driver = status == "Cancelled by Driver"
+    incomplete = status == "Incomplete"
+    driver_found = status != "No Driver Found"
+
+    return pd.DataFrame({
+        "Date": dates[rng.integers(0, days, n)],
+        "Time": _TIMES[seconds],
+        "Booking ID": _codes("CNR", booking),
+        "Booking Status": status,
+        "Customer ID": _codes("CID", rng.integers(0, customers, n)),
+        "Vehicle Type": _choice(rng, VEHICLES, n),
+        "Pickup Location": np.asarray(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)],
+        "Drop Location": np.asarray(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)],
+        "Avg VTAT": np.where(driver_found, rng.uniform(2, 20, n).round(1), np.nan),
+        "Avg CTAT": np.where(served, rng.uniform(10, 45, n).round(1), np.nan),
+        "Cancelled Rides by Customer": np.where(by_customer, 1.0, np.nan),
+        "Reason for cancelling by Customer": np.where(by_customer, _choice(rng, CUSTOMER_REASONS, n), None),
+        "Cancelled Rides by Driver": np.where(by_driver, 1.0, np.nan),
+        "Driver Cancellation Reason": np.where(by_driver, _choice(rng, DRIVER_REASONS, n), None),
+        "Incomplete Rides": np.where(incomplete, 1.0, np.nan),
+        "Incomplete Rides Reason": np.where(incomplete, _choice(rng, INCOMPLETE_REASONS, n), None),
+        "Booking Value": np.where(served, np.clip(rng.lognormal(5.9, 0.75, n), 50, 4277).round(), np.nan),
+        "Ride Distance": np.where(served, rng.uniform(1, 50, n).round(2), np.nan),
+        "Driver Ratings": np.where(completed, np.clip(rng.normal(4.23, 0.43, n), 3, 5).round(1), np.nan),
+        "Customer Rating": np.where(completed, np.clip(rng.normal(4.40, 0.43, n), 3, 5).round(1), np.nan),
+        "Payment Method": np.where(served, _choice(rng, PAYMENTS, n), None),
+    }, columns=CSV_COLUMNS)
+
+
+def parse_rows(value):
+    """Row count from a named size ("1m") or a plain integer ("250000")."""
+    return SIZES.get(str(value).lower()) or int(value)
+
+
+def write_synthetic_csv(path=DATA_PATH, rows=SIZES["100k"], seed=0, chunksize=CHUNK_ROWS):
+    """Write ``rows`` synthetic bookings to ``path`` in chunks of ``chunksize``.
+
+    Each chunk has its own generator seeded from ``(seed, chunk number)``, so
+    the file only depends on ``seed``, ``rows`` and ``chunksize``. At most one
+    chunk is held in memory. Returns ``path``.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    for chunk, first in enumerate(range(0, rows, chunksize)):
+        n = min(chunksize, rows - first)
+        frame = synthetic_bookings(n, np.random.default_rng([seed, chunk]), first_booking=first, customers=rows)
+        frame.to_csv(tmp, mode="w" if chunk == 0 else "a", header=chunk == 0, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic bookings CSV in the NCR export schema.")
+    parser.add_argument("rows", nargs="?", default="100k", help=f"row count or one of {', '.join(SIZES)}")
+    parser.add_argument("--out", default=DATA_PATH, help="output CSV path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="rows generated at a time")
+    args = parser.parse_args()
+    rows = parse_rows(args.rows)
+    write_synthetic_csv(args.out, rows, args.seed, args.chunksize)
+    print(f"Wrote {rows} rows to {args.out}")
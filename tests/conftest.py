@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_bookings  # noqa: E402
+from synthetic_data import synthetic_bookings  # noqa: E402
+
+
+ROWS = 20_000
+CUSTOMERS = 3_000
+
+
+@pytest.fixture(scope="session")
+def bookings_csv(tmp_path_factory):
+    """A year of synthetic bookings, with customers booking several times each."""
+    path = tmp_path_factory.mktemp("data") / "ncr_ride_bookings.csv"
+    synthetic_bookings(ROWS, np.random.default_rng(0), customers=CUSTOMERS).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def df_clean(bookings_csv):
+    return read_bookings(bookings_csv)
+
+
+@pytest.fixture(params=["in order", "out of order"])
+def append_split(request, df_clean):
+    """``(first, second)``: ``df_clean`` cut at 2024-07-01, to build from ``first`` and append ``second``.
+
+    "out of order" appends the earlier half to the later one.
+    """
+    cut = df_clean["Date"] < pd.Timestamp("2024-07-01")
+    first, second = df_clean[cut], df_clean[~cut]
+    return (first, second) if request.param == "in order" else (second, first)
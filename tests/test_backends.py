@@ -0,0 +1,100 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+import analytics
+from backends import DuckDBBackend, PandasBackend
+from cube import GRAIN
+from stream_ingest import stream_ingest
+
+
+RANGES = [(None, None), (date(2024, 3, 1), date(2024, 5, 31)), (date(2024, 7, 4), date(2024, 7, 4))]
+FILTERS = [None, {"Vehicle Type": "auto"}, {"Vehicle Type": ["auto", "bike"], "Payment Method": "UPI"}]
+
+
+@pytest.fixture(scope="module")
+def backends(bookings_csv, df_clean, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("parquet") / "bookings"
+    stream_ingest(bookings_csv, str(directory), chunksize=7_000)
+    return PandasBackend(df_clean), DuckDBBackend(str(directory))
+
+
+def test_categories_follow_the_known_order(df_clean, backends):
+    _, duck = backends
+    for col in ["Booking Status", "Vehicle Type", "Payment Method"]:
+        assert list(duck._dtype(col).categories) == list(df_clean[col].cat.categories), col
+
+
+@pytest.mark.parametrize("start_date, end_date", RANGES)
+@pytest.mark.parametrize("filters", FILTERS)
+def test_queries_match(backends, start_date, end_date, filters):
+    pandas, duck = backends
+    query = (start_date, end_date, filters)
+    assert duck.count(*query) == pandas.count(*query)
+    pd.testing.assert_series_equal(duck.aggregate(None, *query), pandas.aggregate(None, *query),
+                                   check_dtype=False, check_names=False)
+    for by in ["Vehicle Type", ["Hour", "Booking Status"]]:
+        pd.testing.assert_frame_equal(duck.aggregate(by, *query), pandas.aggregate(by, *query), check_dtype=False)
+    assert duck.distinct_count("Customer ID", *query) == pandas.distinct_count("Customer ID", *query)
+    pd.testing.assert_series_equal(duck.distinct_count("Booking ID", *query, by="Vehicle Type"),
+                                   pandas.distinct_count("Booking ID", *query, by="Vehicle Type"),
+                                   check_dtype=False, check_names=False)
+    a, b = duck.top_k("Customer ID", "Booking Value", 10, *query), pandas.top_k("Customer ID", "Booking Value", 10, *query)
+    np.testing.assert_allclose(a["Booking Value"].to_numpy(), b["Booking Value"].to_numpy())
+    np.testing.assert_array_equal(duck.density("Booking Value", "Customer Rating", *query).counts,
+                                  pandas.density("Booking Value", "Customer Rating", *query).counts)
+
+
+def test_aggregates_match(backends):
+    pandas, duck = backends
+    a, b = duck.cube(), pandas.cube()
+    # Cells are ordered by day; within a day the two backends may list them differently.
+    pd.testing.assert_frame_equal(canonical(a.cells, GRAIN), canonical(b.cells, GRAIN), check_dtype=False)
+    assert a.duplicates["Booking ID"].sort_values(ignore_index=True).equals(
+        b.duplicates["Booking ID"].sort_values(ignore_index=True))
+    a, b = duck.histograms(), pandas.histograms()
+    for col in b.counts:
+        np.testing.assert_allclose(a.edges[col], b.edges[col])
+        np.testing.assert_array_equal(a.counts[col], b.counts[col])
+    a, b = duck.quantile_sketches(), pandas.quantile_sketches()
+    assert a.days.equals(b.days) and a.vehicles.equals(b.vehicles)
+    for measure in b.counts:
+        assert a.offsets[measure] == b.offsets[measure]
+        np.testing.assert_array_equal(a.counts[measure], b.counts[measure])
+
+
+def canonical(frame, columns=None):
+    return frame.sort_values(list(columns if columns is not None else frame.columns), ignore_index=True)
+
+
+def assert_same(a, b, where):
+    if isinstance(a, dict):
+        assert set(a) == set(b), where
+        for key in a:
+            assert_same(a[key], b[key], f"{where}/{key}")
+    elif isinstance(a, pd.DataFrame):
+        if isinstance(b.index, pd.RangeIndex):
+            # Lists of bookings or customers: ties on the sort key may come in either order.
+            a, b = canonical(a), canonical(b)
+        pd.testing.assert_frame_equal(a, b, check_dtype=False, check_index_type=False, obj=where)
+    elif isinstance(a, pd.Series):
+        pd.testing.assert_series_equal(a, b, check_dtype=False, check_index_type=False, obj=where)
+    elif hasattr(a, "_fields"):
+        for field in a._fields:
+            np.testing.assert_allclose(getattr(a, field), getattr(b, field), err_msg=f"{where}/{field}")
+    elif a is None or b is None:
+        assert a is None and b is None, where
+    else:
+        assert a == pytest.approx(b, nan_ok=True), where
+
+
+@pytest.mark.parametrize("start_date, end_date", RANGES)
+def test_pages_match(df_clean, backends, start_date, end_date):
+    _, duck = backends
+    pandas_data, duck_data = analytics.build_dataset(df_clean), analytics.dataset_from(duck)
+    for page, compute in analytics.PAGES.items():
+        assert_same(compute(duck_data, start_date, end_date), compute(pandas_data, start_date, end_date), page)
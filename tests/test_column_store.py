@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import column_store  # noqa: E402
+from analytics import build_dataset  # noqa: E402
+
+
+def assert_same(published, built):
+    """Compare nested aggregates exactly: frames, indexes, arrays, dicts and tuples."""
+    assert type(published) is type(built) or isinstance(built, np.ndarray)
+    if isinstance(built, pd.DataFrame):
+        pd.testing.assert_frame_equal(published, built, check_exact=True, check_freq=False)
+    elif isinstance(built, pd.Index):
+        pd.testing.assert_index_equal(published, built, check_exact=True)
+    elif isinstance(built, np.ndarray):
+        assert published.dtype == built.dtype
+        np.testing.assert_array_equal(published, built)
+    elif isinstance(built, dict):
+        assert list(published) == list(built)
+        for key in built:
+            assert_same(published[key], built[key])
+    elif isinstance(built, tuple):
+        assert len(published) == len(built)
+        for published_item, built_item in zip(published, built):
+            assert_same(published_item, built_item)
+    else:
+        assert published == built
+
+
+@pytest.fixture(scope="module")
+def store(df_clean, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("store"))
+    column_store.publish(df_clean, directory)
+    return directory
+
+
+def test_attach_store_matches_frame(store, df_clean):
+    pd.testing.assert_frame_equal(column_store.attach_store(store), df_clean, check_exact=True)
+
+
+def test_published_aggregates_match_build(store, df_clean):
+    attached = column_store.attach_dataset(store)
+    built = build_dataset(df_clean)
+    for field in column_store.AGGREGATE_FIELDS:
+        assert_same(getattr(attached, field), getattr(built, field))
+    # Mapped, not copied into this process.
+    assert not attached.customers.rows["Customer Code"].to_numpy().flags.writeable
+
+
+def test_version_without_aggregates_is_built(store, df_clean):
+    version = column_store.publish(df_clean, store)
+    os.remove(os.path.join(store, version, column_store.AGGREGATES))
+    attached = column_store.attach_dataset(store, version)
+    pd.testing.assert_frame_equal(attached.cube.cells, build_dataset(df_clean).cube.cells, check_exact=True)
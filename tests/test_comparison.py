@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+import analytics
+from comparison import change, last_year_window, previous_window
+from timeseries import covers
+
+
+JUNE = (date(2024, 6, 1), date(2024, 6, 30))
+# Its previous window starts in December 2023, before the test data.
+EARLY_JANUARY = (date(2024, 1, 10), date(2024, 1, 20))
+
+
+@pytest.fixture(scope="module")
+def data(df_clean):
+    return analytics.build_dataset(df_clean)
+
+
+def test_windows():
+    assert previous_window(*JUNE) == (date(2024, 5, 2), date(2024, 5, 31))
+    assert last_year_window(*JUNE) == (date(2023, 6, 1), date(2023, 6, 30))
+    assert last_year_window(date(2024, 2, 29), date(2024, 2, 29)) == (date(2023, 2, 28), date(2023, 2, 28))
+
+
+def test_covers(data):
+    assert covers(data.daily, *JUNE)
+    assert not covers(data.daily, *previous_window(*EARLY_JANUARY))
+    assert not covers(data.daily, *last_year_window(*JUNE))
+
+
+def test_deltas_against_covered_windows(data):
+    result = analytics.overall(data, *JUNE)
+    previous = analytics.overall(data, *previous_window(*JUNE))["kpis"]
+    for name, value in result["kpis"].items():
+        assert result["deltas"][name]["previous"] == pytest.approx(change(name, value, previous[name]), nan_ok=True)
+        # No data a year earlier.
+        assert result["deltas"][name]["last_year"] is None
+
+
+def test_partial_windows_are_not_compared(data):
+    deltas = analytics.overall(data, *EARLY_JANUARY)["deltas"]
+    assert all(delta["previous"] is None and delta["last_year"] is None for delta in deltas.values())
+
+
+def test_revenue_growth(data):
+    window = previous_window(*JUNE)
+    expected = change("total_revenue", analytics.revenue(data, *JUNE)["kpis"]["total_revenue"],
+                      analytics.revenue(data, *window)["kpis"]["total_revenue"])
+    assert analytics.revenue(data, *JUNE)["kpis"]["revenue_growth"] == pytest.approx(expected)
+    assert analytics.revenue(data, *EARLY_JANUARY)["kpis"]["revenue_growth"] is None
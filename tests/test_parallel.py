@@ -0,0 +1,73 @@
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import parallel
+from analytics import PAGES
+from cube import build_cube, rollup, slice_cube
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+QUERIES = [
+    ("Vehicle Type", None, None, None, True),
+    ("Hour", date(2024, 3, 15), date(2024, 8, 10), None, True),
+    ("Month", None, None, {"Vehicle Type": ["auto", "bike"]}, False),
+    (["Payment Method", "Booking Status"], date(2024, 6, 1), None, {"Payment Method": "UPI"}, True),
+    ("Vehicle Type", date(2030, 1, 1), date(2030, 1, 31), None, True),
+]
+
+
+@pytest.fixture(scope="module")
+def cube(df_clean):
+    return build_cube(df_clean)
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    # Take the map-reduce path on the small test cube, split into a few months each.
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_CELLS", 0)
+    monkeypatch.setattr(parallel.month_bounds, "__defaults__", (2_000,))
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 2)
+
+
+def test_month_bounds_cover_whole_months(cube):
+    bounds = parallel.month_bounds(cube.cells, 2_000)
+    assert len(bounds) > 2
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(cube.cells)
+    assert all(hi == lo for (_, hi), (lo, _) in zip(bounds, bounds[1:]))
+    months = cube.cells["DateOnly"].to_numpy().astype("datetime64[M]")
+    assert all(months[hi - 1] != months[hi] for _, hi in bounds[:-1])
+
+
+@pytest.mark.parametrize("by, start_date, end_date, filters, observed", QUERIES)
+def test_breakdown_matches_serial(cube, partitioned, monkeypatch, by, start_date, end_date, filters, observed):
+    assert len(parallel.month_partitions(cube.cells).bounds) > 2
+    pooled = parallel.breakdown(cube, by, start_date, end_date, filters, observed)
+    local = parallel.breakdown(cube, by, start_date, end_date, filters, observed, pool=False)
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_CELLS", len(cube.cells) + 1)
+    serial = parallel.breakdown(cube, by, start_date, end_date, filters, observed)
+
+    # Every path adds the same per-month partials in the same order.
+    pd.testing.assert_frame_equal(pooled, serial, check_exact=True)
+    pd.testing.assert_frame_equal(local, serial, check_exact=True)
+    # The row counts are those of a single rollup.
+    one_pass = rollup(slice_cube(cube, start_date, end_date, filters).cells, by, observed)
+    assert serial["rows"].reindex(one_pass.index, fill_value=0).equals(one_pass["rows"])
+
+
+def test_app_renders_through_pool(bookings_csv, partitioned, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    pools = []
+    pool = parallel._pool
+    monkeypatch.setattr(parallel, "_pool", lambda: pools.append(1) or pool())
+    monkeypatch.chdir(os.path.dirname(bookings_csv))
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.run()
+    for page in PAGES:
+        app.button(key=f"nav_{page}").click()
+        app.run()
+        assert not app.exception, [error.value for error in app.exception]
+    assert pools
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from partitions import PartitionStore
+
+
+@pytest.fixture
+def partition_dir(bookings_csv, tmp_path):
+    """The test bookings split into three partition CSVs by month."""
+    raw = pd.read_csv(bookings_csv)
+    month = pd.to_datetime(raw["Date"]).dt.month
+    for name, rows in [("a", month <= 4), ("b", (month > 4) & (month <= 8)), ("c", month > 8)]:
+        raw[rows].to_csv(tmp_path / f"{name}.csv", index=False)
+    return tmp_path
+
+
+def test_refresh_skips_broken_file_until_fixed(partition_dir, df_clean):
+    good = (partition_dir / "b.csv").read_text()
+    (partition_dir / "b.csv").write_text("Booking ID,Vehicle Type\nCNR1,Auto\n")
+    store = PartitionStore(str(partition_dir))
+
+    store.refresh(force=True)
+    version, partial, *_ = store.current()
+    assert version == 1
+    assert 0 < len(partial) < len(df_clean)
+
+    (partition_dir / "b.csv").write_text(good)
+    store.refresh(force=True)
+    version, full, *_ = store.current()
+    assert version == 2
+    assert len(full) == len(df_clean)
+    assert full["Date"].is_monotonic_increasing
+
+
+def test_refresh_ignores_files_being_written(partition_dir):
+    (partition_dir / "c.csv").rename(partition_dir / "c.csv.tmp")
+    store = PartitionStore(str(partition_dir))
+    store.refresh(force=True)
+    rows = len(store.current()[1])
+
+    assert store.refresh(force=True) == 0
+    (partition_dir / "c.csv.tmp").rename(partition_dir / "c.csv")
+    assert store.refresh(force=True) > 0
+    assert len(store.current()[1]) > rows
@@ -0,0 +1,56 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from data_loader import date_slice
+from quantiles import PERCENTILES, QUANTILE_MEASURES, RELATIVE_ACCURACY, append_quantile_sketches, build_quantile_sketches, range_quantiles, vehicle_quantiles
+
+
+RANGES = [(None, None), (date(2024, 3, 1), date(2024, 5, 31)), (date(2024, 7, 4), date(2024, 7, 4))]
+
+
+@pytest.fixture(scope="module")
+def sketches(df_clean):
+    return build_quantile_sketches(df_clean)
+
+
+def exact(values):
+    """The value at each percentile's rank among the positive ``values``, as the sketches define it."""
+    values = values[values > 0]
+    return np.quantile(values, list(PERCENTILES.values()), method="lower")
+
+
+def assert_within_accuracy(estimates, expected):
+    # A value on a bucket boundary may land one bucket up, which is still within the bound.
+    np.testing.assert_allclose(estimates, expected, rtol=RELATIVE_ACCURACY * (1 + 1e-9))
+
+
+@pytest.mark.parametrize("measure", QUANTILE_MEASURES)
+@pytest.mark.parametrize("start_date, end_date", RANGES)
+def test_range_quantiles_within_accuracy(df_clean, sketches, measure, start_date, end_date):
+    rows = date_slice(df_clean, start_date, end_date)
+    estimates = range_quantiles(sketches, measure, start_date, end_date)
+    assert list(estimates.index) == list(PERCENTILES)
+    assert_within_accuracy(estimates.to_numpy(), exact(rows[measure].to_numpy(dtype=np.float64)))
+
+
+@pytest.mark.parametrize("measure", QUANTILE_MEASURES)
+def test_vehicle_quantiles_within_accuracy(df_clean, sketches, measure):
+    start_date, end_date = RANGES[1]
+    rows = date_slice(df_clean, start_date, end_date)
+    frame = vehicle_quantiles(sketches, measure, start_date, end_date)
+    assert len(frame) > 1
+    for _, row in frame.iterrows():
+        values = rows.loc[rows["Vehicle Type"] == row["Vehicle Type"], measure].to_numpy(dtype=np.float64)
+        assert_within_accuracy(row[list(PERCENTILES)].to_numpy(dtype=np.float64), exact(values))
+
+
+def test_append_matches_full_build(df_clean, append_split):
+    first, second = append_split
+    appended = append_quantile_sketches(build_quantile_sketches(first), second)
+    full = build_quantile_sketches(df_clean)
+    for measure in QUANTILE_MEASURES:
+        for start_date, end_date in RANGES:
+            np.testing.assert_array_equal(range_quantiles(appended, measure, start_date, end_date),
+                                          range_quantiles(full, measure, start_date, end_date))
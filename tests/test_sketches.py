@@ -0,0 +1,46 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from data_loader import date_slice
+from sketches import HLL_ERROR, SKETCHED_IDS, append_sketches, build_sketches, daily_distinct, distinct_count
+
+
+def test_append_matches_full_build(df_clean, append_split):
+    first, second = append_split
+    appended = append_sketches(build_sketches(first), second)
+    full = build_sketches(df_clean)
+
+    assert appended.days.equals(full.days)
+    assert set(appended.registers) == set(full.registers)
+    for key, registers in full.registers.items():
+        col, dim = key
+        got = appended.registers[key]
+        if dim is not None:
+            # Values new to the appended rows go after the existing ones; line them up by value.
+            got = got[:, appended.values[dim].get_indexer(full.values[dim])]
+        np.testing.assert_array_equal(got, registers, err_msg=str(key))
+
+
+@pytest.mark.parametrize("column", SKETCHED_IDS)
+@pytest.mark.parametrize("start_date, end_date, filters", [
+    (None, None, None),
+    (date(2024, 3, 1), date(2024, 5, 31), None),
+    (date(2024, 3, 1), date(2024, 5, 31), {"Vehicle Type": "auto"}),
+    (None, None, {"Payment Method": ["UPI", "Cash"]}),
+])
+def test_distinct_count_within_error(df_clean, column, start_date, end_date, filters):
+    rows = date_slice(df_clean, start_date, end_date)
+    for col, value in (filters or {}).items():
+        rows = rows[rows[col].isin(value if isinstance(value, list) else [value])]
+    exact = rows[column].nunique()
+    estimate = distinct_count(build_sketches(df_clean), column, start_date, end_date, filters)
+    assert abs(estimate - exact) <= 4 * HLL_ERROR * exact
+
+
+def test_intersecting_filters_are_not_answered(df_clean):
+    sketches = build_sketches(df_clean)
+    filters = {"Vehicle Type": "auto", "Payment Method": "UPI"}
+    assert distinct_count(sketches, "Customer ID", filters=filters) is None
+    assert daily_distinct(sketches, "Customer ID", filters=filters) is None
@@ -0,0 +1,47 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import date_slice
+from top_customers import append_customer_index, build_customer_index, distinct_customers, top_customers
+
+
+RANGES = [(None, None), (date(2024, 3, 1), date(2024, 5, 31)), (date(2024, 2, 10), date(2024, 4, 20)),
+          (date(2024, 7, 4), date(2024, 7, 4)), (None, date(2024, 1, 15)), (date(2024, 12, 20), None)]
+
+
+def expected_totals(df_clean, start_date, end_date):
+    rows = date_slice(df_clean, start_date, end_date)
+    return rows.groupby("Customer ID", observed=True)["Booking Value"].sum()
+
+
+@pytest.mark.parametrize("monthly", [True, False])
+@pytest.mark.parametrize("start_date, end_date", RANGES)
+def test_top_customers_matches_groupby(df_clean, monthly, start_date, end_date):
+    index = build_customer_index(df_clean, monthly=monthly)
+    result = top_customers(index, start_date, end_date, k=10)
+    totals = expected_totals(df_clean, start_date, end_date)
+    expected = totals[totals != 0].sort_values(ascending=False).head(10)
+    # Ties may be listed in either order, so compare the totals, then each customer's own total.
+    np.testing.assert_allclose(result["Booking Value"].to_numpy(), expected.to_numpy())
+    np.testing.assert_allclose(result["Booking Value"].to_numpy(), totals[result["Customer ID"]].to_numpy())
+    assert distinct_customers(index, start_date, end_date) == date_slice(df_clean, start_date, end_date)["Customer ID"].nunique()
+
+
+def test_append_matches_full_build(df_clean, append_split):
+    first, second = append_split
+    appended = append_customer_index(build_customer_index(first), second)
+    full = build_customer_index(df_clean)
+
+    for start_date, end_date in RANGES:
+        a = top_customers(appended, start_date, end_date, k=25)
+        b = top_customers(full, start_date, end_date, k=25)
+        np.testing.assert_allclose(a["Booking Value"].to_numpy(), b["Booking Value"].to_numpy())
+        assert distinct_customers(appended, start_date, end_date) == distinct_customers(full, start_date, end_date)
+    assert sorted(appended.months) == sorted(full.months)
+    for month, (codes, totals) in full.months.items():
+        ids = full.customers[codes]
+        got = pd.Series(appended.months[month][1], index=appended.customers[appended.months[month][0]])
+        np.testing.assert_allclose(got[ids].to_numpy(), totals)
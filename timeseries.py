@@ -0,0 +1,105 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from bitmap_index import matching_values
+from cube import MEASURES, _cached_cube, distinct_bookings
+from data_loader import DATA_PATH, data_version
+
+
+# values: one row per calendar day from the first to the last booking date,
+# days without bookings included as zeros, indexed by "DateOnly". Columns are
+# "bookings" (distinct Booking IDs that day), "rows", "completed",
+# "cancellations" (any "Cancelled" status) and the cube's "<measure> sum"
+# columns, so ``cube.metric`` reads means off it directly.
+# cumulative: {column: array of len(values) + 1}, the running totals with a
+# leading zero; a range total is cumulative[hi] - cumulative[lo].
+DailySeries = namedtuple("DailySeries", ["values", "cumulative"])
+
+
+def build_daily_series(cube):
+    """Daily totals over the full calendar of ``cube`` and their prefix sums."""
+    cells = cube.cells
+    rows = cells["rows"]
+    status = cells["Booking Status"]
+    cancelled = matching_values(cube.cell_index, "Booking Status", "Cancelled")
+    totals = pd.DataFrame({
+        "rows": rows,
+        "completed": rows.where(status == "Completed", 0),
+        "cancellations": rows.where(status.isin(cancelled), 0),
+        **{f"{measure} sum": cells[f"{measure} sum"] for measure in MEASURES},
+    }).groupby(cells["DateOnly"]).sum()
+
+    days = pd.date_range(totals.index.min(), totals.index.max(), freq="D", name="DateOnly").astype(cells["DateOnly"].dtype)
+    values = totals.reindex(days, fill_value=0)
+    values.insert(0, "bookings", distinct_bookings(cube, "DateOnly").reindex(days, fill_value=0))
+    cumulative = {col: np.concatenate([[0], values[col].to_numpy().cumsum()]) for col in values.columns}
+    return DailySeries(values, cumulative)
+
+
+def calendar_bounds(days, start_date=None, end_date=None):
+    """Positions ``(lo, hi)`` of [start_date, end_date] in ``days``, a run of consecutive days, by date arithmetic."""
+    n = len(days)
+    if n == 0:
+        return 0, 0
+    first = days[0]
+    lo = 0 if start_date is None else min(max((pd.Timestamp(start_date) - first).days, 0), n)
+    hi = n if end_date is None else min(max((pd.Timestamp(end_date) - first).days + 1, lo), n)
+    return lo, hi
+
+
+def day_bounds(series, start_date=None, end_date=None):
+    """Positions ``(lo, hi)`` of the days in [start_date, end_date] in ``series``."""
+    return calendar_bounds(series.values.index, start_date, end_date)
+
+
+def covers(series, start_date, end_date):
+    """Whether every day of [start_date, end_date] lies within the calendar of ``series``.
+
+    ``calendar_bounds`` clamps a range to the calendar, so a total over a
+    range that sticks out only covers part of it.
+    """
+    days = series.values.index
+    return len(days) > 0 and days[0] <= pd.Timestamp(start_date) and pd.Timestamp(end_date) <= days[-1]
+
+
+def daily(series, start_date=None, end_date=None):
+    """The zero-filled daily rows for [start_date, end_date]."""
+    lo, hi = day_bounds(series, start_date, end_date)
+    return series.values.iloc[lo:hi]
+
+
+def range_totals(series, start_date=None, end_date=None):
+    """Every column's total over [start_date, end_date] from two prefix-sum lookups.
+
+    "bookings" adds up each day's distinct IDs, so a booking whose ID repeats
+    on several days is counted once per day.
+    """
+    lo, hi = day_bounds(series, start_date, end_date)
+    return pd.Series({col: cumulative[hi] - cumulative[lo] for col, cumulative in series.cumulative.items()})
+
+
+def rolling_mean(series, column, window, start_date=None, end_date=None):
+    """``column``'s mean over each trailing ``window`` days within [start_date, end_date].
+
+    Matches ``daily(...)[column].rolling(window).mean()``: the first
+    ``window - 1`` days are NaN. Each value is one prefix-sum difference.
+    """
+    lo, hi = day_bounds(series, start_date, end_date)
+    cumulative = series.cumulative[column]
+    ends = np.arange(lo + 1, hi + 1)
+    means = (cumulative[ends] - cumulative[np.maximum(ends - window, 0)]) / window
+    means[ends - window < lo] = np.nan
+    return pd.Series(means, index=series.values.index[lo:hi], name=column)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Indexing daily totals...")
+def _cached_daily_series(path, source, mtime_ns, size):
+    return build_daily_series(_cached_cube(path, source, mtime_ns, size))
+
+
+def load_daily_series(path=DATA_PATH):
+    """Return the daily series for the current bookings data, shared like ``load_bookings``."""
+    return _cached_daily_series(*data_version(path))
@@ -0,0 +1,136 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_loader import DATA_PATH, _cached_bookings, data_version, date_bounds
+
+
+TOP_K = 10
+
+# customers: Index of the distinct Customer IDs; a customer's code is its position.
+# rows: "Date", "Customer Code" and "Booking Value" of every booking with a
+# date and a customer, sorted by Date.
+# months: {datetime64[M]: (codes, totals)} with each customer's Booking Value
+# total for that calendar month (customers with a zero total are left out),
+# or None when monthly partial sums are not kept.
+CustomerIndex = namedtuple("CustomerIndex", ["customers", "rows", "months"])
+
+
+def _rows(df_clean, codes):
+    keep = (codes >= 0) & df_clean["Date"].notna().to_numpy()
+    return pd.DataFrame({
+        "Date": df_clean["Date"].to_numpy()[keep],
+        "Customer Code": codes[keep],
+        "Booking Value": df_clean["Booking Value"].to_numpy(dtype="float64")[keep],
+    })
+
+
+def _month_totals(rows, n_customers, months):
+    keys = rows["Date"].to_numpy().astype("datetime64[M]")
+    codes = rows["Customer Code"].to_numpy()
+    values = rows["Booking Value"].to_numpy()
+    totals = {}
+    for month in months:
+        lo, hi = keys.searchsorted(month, "left"), keys.searchsorted(month, "right")
+        month_totals = np.bincount(codes[lo:hi], weights=values[lo:hi], minlength=n_customers)
+        held = np.flatnonzero(month_totals)
+        totals[month] = (held, month_totals[held])
+    return totals
+
+
+def _months(rows):
+    return np.unique(rows["Date"].to_numpy().astype("datetime64[M]"))
+
+
+def build_customer_index(df_clean, monthly=True):
+    """Factorize the Customer IDs of ``df_clean`` for ``top_customers``.
+
+    With ``monthly`` set, per-customer totals are also kept for each calendar
+    month, so a range only scans the rows of the months it covers partially.
+    """
+    codes, customers = pd.factorize(df_clean["Customer ID"])
+    rows = _rows(df_clean, codes)
+    months = _month_totals(rows, len(customers), _months(rows)) if monthly else None
+    return CustomerIndex(pd.Index(customers), rows, months)
+
+
+def append_customer_index(index, delta):
+    """Add the cleaned rows of ``delta`` to ``index``; new customers get new codes."""
+    ids = delta["Customer ID"]
+    new_ids = pd.Index(ids.dropna().unique()).difference(index.customers)
+    customers = index.customers.append(new_ids)
+    new_rows = _rows(delta, customers.get_indexer(ids))
+
+    in_order = len(index.rows) == 0 or len(new_rows) == 0 or new_rows["Date"].min() >= index.rows["Date"].iloc[-1]
+    rows = pd.concat([index.rows, new_rows], ignore_index=True)
+    if not in_order:
+        rows = rows.sort_values("Date", kind="stable", ignore_index=True)
+
+    months = index.months
+    if months is not None:
+        months = dict(months)
+        months.update(_month_totals(rows, len(customers), _months(new_rows)))
+    return CustomerIndex(customers, rows, months)
+
+
+def _full_months(months, start_date, end_date):
+    first = None if start_date is None else np.datetime64(pd.Timestamp(start_date).date(), "D")
+    last = None if end_date is None else np.datetime64(pd.Timestamp(end_date).date(), "D")
+    return [month for month in sorted(months)
+            if (first is None or month.astype("datetime64[D]") >= first)
+            and (last is None or (month + 1).astype("datetime64[D]") - 1 <= last)]
+
+
+def top_customers(index, start_date=None, end_date=None, k=TOP_K):
+    """The ``k`` customers with the highest Booking Value total over [start_date, end_date].
+
+    Totals are one weighted ``np.bincount`` over the customer codes: the
+    monthly totals of the months the range covers fully, plus the rows of the
+    partially covered days at either end. The ``k`` largest are picked with
+    ``np.argpartition``, so only they get sorted. Returns a frame with
+    "Customer ID" and "Booking Value", highest first; customers with a zero
+    total are not listed.
+    """
+    full = _full_months(index.months, start_date, end_date) if index.months else []
+    if full:
+        before = full[0].astype("datetime64[D]") - 1
+        after = (full[-1] + 1).astype("datetime64[D]")
+        spans = [(start_date, before), (after, end_date)]
+        if start_date is None:
+            spans = spans[1:]
+        if end_date is None:
+            spans = spans[:-1]
+    else:
+        spans = [(start_date, end_date)]
+
+    codes = [index.months[month][0] for month in full]
+    weights = [index.months[month][1] for month in full]
+    for start, end in spans:
+        lo, hi = date_bounds(index.rows, start, end)
+        codes.append(index.rows["Customer Code"].to_numpy()[lo:hi])
+        weights.append(index.rows["Booking Value"].to_numpy()[lo:hi])
+    totals = np.bincount(np.concatenate(codes), weights=np.concatenate(weights), minlength=len(index.customers))
+
+    k = min(k, np.count_nonzero(totals))
+    top = np.argpartition(-totals, k - 1)[:k] if k > 0 else np.array([], dtype=np.intp)
+    top = top[np.argsort(-totals[top], kind="stable")]
+    return pd.DataFrame({"Customer ID": index.customers[top], "Booking Value": totals[top]})
+
+
+def distinct_customers(index, start_date=None, end_date=None):
+    """The exact number of distinct customers with a booking in [start_date, end_date]."""
+    lo, hi = date_bounds(index.rows, start_date, end_date)
+    codes = index.rows["Customer Code"].to_numpy()[lo:hi]
+    return int(np.count_nonzero(np.bincount(codes, minlength=len(index.customers))))
+
+
+@st.cache_resource(max_entries=1, show_spinner="Indexing customers...")
+def _cached_customer_index(path, source, mtime_ns, size):
+    return build_customer_index(_cached_bookings(path, source, mtime_ns, size))
+
+
+def load_customer_index(path=DATA_PATH):
+    """Return the customer index for the current bookings data, shared like ``load_bookings``."""
+    return _cached_customer_index(*data_version(path))